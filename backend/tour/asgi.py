@@ -5,12 +5,26 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+
+Chạy bằng một ASGI server, vd. ``uvicorn tour.asgi:application --workers 4``. Khác với WSGI, các
+request ở đây được định tuyến theo ``ASGI_ROOT_URLCONF`` (view async cho các endpoint đọc chính).
 """
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tour.settings')
 
-application = get_asgi_application()
+
+class TourASGIHandler(ASGIHandler):
+    async def get_response_async(self, request):
+        request.urlconf = getattr(settings, 'ASGI_ROOT_URLCONF', settings.ROOT_URLCONF)
+        return await super().get_response_async(request)
+
+
+# Tương đương get_asgi_application(), với handler ở trên
+django.setup(set_prefix=False)
+application = TourASGIHandler()
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'corsheaders',
     'tour_api',
     'rest_framework',
@@ -44,6 +45,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Đặt đầu tiên để đo cả các middleware phía sau (tour_api/instrumentation.py)
+    'tour_api.instrumentation.InstrumentationMiddleware',
+    'tour_api.database.StatementTimeoutMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -73,6 +77,8 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'tour.wsgi.application'
+# tour/asgi.py định tuyến theo URLconf này: view async cho các endpoint đọc chính (tour_api/async_views.py)
+ASGI_ROOT_URLCONF = 'tour.urls_asgi'
 
 
 # Database
@@ -86,9 +92,72 @@ DATABASES = {
         'PASSWORD': '1224454',  # Mật khẩu
         'HOST': 'localhost',  # Host (thường là localhost nếu chạy local)
         'PORT': '5432',  # Cổng mặc định của PostgreSQL
+        # Kiểm tra kết nối còn sống trước khi dùng lại (cả kết nối lấy từ pool)
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Pool kết nối của Django (psycopg 3 + psycopg_pool, pip install "psycopg[pool]"): mỗi tiến trình giữ
+# từ min_size đến max_size kết nối; request chờ quá 'timeout' giây mà không có kết nối rảnh thì nhận 503.
+# Không có psycopg_pool thì giữ kết nối giữa các request theo CONN_MAX_AGE.
+DB_POOL = {
+    'min_size': 2,
+    'max_size': 10,
+    'timeout': 5,
+    'max_idle': 300,
+    'max_lifetime': 1800,
+}
+try:
+    import psycopg_pool  # noqa: F401
+except ImportError:
+    DATABASES['default']['CONN_MAX_AGE'] = 60
+else:
+    DATABASES['default']['OPTIONS'] = {'pool': DB_POOL}
+
+# Ngân sách statement_timeout (ms) theo tên URL (tour_api/database.py); query vượt ngân sách bị huỷ
+# và request nhận 503. 0 = không giới hạn.
+DB_STATEMENT_TIMEOUT_MS = 5000
+DB_STATEMENT_TIMEOUTS = {
+    'location-list': 5000,
+    'location-detail': 1000,
+    'location-ratings': 1000,
+    'alternative-locations': 3000,
+    'district-list': 3000,
+    'district-detail': 2000,
+    'vector-tile': 3000,
+    'image-variant': 1000,
+    'metrics': 1000,
+    'itinerary-suggest': 10000,
+    'itinerary-update': 5000,
+    'itinerary-save': 5000,
+    'itinerary-list': 2000,
+    'itinerary-delete': 3000,
+    'signup': 2000,
+    'signin': 2000,
+    'rating-create': 3000,
+    'rating-update': 3000,
+}
+
+
+# Cache
+# 'tour_api' lưu response của các endpoint đọc (tour_api/caching.py). Mặc định là bộ nhớ cục bộ
+# của từng tiến trình; khi chạy nhiều worker nên trỏ cả hai alias sang backend dùng chung, ví dụ:
+#   'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379/1'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'tour_api': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tour-api-responses',
+        'TIMEOUT': 3600,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+TOUR_API_CACHE = 'tour_api'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -128,6 +197,11 @@ STATIC_URL = '/static/'
 # Media files (Uploaded images, videos, etc.)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Thư mục cache tile vector (MVT), bị xoá từng phần khi Location/District thay đổi
+TILE_CACHE_DIR = BASE_DIR / 'cache' / 'tiles'
+# Đồ thị đường bộ đã tiền xử lý cho định tuyến offline (manage.py build_routing_graph <file OSM>);
+# chưa có file thì lịch trình dùng khoảng cách đường chim bay
+ROUTING_GRAPH = BASE_DIR / 'cache' / 'routing' / 'danang.npz'
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -139,15 +213,43 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'tour_api.pagination.KeysetPagination',
     'PAGE_SIZE': 6,
+    # Rẻ nhất trước: JWT chỉ đọc header và cache (tour_api/authentication.py), Basic chỉ xem header,
+    # Session phải nạp session
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'rest_framework.authentication.SessionAuthentication',
+        'tour_api.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.BasicAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ),
+    # JSONRenderer có đo thời gian render cho header Server-Timing
+    'DEFAULT_RENDERER_CLASSES': (
+        'tour_api.instrumentation.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ),
 }
 
+# Instrumentation (tour_api/instrumentation.py)
+# Request chậm hơn ngưỡng này được ghi vào logger 'tour_api.slow_requests' kèm các câu SQL tốn
+# thời gian nhất và EXPLAIN (không ANALYZE) của chúng. /api/metrics/ chỉ mở cho DEBUG và staff; INTERNAL_IPS
+# chỉ được tin khi bật METRICS_ALLOW_INTERNAL_IPS (không bật khi chạy sau reverse proxy cùng máy).
+SLOW_REQUEST_THRESHOLD_MS = 500
+SLOW_REQUEST_TOP_QUERIES = 3
+SLOW_REQUEST_EXPLAIN = True
+INTERNAL_IPS = ['127.0.0.1', '::1']
+METRICS_ALLOW_INTERNAL_IPS = False
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'tour_api.slow_requests': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
 
 from datetime import timedelta
 
@@ -157,7 +259,11 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': False,
     'BLACKLIST_AFTER_ROTATION': True,
     'AUTH_HEADER_TYPES': ('Bearer',),
+    # Token cũ mất hiệu lực khi người dùng đổi mật khẩu
+    'CHECK_REVOKE_TOKEN': True,
 }
+# Số giây cache trạng thái is_active/mật khẩu của user cho CachedJWTAuthentication
+AUTH_USER_CACHE_TTL = 60
 
 GDAL_LIBRARY_PATH = r'C:\Users\Lenovo\.conda\envs\gis_env\Library\bin\gdal.dll'
 GEOS_LIBRARY_PATH = r'C:\Users\Lenovo\.conda\envs\gis_env\Library\bin\geos_c.dll'
@@ -0,0 +1,16 @@
+# URLconf của triển khai ASGI (tour/asgi.py): các endpoint đọc chính dùng view async
+# (tour_api/async_views.py), mọi route còn lại giống tour/urls.py.
+from django.urls import path
+
+from tour_api.async_views import (
+    AsyncDistrictListView, AsyncItineraryListView, AsyncLocationDetailView, AsyncLocationListView,
+)
+
+from .urls import urlpatterns as wsgi_urlpatterns
+
+urlpatterns = [
+    path('api/locations/', AsyncLocationListView.as_view(), name='location-list'),
+    path('api/locations/<int:pk>/', AsyncLocationDetailView.as_view(), name='location-detail'),
+    path('api/districts/', AsyncDistrictListView.as_view(), name='district-list'),
+    path('api/itineraries/', AsyncItineraryListView.as_view(), name='itinerary-list'),
+] + wsgi_urlpatterns
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tour.settings')
 
 application = get_wsgi_application()
+
+# Nạp sẵn snapshot toạ độ địa điểm (tour_api/snapshot.py) trước request đầu tiên
+from tour_api.snapshot import warm_snapshot  # noqa: E402
+
+warm_snapshot()
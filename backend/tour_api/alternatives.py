@@ -0,0 +1,103 @@
+# tour_api/alternatives.py
+# Gợi ý địa điểm thay thế cho một điểm dừng của lịch trình (hộp thoại "đổi địa điểm").
+#
+# Ứng viên cùng loại hình được lấy từ snapshot toạ độ trong bộ nhớ quanh các điểm neo (điểm dừng
+# liền trước/liền sau trong ngày, hoặc một toạ độ lat/lng), bỏ các địa điểm đã có trong lịch trình,
+# rồi xếp hạng theo tổ hợp quãng đường và điểm đánh giá. Chỉ ``limit`` địa điểm đầu được nạp từ DB.
+import numpy as np
+
+from .models import ItineraryLocation, Location
+from .planning import haversine_matrix
+from .snapshot import ordered_by_snapshot
+
+# Số ứng viên gần nhất lấy quanh mỗi điểm neo trước khi xếp hạng (ít nhất gấp mấy lần limit)
+POOL_FACTOR = 5
+MIN_POOL_SIZE = 50
+# rank = DISTANCE_WEIGHT * d / (d + DISTANCE_SCALE_M) + RATING_WEIGHT * (1 - điểm chuẩn hoá), nhỏ trước
+DISTANCE_WEIGHT = 0.7
+RATING_WEIGHT = 0.3
+DISTANCE_SCALE_M = 2000.0
+# Điểm đánh giá được kéo về PRIOR_SCORE với trọng số PRIOR_COUNT lượt (ít lượt thì ít tin cậy)
+PRIOR_SCORE = 3.0
+PRIOR_COUNT = 5
+
+
+def stop_anchors(snapshot, itinerary, location_id):
+    """Toạ độ các điểm dừng kề điểm dừng ``location_id`` trong cùng ngày, và id mọi địa điểm của lịch trình.
+
+    Điểm dừng đầu ngày dùng vị trí xuất phát trong ``survey_data`` (nếu có) làm điểm liền trước.
+    Trả về ``None`` nếu địa điểm không có trong lịch trình.
+    """
+    stops = list(ItineraryLocation.objects.filter(itinerary=itinerary)
+                 .order_by('day', 'visit_order', 'id').values_list('location_id', 'day'))
+    itinerary_ids = [stop_location for stop_location, _ in stops]
+    day = next((stop_day for stop_location, stop_day in stops if stop_location == location_id), None)
+    if day is None:
+        return None, itinerary_ids
+
+    day_ids = [stop_location for stop_location, stop_day in stops if stop_day == day]
+    position = day_ids.index(location_id)
+
+    def coordinates(stop_location):
+        idx = snapshot.index_by_id.get(stop_location)
+        return None if idx is None else (float(snapshot.lat[idx]), float(snapshot.lng[idx]))
+
+    start = (itinerary.survey_data or {}).get('current_location') or {}
+    if position > 0:
+        previous = coordinates(day_ids[position - 1])
+    elif start.get('lat') is not None and start.get('lng') is not None:
+        previous = (float(start['lat']), float(start['lng']))
+    else:
+        previous = None
+    following = coordinates(day_ids[position + 1]) if position + 1 < len(day_ids) else None
+
+    anchors = [anchor for anchor in (previous, following) if anchor is not None]
+    if not anchors:
+        # Điểm dừng duy nhất trong ngày: tìm quanh chính nó
+        own = coordinates(location_id)
+        anchors = [own] if own is not None else []
+    return anchors, itinerary_ids
+
+
+def detour_distances(snapshot, anchors, candidates):
+    """Quãng đường (mét) phải đi thêm khi ghé ứng viên: d(a, c) + d(c, b) - d(a, b), hoặc d(a, c)."""
+    lat, lng = snapshot.lat[candidates], snapshot.lng[candidates]
+    anchor_lat = [a[0] for a in anchors]
+    anchor_lng = [a[1] for a in anchors]
+    to_anchors = haversine_matrix(anchor_lat, anchor_lng, lat, lng)
+    if len(anchors) == 1:
+        return to_anchors[0]
+    direct = haversine_matrix(anchor_lat[:1], anchor_lng[:1], anchor_lat[1:], anchor_lng[1:])[0, 0]
+    return to_anchors[0] + to_anchors[1] - direct
+
+
+def rating_scores(ids):
+    """Điểm đánh giá đã chuẩn hoá về [0, 1] (trung bình có trọng số với PRIOR_SCORE) của ``ids``."""
+    rows = Location.objects.filter(id__in=ids).values_list('id', 'average_score', 'rating_count')
+    shrunk = {
+        location_id: ((average or 0.0) * (count or 0) + PRIOR_SCORE * PRIOR_COUNT) / ((count or 0) + PRIOR_COUNT)
+        for location_id, average, count in rows
+    }
+    return np.array([(shrunk.get(location_id, PRIOR_SCORE) - 1) / 4 for location_id in ids])
+
+
+def ranked_alternatives(queryset, snapshot, tourism_type, anchors, exclude_ids, limit):
+    """``queryset`` giới hạn vào ``limit`` địa điểm tốt nhất, đã sắp xếp và gắn ``distance_m``.
+
+    ``distance_m`` là quãng đường đi thêm so với đi thẳng giữa hai điểm neo (hoặc khoảng cách tới
+    điểm neo duy nhất).
+    """
+    pool_size = max(MIN_POOL_SIZE, limit * POOL_FACTOR)
+    pool = [
+        snapshot.query(lat, lng, k=pool_size, tourism_type=tourism_type, exclude_ids=exclude_ids)[0]
+        for lat, lng in anchors
+    ]
+    candidates = np.unique(np.concatenate(pool)) if pool else np.empty(0, dtype=np.int64)
+    if not len(candidates):
+        return queryset.none()
+
+    distances = np.maximum(detour_distances(snapshot, anchors, candidates), 0.0)
+    ratings = rating_scores(snapshot.ids[candidates].tolist())
+    rank = DISTANCE_WEIGHT * distances / (distances + DISTANCE_SCALE_M) + RATING_WEIGHT * (1 - ratings)
+    order = np.lexsort((snapshot.ids[candidates], rank))[:limit]
+    return ordered_by_snapshot(queryset, snapshot, candidates[order], distances[order])
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 class TourApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tour_api'  # <- đảm bảo đúng tên app trong thư mục
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,215 @@
+# tour_api/async_views.py
+# Đường đọc async cho triển khai ASGI (tour/asgi.py, URLconf tour/urls_asgi.py): danh sách và chi tiết
+# địa điểm, danh sách quận, danh sách lịch trình của người dùng.
+#
+# Truy vấn vẫn do chính view DRF đồng bộ dựng ra (get_queryset, sparse fieldset, eager loading) nên hai
+# đường luôn trả cùng dữ liệu, cùng key cache; phần chạy query dùng ORM async (aget, aiterator, acount) và
+# serializer chạy ngay trên event loop vì mọi quan hệ đã được prefetch. Trường hợp chưa có đường async
+# (?nearby, ?search, ?ordering, phân trang cursor, Browsable API, xác thực không phải JWT) và mọi lỗi
+# (400, 404, ...) được chuyển cho view DRF qua sync_to_async, như Django vẫn làm với view đồng bộ.
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist, SynchronousOnlyOperation
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views import View
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import AllowAny
+from rest_framework.renderers import JSONRenderer
+
+from .authentication import CachedJWTAuthentication
+from .caching import (
+    CachedResponseMixin, StreamCollector, cache_entry, cached_response, get_cache, miss_response, response_cache_key,
+)
+from .pagination import KeysetPagination
+from .streaming import ajson_array_stream, can_stream
+from .views import DistrictListView, ItineraryListView, LocationDetailView, LocationListView
+
+
+async def authenticate_jwt(request):
+    """``(user, token)`` từ header ``Authorization: Bearer``, hoặc ``None`` khi không có header đó.
+
+    Token được kiểm tra ngay trên event loop; trạng thái user đọc từ cache, chỉ query khi cache hết hạn.
+    """
+    authenticator = CachedJWTAuthentication()
+    header = authenticator.get_header(request)
+    raw_token = authenticator.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        return None
+    token = authenticator.get_validated_token(raw_token)
+    return await authenticator.aget_user(token), token
+
+
+def content_type(renderer):
+    return f'{renderer.media_type}; charset={renderer.charset}' if renderer.charset else renderer.media_type
+
+
+class AsyncReadView(View):
+    """View async cho phương thức GET của ``drf_view_class``.
+
+    Lớp con cài ``build_response(view)`` với ``view`` là instance của view DRF đã có request,
+    renderer và user (nếu cần xác thực); ``supports(view)`` quyết định có đi đường async hay không.
+    """
+    drf_view_class = None
+    sync_view = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        initkwargs.setdefault('sync_view', cls.drf_view_class.as_view())
+        return super().as_view(**initkwargs)
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            view = self.drf_view(request, kwargs)
+            if not self.supports(view) or not await self.check_permissions(view):
+                return await self.fallback(request, *args, **kwargs)
+            return await self.respond(view)
+        except (APIException, ObjectDoesNotExist, SynchronousOnlyOperation):
+            # Lỗi và quan hệ chưa được prefetch: để view DRF trả lời y như đường WSGI
+            return await self.fallback(request, *args, **kwargs)
+
+    async def options(self, request, *args, **kwargs):
+        return await self.fallback(request, *args, **kwargs)
+
+    async def fallback(self, request, *args, **kwargs):
+        return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+
+    def drf_view(self, request, kwargs):
+        view = self.drf_view_class()
+        view.setup(request, **kwargs)
+        view.format_kwarg = view.get_format_suffix(**kwargs)
+        view.request = view.initialize_request(request, **kwargs)
+        view.request.accepted_renderer, view.request.accepted_media_type = view.perform_content_negotiation(view.request)
+        return view
+
+    def supports(self, view):
+        # Browsable API cần cả request.user và template: để view DRF lo
+        return isinstance(view.request.accepted_renderer, JSONRenderer)
+
+    async def check_permissions(self, view):
+        permissions = view.get_permissions()
+        if all(isinstance(permission, AllowAny) for permission in permissions):
+            return True
+        authenticated = await authenticate_jwt(view.request)
+        if authenticated is None:
+            return False
+        view.request.user, view.request.auth = authenticated
+        return all(permission.has_permission(view.request, view) for permission in permissions)
+
+    async def respond(self, view):
+        if not isinstance(view, CachedResponseMixin):
+            return await self.build_response(view)
+
+        request = view.request
+        key, last_modified = await sync_to_async(response_cache_key)(
+            type(view).__name__, view.kwargs, request.query_params, request.accepted_renderer.format,
+            view.get_cache_tags(),
+        )
+        entry = await get_cache().aget(key)
+        if entry is not None:
+            return cached_response(request, entry)
+
+        response = await self.build_response(view)
+        if response.status_code != 200:
+            return response
+        if response.streaming:
+            response.streaming_content = self.tee_to_cache(
+                response.streaming_content, response['Content-Type'], key, last_modified)
+            response['X-Cache'] = 'MISS'
+            return response
+        entry = cache_entry(response.content, response['Content-Type'], last_modified)
+        await get_cache().aset(key, entry)
+        return miss_response(request, response, entry)
+
+    async def tee_to_cache(self, streaming_content, content_type, key, last_modified):
+        collector = StreamCollector()
+        async for chunk in streaming_content:
+            collector.add(chunk)
+            yield chunk
+        content = collector.content()
+        if content is not None:
+            await get_cache().aset(key, cache_entry(content, content_type, last_modified))
+
+    async def build_response(self, view):
+        raise NotImplementedError
+
+    # Dựng response giống APIView.finalize_response
+
+    def finalize(self, view, response):
+        headers = dict(view.default_response_headers)
+        vary = headers.pop('Vary', None)
+        if vary is not None:
+            patch_vary_headers(response, [value.strip() for value in vary.split(',')])
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    def json_response(self, view, data):
+        request = view.request
+        renderer = request.accepted_renderer
+        content = renderer.render(data, request.accepted_media_type, {'request': request, 'view': view})
+        return self.finalize(view, HttpResponse(content, content_type=content_type(renderer)))
+
+    async def list_response(self, view, queryset):
+        paginator = view.paginator
+        if paginator is None:
+            objects = [obj async for obj in queryset]
+            return self.json_response(view, view.get_serializer(objects, many=True).data)
+        page = await paginator.apaginate_queryset(queryset, view.request, view)
+        data = view.get_serializer(page, many=True).data
+        return self.json_response(view, paginator.get_paginated_response(data).data)
+
+
+def uses_cursor(view):
+    paginator = view.paginator
+    return isinstance(paginator, KeysetPagination) and paginator.is_cursor_request(view.request)
+
+
+class AsyncLocationListView(AsyncReadView):
+    drf_view_class = LocationListView
+
+    def supports(self, view):
+        params = view.request.query_params
+        # ?nearby dùng snapshot trong bộ nhớ (có thể phải nạp lại từ DB), ?search/?ordering ít gặp
+        nearby = params.get('nearby') and params.get('lat') and params.get('lng')
+        return (super().supports(view) and not nearby and not params.get('search')
+                and not params.get('ordering') and not uses_cursor(view))
+
+    async def build_response(self, view):
+        request = view.request
+        queryset = view.filter_queryset(view.get_queryset())
+        if request.query_params.get('all', '').lower() != 'true':
+            return await self.list_response(view, queryset)
+        if can_stream(request):
+            return self.finalize(view, StreamingHttpResponse(
+                ajson_array_stream(queryset, view.get_serializer()),
+                content_type=request.accepted_renderer.media_type,
+            ))
+        objects = [obj async for obj in queryset]
+        return self.json_response(view, view.get_serializer(objects, many=True).data)
+
+
+class AsyncLocationDetailView(AsyncReadView):
+    drf_view_class = LocationDetailView
+
+    async def build_response(self, view):
+        queryset = view.filter_queryset(view.get_queryset())
+        lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+        obj = await queryset.aget(**{view.lookup_field: view.kwargs[lookup_url_kwarg]})
+        return self.json_response(view, view.get_serializer(obj).data)
+
+
+class AsyncDistrictListView(AsyncReadView):
+    drf_view_class = DistrictListView
+
+    async def build_response(self, view):
+        return await self.list_response(view, view.filter_queryset(view.get_queryset()))
+
+
+class AsyncItineraryListView(AsyncReadView):
+    drf_view_class = ItineraryListView
+
+    def supports(self, view):
+        return super().supports(view) and not uses_cursor(view)
+
+    async def build_response(self, view):
+        return await self.list_response(view, view.filter_queryset(view.get_queryset()))
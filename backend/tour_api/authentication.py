@@ -0,0 +1,104 @@
+# tour_api/authentication.py
+# Xác thực JWT không đọc bảng auth_user ở mỗi request.
+#
+# Token do TourRefreshToken cấp mang sẵn các claim mà API cần (USER_CLAIMS); CachedJWTAuthentication dựng
+# request.user từ các claim đó bằng User.from_db, các field không có trong token là field deferred và chỉ
+# được nạp khi thực sự được đọc. Trạng thái is_active và hash mật khẩu (để thu hồi token khi đổi mật khẩu,
+# CHECK_REVOKE_TOKEN) được cache AUTH_USER_CACHE_TTL giây theo user id và bị xoá khi User thay đổi
+# (signals.py), nên trường hợp thường gặp không có query nào cho việc xác thực.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .caching import get_cache
+
+# Field của User được ghi vào token (ngoài id)
+USER_CLAIMS = ('username', 'is_staff', 'is_superuser')
+STATE_PREFIX = 'tour_api:auth_user:'
+
+
+class TourRefreshToken(RefreshToken):
+    """RefreshToken kèm USER_CLAIMS; access token sinh ra từ nó cũng mang các claim này."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+
+def state_key(user_id):
+    return f'{STATE_PREFIX}{user_id}'
+
+
+def state_ttl():
+    return getattr(settings, 'AUTH_USER_CACHE_TTL', 60)
+
+
+def user_state(user):
+    if user is None:
+        return {'missing': True}
+    return {'is_active': user.is_active, 'password': get_md5_hash_password(user.password)}
+
+
+def state_queryset(user_id):
+    return get_user_model()._default_manager.filter(**{api_settings.USER_ID_FIELD: user_id}).only('is_active', 'password')
+
+
+def load_state(user_id):
+    state = get_cache().get(state_key(user_id))
+    if state is None:
+        state = user_state(state_queryset(user_id).first())
+        get_cache().set(state_key(user_id), state, state_ttl())
+    return state
+
+
+async def aload_state(user_id):
+    state = await get_cache().aget(state_key(user_id))
+    if state is None:
+        state = user_state(await state_queryset(user_id).afirst())
+        await get_cache().aset(state_key(user_id), state, state_ttl())
+    return state
+
+
+def forget_user(user_id):
+    get_cache().delete(state_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """Như JWTAuthentication (cùng các kiểm tra user tồn tại, is_active, thu hồi token) nhưng đọc từ cache."""
+
+    def get_user(self, validated_token):
+        return self.user_from_token(validated_token, load_state(self.user_id(validated_token)))
+
+    async def aget_user(self, validated_token):
+        return self.user_from_token(validated_token, await aload_state(self.user_id(validated_token)))
+
+    def user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+    def user_from_token(self, validated_token, state):
+        if state.get('missing'):
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if api_settings.CHECK_USER_IS_ACTIVE and not state['is_active']:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != state['password']:
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+
+        model = self.user_model
+        values = {claim: validated_token[claim] for claim in USER_CLAIMS if claim in validated_token}
+        values[model._meta.get_field(api_settings.USER_ID_FIELD).attname] = self.user_id(validated_token)
+        values['is_active'] = state['is_active']
+        # from_db nhận giá trị theo thứ tự concrete_fields; field còn lại là deferred
+        names = [field.attname for field in model._meta.concrete_fields if field.attname in values]
+        return model.from_db(router.db_for_read(model), names, [values[name] for name in names])
@@ -0,0 +1,785 @@
+# tour_api/benchmarks.py
+# Bộ benchmark tải/độ trễ cho các endpoint của tour_api.
+#
+# seed_dataset() sinh dữ liệu giả quanh Đà Nẵng (địa điểm, ảnh, đánh giá, lịch trình, quận) với id
+# bắt đầu từ BENCH_ID_START và user có tiền tố "bench_", nên có thể xoá sạch bằng flush_dataset()
+# mà không đụng dữ liệu thật. run_benchmark() gọi mọi route trong tour_api/urls.py bằng nhiều luồng
+# đồng thời (Django test Client trong tiến trình, hoặc HTTP tới một server đang chạy) và trả về
+# p50/p95/p99, throughput, số query SQL và kích thước payload dưới dạng dict ghi được ra JSON;
+# compare() so sánh với baseline lần chạy trước để phát hiện hồi quy. compare_deployments() đo cùng
+# các endpoint đọc trên hai server đang chạy (WSGI và ASGI) ở nhiều mức kết nối đồng thời.
+# bench_matrices() đo ma trận thời gian đi đường bộ (tour_api/routing.py) từ 10x10 tới 500x500.
+import asyncio
+import itertools
+import json
+import platform
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import django
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import MultiPolygon, Point, Polygon
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import routing, tiles, urls
+from .caching import invalidate
+from .districts import assign_location_districts, rebuild_district_geometries
+from .itineraries import clone_itinerary
+from .models import District, Image, Itinerary, ItineraryLocation, Location, Rating
+from .ratings import rebuild_rating_aggregates
+from .snapshot import bump_version
+
+try:
+    from PIL import Image as PILImage
+except ImportError:
+    PILImage = None
+
+# Khung toạ độ Đà Nẵng: (lng_min, lat_min, lng_max, lat_max)
+DA_NANG_BBOX = (107.95, 15.95, 108.35, 16.15)
+DISTRICT_GRID = (4, 2)
+TOURISM_TYPES = ['viewpoint', 'museum', 'attraction', 'theme_park']
+SCALES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+# id địa điểm OSM thật nhỏ hơn nhiều; mọi địa điểm benchmark nằm từ đây trở lên
+BENCH_ID_START = 9_000_000_000_000
+BENCH_USER_PREFIX = 'bench_'
+BENCH_DISTRICT_PREFIX = 'Bench '
+BENCH_LOGIN = 'bench_login'
+BENCH_PASSWORD = 'bench-password'
+BENCH_IMAGE_URL = '/images/bench/sample.jpg'
+
+SEED_BATCH_SIZE = 10_000
+STOPS_PER_DAY = 4
+ITINERARY_DAYS = 3
+
+
+# Sinh dữ liệu
+
+def flush_dataset():
+    """Xoá toàn bộ dữ liệu benchmark (bằng SQL, không qua signal để xoá nhanh cả triệu dòng)."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        params = {'start': BENCH_ID_START, 'prefix': BENCH_USER_PREFIX + '%'}
+        # Lịch trình của user bench và mọi lịch trình chứa địa điểm bench (vd. lịch trình gợi ý ẩn danh).
+        # Khoá ngoại của Django là DEFERRABLE nên thứ tự xoá trong transaction không quan trọng.
+        cursor.execute("""
+            CREATE TEMP TABLE bench_itineraries ON COMMIT DROP AS
+            SELECT id FROM itineraries WHERE user_id IN (SELECT id FROM auth_user WHERE username LIKE %(prefix)s)
+            UNION
+            SELECT itinerary_id FROM itinerary_locations WHERE location_id >= %(start)s
+        """, params)
+        cursor.execute('UPDATE itineraries SET source_id = NULL WHERE source_id IN (SELECT id FROM bench_itineraries)')
+        cursor.execute('DELETE FROM itinerary_locations WHERE itinerary_id IN (SELECT id FROM bench_itineraries)')
+        cursor.execute('DELETE FROM itineraries WHERE id IN (SELECT id FROM bench_itineraries)')
+        cursor.execute('DELETE FROM ratings WHERE location_id >= %(start)s', params)
+        cursor.execute('DELETE FROM images WHERE location_id >= %(start)s', params)
+        cursor.execute('DELETE FROM locations WHERE id >= %(start)s', params)
+    # Các bảng còn lại (ratings của user bench, token, ...) được xoá theo cascade của ORM
+    User.objects.filter(username__startswith=BENCH_USER_PREFIX).delete()
+    District.objects.filter(name__startswith=BENCH_DISTRICT_PREFIX).delete()
+    refresh_derived_data()
+
+
+def refresh_derived_data(district_ids=None):
+    # Dữ liệu được ghi bằng bulk_create/SQL nên không có signal: tự tính lại và xoá cache
+    rebuild_rating_aggregates()
+    assign_location_districts()
+    if district_ids:
+        rebuild_district_geometries(district_ids)
+    bump_version()
+    invalidate('locations', 'locations:bulk', 'districts', 'districts:bulk')
+    tiles.invalidate_layer('locations')
+    tiles.invalidate_layer('districts')
+
+
+def write_sample_image():
+    """Ảnh JPEG mẫu dùng chung cho mọi Image benchmark (để route sinh variant có file để đọc)."""
+    if PILImage is None:
+        return False
+    path = settings.MEDIA_ROOT / BENCH_IMAGE_URL.lstrip('/')
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        gradient = np.linspace(0, 255, 1200, dtype=np.uint8)
+        pixels = np.stack(np.broadcast_arrays(gradient[None, :], gradient[:800, None], 128), axis=-1)
+        PILImage.fromarray(pixels.astype(np.uint8)).save(path, quality=85)
+    return True
+
+
+def seed_dataset(locations, images=2, ratings=3, itineraries=None, users=200, seed=42, log=print):
+    """Xoá dữ liệu benchmark cũ rồi sinh ``locations`` địa điểm (cùng ``seed`` cho cùng dữ liệu)."""
+    rng = np.random.default_rng(seed)
+    itineraries = itineraries if itineraries is not None else max(10, locations // 100)
+    ratings = min(ratings, users)
+    lng_min, lat_min, lng_max, lat_max = DA_NANG_BBOX
+
+    flush_dataset()
+    write_sample_image()
+    with transaction.atomic():
+        columns, rows = DISTRICT_GRID
+        step_lng, step_lat = (lng_max - lng_min) / columns, (lat_max - lat_min) / rows
+        districts = District.objects.bulk_create([
+            District(
+                name=f'{BENCH_DISTRICT_PREFIX}{row * columns + column + 1}',
+                geom=MultiPolygon(Polygon.from_bbox((
+                    lng_min + column * step_lng, lat_min + row * step_lat,
+                    lng_min + (column + 1) * step_lng, lat_min + (row + 1) * step_lat,
+                )), srid=4326),
+            )
+            for row in range(rows) for column in range(columns)
+        ])
+        log(f'{len(districts)} quận')
+
+        User.objects.create_user(username=BENCH_LOGIN, password=BENCH_PASSWORD)
+        user_ids = [user.pk for user in User.objects.bulk_create([
+            User(username=f'{BENCH_USER_PREFIX}user_{i}', password=make_password(None)) for i in range(users)
+        ])]
+        log(f'{users} người dùng')
+
+        for start in range(0, locations, SEED_BATCH_SIZE):
+            count = min(SEED_BATCH_SIZE, locations - start)
+            ids = BENCH_ID_START + start + np.arange(count)
+            lngs = rng.uniform(lng_min, lng_max, count)
+            lats = rng.uniform(lat_min, lat_max, count)
+            types = rng.integers(0, len(TOURISM_TYPES), count)
+            Location.objects.bulk_create([
+                Location(
+                    id=int(location_id),
+                    type='node',
+                    name=f'Bench {TOURISM_TYPES[kind]} {location_id - BENCH_ID_START}',
+                    tourism_type=TOURISM_TYPES[kind],
+                    geom=Point(float(lng), float(lat), srid=4326),
+                    details={'bench': True, 'title': 'Bench', 'short_description': 'Địa điểm benchmark ' * 8},
+                )
+                for location_id, lng, lat, kind in zip(ids.tolist(), lngs, lats, types.tolist())
+            ], batch_size=SEED_BATCH_SIZE)
+            Image.objects.bulk_create([
+                Image(location_id=int(location_id), url=BENCH_IMAGE_URL, image_order=order)
+                for location_id in ids.tolist() for order in range(1, images + 1)
+            ], batch_size=SEED_BATCH_SIZE)
+            # Mỗi địa điểm được ``ratings`` người dùng khác nhau đánh giá
+            offsets = rng.integers(0, len(user_ids), count)
+            scores = rng.integers(1, 6, (count, ratings))
+            Rating.objects.bulk_create([
+                Rating(location_id=int(location_id), user_id=user_ids[(offset + j) % len(user_ids)],
+                       score=int(scores[i, j]))
+                for i, (location_id, offset) in enumerate(zip(ids.tolist(), offsets.tolist())) for j in range(ratings)
+            ], batch_size=SEED_BATCH_SIZE)
+            log(f'{start + count}/{locations} địa điểm')
+
+        stops = ITINERARY_DAYS * STOPS_PER_DAY
+        created = Itinerary.objects.bulk_create([
+            Itinerary(user_id=user_ids[int(owner)], survey_data={'days': ITINERARY_DAYS, 'bench': True})
+            for owner in rng.integers(0, len(user_ids), itineraries)
+        ], batch_size=SEED_BATCH_SIZE)
+        itinerary_locations = []
+        for itinerary in created:
+            chosen = np.unique(rng.integers(0, locations, stops * 2))[:stops] if locations >= stops else np.arange(locations)
+            rng.shuffle(chosen)
+            itinerary_locations += [
+                ItineraryLocation(itinerary=itinerary, location_id=BENCH_ID_START + int(offset),
+                                  day=i // STOPS_PER_DAY + 1, visit_order=i % STOPS_PER_DAY + 1)
+                for i, offset in enumerate(chosen)
+            ]
+        ItineraryLocation.objects.bulk_create(itinerary_locations, batch_size=SEED_BATCH_SIZE)
+        log(f'{itineraries} lịch trình')
+
+        refresh_derived_data([district.pk for district in districts])
+    return {'locations': locations, 'images': locations * images, 'ratings': locations * ratings,
+            'itineraries': itineraries, 'users': users, 'seed': seed}
+
+
+def dataset_size():
+    return {
+        'locations': Location.objects.filter(id__gte=BENCH_ID_START).count(),
+        'images': Image.objects.filter(location_id__gte=BENCH_ID_START).count(),
+        'ratings': Rating.objects.filter(location_id__gte=BENCH_ID_START).count(),
+        'itineraries': Itinerary.objects.filter(user__username__startswith=BENCH_USER_PREFIX).count(),
+    }
+
+
+# Kịch bản: mỗi kịch bản là một request được sinh lại cho lần gọi thứ i
+
+class BenchContext:
+    """Các id/tên lấy mẫu từ dữ liệu benchmark, dùng để dựng URL cho từng request."""
+
+    def __init__(self, requests, seed=42):
+        rng = np.random.default_rng(seed)
+        self.run_id = uuid.uuid4().hex[:8]
+        self.location_ids = list(Location.objects.filter(id__gte=BENCH_ID_START)
+                                 .order_by('?').values_list('id', flat=True)[:1000])
+        if not self.location_ids:
+            raise ValueError('Chưa có dữ liệu benchmark: chạy seed_bench_data trước')
+        self.points = list(zip(rng.uniform(DA_NANG_BBOX[1], DA_NANG_BBOX[3], 100).tolist(),
+                               rng.uniform(DA_NANG_BBOX[0], DA_NANG_BBOX[2], 100).tolist()))
+        self.districts = list(District.objects.filter(name__startswith=BENCH_DISTRICT_PREFIX)
+                              .values_list('name', flat=True))
+        self.image_ids = list(Image.objects.filter(location_id__in=self.location_ids[:20]).values_list('id', flat=True))
+
+        # Người dùng của lần chạy này: sở hữu lịch trình để sửa/xoá và đánh giá để cập nhật
+        self.user = User.objects.create_user(username=f'{BENCH_USER_PREFIX}run_{self.run_id}')
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        source = (Itinerary.objects.filter(user__username__startswith=BENCH_USER_PREFIX, locations__isnull=False)
+                  .order_by('id').first())
+        self.itinerary = clone_itinerary(source, self.user)
+        self.stops = list(self.itinerary.locations.values_list('location_id', flat=True))
+        # Mỗi request xoá một lịch trình riêng
+        self.disposable = [
+            itinerary.pk for itinerary in Itinerary.objects.bulk_create([
+                Itinerary(user=self.user, survey_data={'bench': True}) for _ in range(requests)
+            ])
+        ]
+        self.rating = Rating.objects.create(user=self.user, location_id=self.location_ids[0], score=3)
+        self.tiles = [tile_for(lat, lng, z) for lat, lng in self.points[:20] for z in (12, 13, 14)]
+
+    def point(self, i):
+        return self.points[i % len(self.points)]
+
+    def location(self, i):
+        return self.location_ids[i % len(self.location_ids)]
+
+
+def tile_for(lat, lng, z):
+    n = 2 ** z
+    x = int((lng + 180) / 360 * n)
+    y = int((1 - np.arcsinh(np.tan(np.radians(lat))) / np.pi) / 2 * n)
+    return z, x, y
+
+
+class Scenario:
+    """Một loại request tới route ``url_name``; ``build(ctx, i)`` trả về ``(path, body)``."""
+
+    def __init__(self, name, url_name, build, method='get', auth=False, writes=False, ok=(200,)):
+        self.name = name
+        self.url_name = url_name
+        self.build = build
+        self.method = method
+        self.auth = auth
+        self.writes = writes
+        self.ok = ok
+
+
+def _locations(query):
+    return lambda ctx, i: (reverse('location-list') + query(ctx, i), None)
+
+
+SCENARIOS = [
+    Scenario('locations_page', 'location-list', _locations(lambda ctx, i: f'?page={i % 5 + 1}')),
+    Scenario('locations_all_marker', 'location-list', _locations(lambda ctx, i: '?all=true&view=marker')),
+    Scenario('locations_cursor', 'location-list', _locations(lambda ctx, i: '?pagination=cursor&count=false')),
+    Scenario('locations_search', 'location-list',
+             _locations(lambda ctx, i: f"?search=bench+{TOURISM_TYPES[i % 4]}&count=false")),
+    Scenario('locations_nearby', 'location-list',
+             _locations(lambda ctx, i: '?nearby=true&lat={}&lng={}&radius=2&limit=50'.format(*ctx.point(i)))),
+    Scenario('location_detail', 'location-detail',
+             lambda ctx, i: (reverse('location-detail', args=[ctx.location(i)]), None)),
+    Scenario('location_ratings', 'location-ratings',
+             lambda ctx, i: (reverse('location-ratings', args=[ctx.location(i)]), None)),
+    Scenario('alternatives', 'alternative-locations', lambda ctx, i: (
+        reverse('alternative-locations', args=[TOURISM_TYPES[i % 4]])
+        + f'?itinerary={ctx.itinerary.pk}&location={ctx.stops[i % len(ctx.stops)]}', None)),
+    Scenario('districts', 'district-list', lambda ctx, i: (reverse('district-list') + '?zoom=12', None)),
+    Scenario('district_detail', 'district-detail',
+             lambda ctx, i: (reverse('district-detail', args=[ctx.districts[i % len(ctx.districts)]]), None)),
+    Scenario('tile_locations', 'vector-tile',
+             lambda ctx, i: (reverse('vector-tile', args=['locations', *ctx.tiles[i % len(ctx.tiles)]]), None)),
+    Scenario('image_variant', 'image-variant', lambda ctx, i: (
+        reverse('image-variant', args=[ctx.image_ids[i % len(ctx.image_ids)], 640, 'jpeg']), None)),
+    Scenario('metrics', 'metrics', lambda ctx, i: (reverse('metrics'), None)),
+    Scenario('itinerary_suggest', 'itinerary-suggest', lambda ctx, i: (
+        reverse('itinerary-suggest'),
+        {'days': i % 3 + 1, 'latitude': ctx.point(i)[0], 'longitude': ctx.point(i)[1]}), method='post', ok=(201,)),
+    Scenario('itinerary_list', 'itinerary-list', lambda ctx, i: (reverse('itinerary-list'), None), auth=True),
+    Scenario('itinerary_save', 'itinerary-save',
+             lambda ctx, i: (reverse('itinerary-save', args=[ctx.itinerary.pk]), {}), method='post', auth=True,
+             writes=True),
+    Scenario('itinerary_patch', 'itinerary-update', lambda ctx, i: (
+        reverse('itinerary-update', args=[ctx.itinerary.pk]),
+        {'operations': [{'op': 'set_time', 'location_id': ctx.stops[i % len(ctx.stops)],
+                         'estimated_time': f'00:{i % 60:02d}:00'}]}), method='patch', auth=True, writes=True),
+    Scenario('itinerary_delete', 'itinerary-delete', lambda ctx, i: (
+        reverse('itinerary-delete', args=[ctx.disposable[i]]), None), method='delete', auth=True, writes=True,
+        ok=(204,)),
+    Scenario('signin', 'signin', lambda ctx, i: (
+        reverse('signin'), {'username': BENCH_LOGIN, 'password': BENCH_PASSWORD}), method='post'),
+    Scenario('signup', 'signup', lambda ctx, i: (reverse('signup'), {
+        'username': f'{BENCH_USER_PREFIX}signup_{ctx.run_id}_{i}', 'email': f'{ctx.run_id}_{i}@bench.invalid',
+        'password': BENCH_PASSWORD, 'confirm_password': BENCH_PASSWORD,
+    }), method='post', writes=True, ok=(201,)),
+    Scenario('rating_create', 'rating-create', lambda ctx, i: (
+        reverse('rating-create'), {'location': ctx.location_ids[1 + i % (len(ctx.location_ids) - 1)], 'score': 4}),
+        method='post', auth=True, writes=True, ok=(201,)),
+    Scenario('rating_update', 'rating-update', lambda ctx, i: (
+        reverse('rating-update', args=[ctx.rating.pk]), {'score': i % 5 + 1}), method='put', auth=True,
+        writes=True),
+]
+
+
+def uncovered_routes(scenarios=SCENARIOS):
+    """Tên các route trong tour_api/urls.py chưa có kịch bản nào."""
+    names = {pattern.name for pattern in urls.urlpatterns if isinstance(pattern, URLPattern) and pattern.name}
+    return sorted(names - {scenario.url_name for scenario in scenarios})
+
+
+# Chạy tải
+
+class InProcessTransport:
+    """Gọi view trong tiến trình bằng Django test Client; mỗi luồng một client và một kết nối DB."""
+    measures_queries = True
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def client(self):
+        if not hasattr(self.local, 'client'):
+            # ALLOWED_HOSTS rỗng khi DEBUG chỉ nhận localhost
+            self.local.client = Client(HTTP_HOST='localhost')
+        return self.local.client
+
+    def request(self, method, path, body, token):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        kwargs = {'data': json.dumps(body), 'content_type': 'application/json'} if body is not None else {}
+        response = getattr(self.client(), method)(path, **kwargs, **headers)
+        if response.streaming:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            size = len(response.content)
+        return response.status_code, size
+
+    def close_thread(self):
+        connection.close()
+
+
+class HttpTransport:
+    """Gọi một server đang chạy (runserver/gunicorn) qua HTTP; không đo được số query."""
+    measures_queries = False
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, body, token):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method.upper())
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, len(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, len(e.read())
+
+    def close_thread(self):
+        pass
+
+
+def count_queries(transport, scenario, ctx, i):
+    """Số query SQL của request thứ ``i`` (chạy riêng, tuần tự) — chỉ với InProcessTransport."""
+    if not transport.measures_queries:
+        return None
+    path, body = scenario.build(ctx, i)
+    with CaptureQueriesContext(connection) as queries:
+        transport.request(scenario.method, path, body, ctx.token if scenario.auth else None)
+    return len(queries)
+
+
+def run_scenario(transport, scenario, ctx, requests, concurrency):
+    latencies = np.zeros(requests)
+    sizes = np.zeros(requests, dtype=np.int64)
+    statuses = {}
+    lock = threading.Lock()
+    token = ctx.token if scenario.auth else None
+
+    def call(i):
+        path, body = scenario.build(ctx, i)
+        started = time.perf_counter()
+        status_code, size = transport.request(scenario.method, path, body, token)
+        latencies[i] = time.perf_counter() - started
+        sizes[i] = size
+        with lock:
+            statuses[status_code] = statuses.get(status_code, 0) + 1
+
+    def worker(indices):
+        try:
+            for i in indices:
+                call(i)
+        finally:
+            transport.close_thread()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # Chia đều các request cho từng luồng; mỗi luồng giữ một client/kết nối suốt lượt chạy
+        for future in [pool.submit(worker, range(k, requests, concurrency)) for k in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    p50, p95, p99 = np.percentile(latencies * 1000, [50, 95, 99])
+    errors = sum(count for status_code, count in statuses.items() if status_code not in scenario.ok)
+    return {
+        'url_name': scenario.url_name,
+        'method': scenario.method.upper(),
+        'writes': scenario.writes,
+        'requests': requests,
+        'concurrency': concurrency,
+        'p50_ms': round(float(p50), 2),
+        'p95_ms': round(float(p95), 2),
+        'p99_ms': round(float(p99), 2),
+        'mean_ms': round(float(latencies.mean() * 1000), 2),
+        'throughput_rps': round(requests / elapsed, 1) if elapsed > 0 else None,
+        'payload_bytes': int(np.median(sizes)),
+        'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+        'errors': errors,
+    }
+
+
+def run_benchmark(transport, requests=200, concurrency=8, warmup=5, only=None, skip_writes=False, log=print):
+    """Chạy mọi kịch bản (hoặc các kịch bản trong ``only``); trả về dict kết quả để ghi JSON."""
+    # Chỉ số 0..requests-1 cho phần đo, sau đó là làm nóng và một request đếm query
+    ctx = BenchContext(requests + warmup + 1)
+    scenarios = [
+        scenario for scenario in SCENARIOS
+        if (not only or scenario.name in only) and not (skip_writes and scenario.writes)
+        and not (scenario.url_name == 'image-variant' and not ctx.image_ids)
+    ]
+    results = {}
+    for scenario in scenarios:
+        # Lượt làm nóng (cache, snapshot, kết nối) dùng các chỉ số sau phần đo
+        for i in range(requests, requests + warmup):
+            path, body = scenario.build(ctx, i)
+            transport.request(scenario.method, path, body, ctx.token if scenario.auth else None)
+        queries = count_queries(transport, scenario, ctx, requests + warmup)
+        result = run_scenario(transport, scenario, ctx, requests, concurrency)
+        result['queries'] = queries
+        results[scenario.name] = result
+        log(format_row(scenario.name, result))
+
+    return {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'transport': type(transport).__name__,
+            'requests': requests,
+            'concurrency': concurrency,
+            'dataset': dataset_size(),
+            'uncovered_routes': uncovered_routes(scenarios),
+        },
+        'routes': results,
+    }
+
+
+# Báo cáo và so sánh với baseline
+
+HEADER = f"{'scenario':<22} {'p50':>8} {'p95':>8} {'p99':>8} {'rps':>8} {'queries':>7} {'bytes':>9} {'err':>5}"
+
+
+def format_row(name, result):
+    queries = '-' if result['queries'] is None else result['queries']
+    return (f"{name:<22} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+            f"{result['throughput_rps'] or 0:>8.1f} {queries:>7} {result['payload_bytes']:>9} {result['errors']:>5}")
+
+
+def compare(previous, current, threshold=0.2):
+    """So sánh từng kịch bản với baseline; trả về ``(dòng báo cáo, danh sách hồi quy)``.
+
+    Hồi quy: p95 tăng hoặc throughput giảm quá ``threshold`` (tỉ lệ), số query tăng, hoặc lỗi mới.
+    """
+    lines, regressions = [], []
+    for name, now in current['routes'].items():
+        before = previous.get('routes', {}).get(name)
+        if before is None:
+            lines.append(f'{name:<22} (mới)')
+            continue
+        problems = []
+        if before['p95_ms'] and now['p95_ms'] > before['p95_ms'] * (1 + threshold):
+            problems.append(f"p95 {before['p95_ms']:.1f} -> {now['p95_ms']:.1f} ms")
+        if before.get('throughput_rps') and (now['throughput_rps'] or 0) < before['throughput_rps'] * (1 - threshold):
+            problems.append(f"rps {before['throughput_rps']:.1f} -> {now['throughput_rps'] or 0:.1f}")
+        if before.get('queries') is not None and now['queries'] is not None and now['queries'] > before['queries']:
+            problems.append(f"queries {before['queries']} -> {now['queries']}")
+        if now['errors'] > before.get('errors', 0):
+            problems.append(f"errors {before.get('errors', 0)} -> {now['errors']}")
+
+        p95_change = (now['p95_ms'] / before['p95_ms'] - 1) * 100 if before['p95_ms'] else 0.0
+        payload_change = now['payload_bytes'] - before['payload_bytes']
+        lines.append(f"{name:<22} p95 {p95_change:+6.1f}%  payload {payload_change:+d} B"
+                     + (f"  REGRESSION: {'; '.join(problems)}" if problems else ''))
+        regressions += [f'{name}: {problem}' for problem in problems]
+    return lines, regressions
+
+
+# So sánh triển khai WSGI và ASGI
+#
+# Hai server chạy trên cùng DB đã seed, cùng số worker, vd.
+#   gunicorn tour.wsgi -w 4 -b 127.0.0.1:8000
+#   uvicorn tour.asgi:application --workers 4 --port 8001
+# Tải được sinh bằng asyncio (HTTP/1.1 keep-alive, mỗi kết nối gửi request tuần tự trong ``duration``
+# giây) để một tiến trình giữ được hàng nghìn kết nối đồng thời mà không cần hàng nghìn luồng.
+
+DEPLOYMENT_SCENARIOS = ['locations_page', 'locations_all_marker', 'location_detail', 'districts', 'itinerary_list']
+CONCURRENCY_LEVELS = (50, 200, 1000)
+
+
+class ReadContext:
+    """Như BenchContext nhưng không ghi gì: server ở tiến trình khác phải thấy cùng dữ liệu."""
+
+    def __init__(self):
+        self.location_ids = list(Location.objects.filter(id__gte=BENCH_ID_START)
+                                 .order_by('?').values_list('id', flat=True)[:1000])
+        if not self.location_ids:
+            raise ValueError('Chưa có dữ liệu benchmark: chạy seed_bench_data trước')
+        owner = (User.objects.filter(username__startswith=BENCH_USER_PREFIX, itineraries__isnull=False)
+                 .order_by('id').first())
+        self.token = str(RefreshToken.for_user(owner).access_token) if owner else None
+
+    def location(self, i):
+        return self.location_ids[i % len(self.location_ids)]
+
+
+async def http_get(reader, writer, host, path, token):
+    """Gửi một GET trên kết nối keep-alive; trả về ``(status, số byte body, server có đóng kết nối)``."""
+    head = f'GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: application/json\r\n'
+    if token:
+        head += f'Authorization: Bearer {token}\r\n'
+    writer.write((head + '\r\n').encode('latin-1'))
+    await writer.drain()
+
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError('server closed the connection')
+    status_code = int(status_line.split()[1])
+    length, chunked, close = None, False, False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding':
+            chunked = 'chunked' in value
+        elif name == 'connection':
+            close = value == 'close'
+
+    size = 0
+    if chunked:
+        while True:
+            chunk_size = int((await reader.readline()).split(b';')[0], 16)
+            if chunk_size == 0:
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                break
+            size += len(await reader.readexactly(chunk_size))
+            await reader.readexactly(2)
+    elif length is not None:
+        size = len(await reader.readexactly(length))
+    else:
+        size = len(await reader.read())
+        close = True
+    return status_code, size, close
+
+
+async def http_load(base_url, scenario, ctx, concurrency, duration, timeout=30.0):
+    """``concurrency`` kết nối cùng gọi ``scenario`` trong ``duration`` giây; kết quả như run_scenario."""
+    url = urlsplit(base_url)
+    if url.scheme != 'http':
+        raise ValueError(f'Chỉ hỗ trợ http://: {base_url}')
+    host, port = url.hostname, url.port or 80
+    prefix = url.path.rstrip('/')
+    token = ctx.token if scenario.auth else None
+    latencies, sizes, statuses = [], [], {}
+    counter = itertools.count()
+
+    async def connection_loop(deadline):
+        reader = writer = None
+        while time.perf_counter() < deadline:
+            path, _ = scenario.build(ctx, next(counter))
+            started = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+                status_code, size, close = await asyncio.wait_for(
+                    http_get(reader, writer, url.netloc, prefix + path, token), timeout)
+            except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                # Kết nối bị từ chối/đóng giữa chừng hoặc quá hạn: tính là lỗi rồi mở kết nối mới
+                statuses['error'] = statuses.get('error', 0) + 1
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+                continue
+            latencies.append(time.perf_counter() - started)
+            sizes.append(size)
+            statuses[status_code] = statuses.get(status_code, 0) + 1
+            if close:
+                writer.close()
+                reader = writer = None
+        if writer is not None:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*[connection_loop(started + duration) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies or [0.0]) * 1000
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    errors = sum(count for status_code, count in statuses.items() if status_code not in scenario.ok)
+    return {
+        'url_name': scenario.url_name,
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'p50_ms': round(float(p50), 2),
+        'p95_ms': round(float(p95), 2),
+        'p99_ms': round(float(p99), 2),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed > 0 else None,
+        'payload_bytes': int(np.median(sizes)) if sizes else 0,
+        'status_codes': {str(code): count for code, count in statuses.items()},
+        'errors': errors,
+    }
+
+
+DEPLOYMENT_HEADER = (f"{'scenario':<22} {'conns':>6} {'wsgi rps':>10} {'asgi rps':>10} {'ratio':>7} "
+                     f"{'wsgi p95':>9} {'asgi p95':>9} {'wsgi err':>9} {'asgi err':>9}")
+
+
+def format_deployment_row(name, concurrency, wsgi, asgi):
+    ratio = asgi['throughput_rps'] / wsgi['throughput_rps'] if wsgi['throughput_rps'] else 0.0
+    return (f"{name:<22} {concurrency:>6} {wsgi['throughput_rps'] or 0:>10.1f} {asgi['throughput_rps'] or 0:>10.1f} "
+            f"{ratio:>6.2f}x {wsgi['p95_ms']:>9.1f} {asgi['p95_ms']:>9.1f} {wsgi['errors']:>9} {asgi['errors']:>9}")
+
+
+def compare_deployments(wsgi_url, asgi_url, levels=CONCURRENCY_LEVELS, duration=10.0, warmup=2.0, timeout=30.0,
+                        only=None, log=print):
+    """Chạy từng kịch bản đọc ở từng mức ``levels`` kết nối trên cả hai server; trả về dict để ghi JSON."""
+    ctx = ReadContext()
+    by_name = {scenario.name: scenario for scenario in SCENARIOS}
+    scenarios = [by_name[name] for name in DEPLOYMENT_SCENARIOS if not only or name in only]
+    if ctx.token is None:
+        scenarios = [scenario for scenario in scenarios if not scenario.auth]
+    targets = {'wsgi': wsgi_url, 'asgi': asgi_url}
+
+    results = {}
+    for scenario in scenarios:
+        results[scenario.name] = {}
+        for concurrency in levels:
+            row = {}
+            for name, base_url in targets.items():
+                # Làm nóng cache, snapshot và kết nối DB của các worker
+                asyncio.run(http_load(base_url, scenario, ctx, min(concurrency, 10), warmup, timeout))
+                row[name] = asyncio.run(http_load(base_url, scenario, ctx, concurrency, duration, timeout))
+            results[scenario.name][str(concurrency)] = row
+            log(format_deployment_row(scenario.name, concurrency, row['wsgi'], row['asgi']))
+
+    return {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'targets': targets,
+            'levels': list(levels),
+            'duration_s': duration,
+            'dataset': dataset_size(),
+        },
+        'scenarios': results,
+    }
+
+
+# Ma trận thời gian đi đường bộ
+#
+# Đo trên đồ thị ROUTING_GRAPH (đã build từ file OSM) hoặc trên mạng lưới đường giả synthetic_network():
+# lưới ô bàn cờ phủ DA_NANG_BBOX, bị một "con sông" dọc chia đôi và chỉ nối qua vài cây cầu, một số phố
+# một chiều, để khoảng cách đường bộ khác hẳn đường chim bay như thực tế.
+
+MATRIX_SIZES = (10, 50, 100, 250, 500)
+SYNTHETIC_ROAD_CLASSES = ['primary', 'secondary', 'tertiary', 'residential']
+
+
+def synthetic_network(rows=150, cols=150, bridges=4, bbox=DA_NANG_BBOX, seed=42):
+    """Phần tử OSM (node, way) của một mạng lưới đường giả ``rows`` x ``cols`` nút giao."""
+    rng = np.random.default_rng(seed)
+    lng_min, lat_min, lng_max, lat_max = bbox
+    lat = np.linspace(lat_min, lat_max, rows)[:, None] + rng.normal(0, 1e-4, (rows, cols))
+    lng = np.linspace(lng_min, lng_max, cols)[None, :] + rng.normal(0, 1e-4, (rows, cols))
+    node_id = np.arange(1, rows * cols + 1).reshape(rows, cols)
+    elements = [{'type': 'node', 'id': int(node_id[r, c]), 'lat': float(lat[r, c]), 'lon': float(lng[r, c])}
+                for r in range(rows) for c in range(cols)]
+
+    way_id = itertools.count(1)
+
+    def way(refs, **tags):
+        tags.setdefault('highway', SYNTHETIC_ROAD_CLASSES[int(rng.integers(len(SYNTHETIC_ROAD_CLASSES)))])
+        elements.append({'type': 'way', 'id': next(way_id), 'nodes': [int(ref) for ref in refs], 'tags': tags})
+
+    river = cols // 2
+    for r in range(rows):
+        oneway = {'oneway': 'yes'} if r % 4 == 3 else {}
+        way(node_id[r, :river], **oneway)
+        way(node_id[r, river:], **oneway)
+    for r in np.linspace(0, rows - 1, bridges + 2)[1:-1].astype(int):
+        way(node_id[r, river - 1:river + 1], highway='primary')
+    for c in range(cols):
+        way(node_id[:, c])
+    return elements
+
+
+MATRIX_HEADER = f"{'size':>9} {'cold ms':>9} {'warm ms':>9} {'us/cell':>8} {'detour':>7}"
+
+
+def format_matrix_row(size, result):
+    return (f"{f'{size}x{size}':>9} {result['cold_ms']:>9.1f} {result['warm_ms']:>9.1f} "
+            f"{result['cold_us_per_cell']:>8.2f} {result['detour_p50']:>7.2f}")
+
+
+def bench_matrices(engine, sizes=MATRIX_SIZES, repeats=3, seed=42, log=print):
+    """Thời gian tính ma trận ``n x n`` cho từng ``n`` trong ``sizes``: lần đầu (cache lượt tìm rỗng) và
+    trung vị ``repeats`` lần sau; ``detour`` là trung vị tỉ lệ quãng đường bộ / đường chim bay."""
+    rng = np.random.default_rng(seed)
+    results = {}
+    for size in sizes:
+        # Điểm quanh các nút đường ngẫu nhiên, lệch vài chục mét như địa điểm thật nằm cạnh đường
+        picked = rng.choice(len(engine), size=size, replace=size > len(engine))
+        lat = engine.lat[picked] + rng.normal(0, 2e-4, size)
+        lng = engine.lng[picked] + rng.normal(0, 2e-4, size)
+
+        engine.clear_cache()
+        started = time.perf_counter()
+        seconds, metres = engine.matrix(lat, lng)
+        cold = time.perf_counter() - started
+        warm = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            engine.matrix(lat, lng)
+            warm.append(time.perf_counter() - started)
+
+        straight = routing.haversine_matrix(lat, lng)
+        off_diagonal = straight > 0
+        results[str(size)] = {
+            'cold_ms': round(cold * 1000, 2),
+            'warm_ms': round(float(np.median(warm)) * 1000, 2),
+            'cold_us_per_cell': round(cold * 1e6 / (size * size), 3),
+            'detour_p50': round(float(np.median(metres[off_diagonal] / straight[off_diagonal])), 3),
+            'mean_travel_s': round(float(seconds[off_diagonal].mean()), 1),
+        }
+        log(format_matrix_row(size, results[str(size)]))
+    return {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'nodes': len(engine),
+            'upward_edges': int(len(engine.arrays['fwd_head']) + len(engine.arrays['bwd_head'])),
+            'repeats': repeats,
+        },
+        'sizes': results,
+    }
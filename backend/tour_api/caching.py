@@ -0,0 +1,189 @@
+# tour_api/caching.py
+# Cache response cho các endpoint đọc + ETag/Last-Modified và trả 304 cho request có điều kiện.
+#
+# Mỗi response phụ thuộc vào một số "tag" (vd. 'locations', 'location:42'). Version của tag là
+# thời điểm nó bị invalidate lần cuối; key cache gồm cả version nên khi signal gọi invalidate(tag)
+# thì các entry cũ tự nhiên không còn được dùng nữa (và hết hạn theo TIMEOUT của backend).
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework.response import Response
+
+TAG_PREFIX = 'tour_api:tag:'
+RESPONSE_PREFIX = 'tour_api:response:'
+# Response dạng stream chỉ được lưu cache nếu tổng kích thước không vượt quá ngưỡng này
+STREAM_CACHE_MAX_BYTES = 8 * 1024 * 1024
+
+
+def get_cache():
+    return caches[getattr(settings, 'TOUR_API_CACHE', 'default')]
+
+
+def invalidate(*tags):
+    now = time.time()
+    get_cache().set_many({TAG_PREFIX + tag: now for tag in tags}, timeout=None)
+
+
+def invalidate_on_commit(*tags):
+    """Invalidate ngay (để chính transaction đang ghi thấy dữ liệu mới) và lần nữa khi transaction commit.
+
+    Entry mà worker khác lưu trong khoảng giữa hai lần được render từ dữ liệu chưa commit (tức dữ liệu
+    cũ), lần invalidate sau commit làm chúng không còn được dùng. Transaction rollback thì chỉ mất cache.
+    """
+    invalidate(*tags)
+    transaction.on_commit(lambda: invalidate(*tags))
+
+
+def tag_versions(tags):
+    cache = get_cache()
+    keys = [TAG_PREFIX + tag for tag in tags]
+    versions = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in versions}
+    if missing:
+        for key, value in missing.items():
+            cache.add(key, value, timeout=None)
+        versions.update(cache.get_many(list(missing)))
+    return [versions.get(key, 0.0) for key in keys]
+
+
+def normalized_params(query_params):
+    # Bỏ tham số rỗng và sắp xếp để ?a=1&b=2 và ?b=2&a=1 dùng chung một entry
+    return sorted(
+        (key, sorted(value for value in values if value != ''))
+        for key, values in query_params.lists()
+        if any(value != '' for value in values)
+    )
+
+
+def not_modified(request, etag, last_modified):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        candidates = [value.strip() for value in if_none_match.split(',')]
+        return '*' in candidates or etag in candidates
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and int(last_modified) <= if_modified_since
+
+
+def response_cache_key(view_name, kwargs, query_params, fmt, tags):
+    """Key cache của response và thời điểm Last-Modified (version mới nhất của các tag)."""
+    versions = tag_versions(tags)
+    raw_key = repr((view_name, sorted(kwargs.items()), normalized_params(query_params), fmt, versions))
+    key = RESPONSE_PREFIX + hashlib.sha1(raw_key.encode('utf-8')).hexdigest()
+    return key, max(versions) if versions else time.time()
+
+
+def cache_entry(content, content_type, last_modified):
+    return {
+        'content': content,
+        'content_type': content_type,
+        'etag': quote_etag(hashlib.sha256(content).hexdigest()),
+        'last_modified': last_modified,
+    }
+
+
+def cached_response(request, entry):
+    if not_modified(request, entry['etag'], entry['last_modified']):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    response['X-Cache'] = 'HIT'
+    patch_vary_headers(response, ('Accept',))
+    return response
+
+
+def miss_response(request, response, entry):
+    # Client có thể đã có đúng nội dung này từ worker khác
+    if not_modified(request, entry['etag'], entry['last_modified']):
+        return cached_response(request, entry)
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+class StreamCollector:
+    """Gom các chunk của response stream để lưu cache; bỏ khi vượt STREAM_CACHE_MAX_BYTES."""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def add(self, chunk):
+        if self.chunks is None:
+            return
+        self.size += len(chunk)
+        if self.size > STREAM_CACHE_MAX_BYTES:
+            self.chunks = None
+        else:
+            self.chunks.append(chunk)
+
+    def content(self):
+        return None if self.chunks is None else b''.join(self.chunks)
+
+
+class CachedResponseMixin:
+    """Cache toàn bộ response GET của view theo tham số truy vấn và version của các tag.
+
+    View khai báo ``get_cache_tags()`` trả về danh sách tag mà dữ liệu của nó phụ thuộc.
+    """
+
+    def get_cache_tags(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        return self.cached_get(super().get, request, *args, **kwargs)
+
+    def cached_get(self, handler, request, *args, **kwargs):
+        """Trả entry trong cache nếu có, ngược lại gọi ``handler`` và đánh dấu response để lưu cache.
+
+        View tự viết ``get()`` gọi hàm này với handler của mình. Key không chứa user: kiểm tra quyền
+        trên dữ liệu riêng của user phải làm trước khi gọi.
+        """
+        key, last_modified = response_cache_key(
+            self.__class__.__name__, kwargs, request.query_params, request.accepted_renderer.format,
+            self.get_cache_tags(),
+        )
+        entry = get_cache().get(key)
+        if entry is not None:
+            return cached_response(request, entry)
+
+        response = handler(request, *args, **kwargs)
+        response._tour_cache = (key, last_modified)
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        marker = getattr(response, '_tour_cache', None)
+        if marker is None or response.status_code != 200:
+            return response
+        if isinstance(response, StreamingHttpResponse):
+            response.streaming_content = self.tee_to_cache(
+                response.streaming_content, response['Content-Type'], *marker)
+            response['X-Cache'] = 'MISS'
+            return response
+        if not isinstance(response, Response):
+            return response
+
+        key, last_modified = marker
+        response.render()
+        entry = cache_entry(response.content, response['Content-Type'], last_modified)
+        get_cache().set(key, entry)
+        return miss_response(request, response, entry)
+
+    def tee_to_cache(self, streaming_content, content_type, key, last_modified):
+        # Vừa stream cho client vừa gom lại; bỏ qua cache nếu nội dung quá lớn
+        collector = StreamCollector()
+        for chunk in streaming_content:
+            collector.add(chunk)
+            yield chunk
+        content = collector.content()
+        if content is not None:
+            get_cache().set(key, cache_entry(content, content_type, last_modified))
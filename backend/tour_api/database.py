@@ -0,0 +1,204 @@
+# tour_api/database.py
+# Kết nối DB cho request: ngân sách statement_timeout theo từng endpoint, trả 503 khi query bị huỷ vì
+# quá ngân sách hoặc không lấy được kết nối từ pool, và thống kê pool cho MetricsView.
+#
+# Mỗi request dùng DB_STATEMENT_TIMEOUTS[<tên URL>] (mặc định DB_STATEMENT_TIMEOUT_MS). Lệnh SET chỉ chạy
+# khi ngân sách khác giá trị đang đặt trên kết nối (ghi nhớ theo từng kết nối của driver, kể cả khi kết nối
+# quay vòng trong pool), nên các request liên tiếp cùng ngân sách không tốn thêm round-trip; lệnh này đi
+# thẳng vào cursor của driver nên không tính vào số query của request. Ngoài request (lệnh quản trị, ...)
+# kết nối giữ nguyên mặc định của server.
+import contextvars
+import functools
+import weakref
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.db.backends.signals import connection_created
+from django.http import JsonResponse, StreamingHttpResponse
+
+from .instrumentation import registry
+
+try:
+    from psycopg_pool import PoolTimeout
+except ImportError:  # psycopg_pool là tuỳ chọn; không có thì settings dùng CONN_MAX_AGE thay cho pool
+    PoolTimeout = None
+
+QUERY_CANCELED = '57014'
+
+TIMEOUT_MESSAGES = {
+    'statement_timeout': 'Truy vấn vượt quá thời gian cho phép, vui lòng thử lại sau',
+    'pool_timeout': 'Máy chủ đang quá tải, vui lòng thử lại sau',
+}
+
+_budget = contextvars.ContextVar('tour_api_statement_budget', default=None)
+# Kết nối của driver -> statement_timeout (ms) đã đặt và đã commit
+_applied = weakref.WeakKeyDictionary()
+
+
+class RequestBudget:
+    def __init__(self, request):
+        self.request = request
+        self.pending = {}  # SET trong transaction chưa commit: kết nối của driver -> (ms, callback on_commit)
+
+    @property
+    def ms(self):
+        # resolver_match chỉ có sau khi URL được resolve, trước khi view chạy query đầu tiên
+        match = getattr(self.request, 'resolver_match', None)
+        default = getattr(settings, 'DB_STATEMENT_TIMEOUT_MS', 0)
+        if match is None:
+            return default
+        return getattr(settings, 'DB_STATEMENT_TIMEOUTS', {}).get(match.view_name, default)
+
+
+def _pending_ms(budget, connection, raw):
+    pending = budget.pending.get(raw)
+    if pending is None:
+        return None
+    wanted, callback = pending
+    # Rollback (cả transaction hay savepoint) huỷ lệnh SET và Django bỏ luôn callback on_commit đăng ký
+    # cùng lúc: callback không còn trong hàng đợi nghĩa là phải SET lại
+    if any(entry[1] is callback for entry in connection.run_on_commit):
+        return wanted
+    del budget.pending[raw]
+    return None
+
+
+def _apply_budget(execute, sql, params, many, context):
+    budget = _budget.get()
+    connection = context['connection']
+    if budget is not None and connection.vendor == 'postgresql':
+        raw = connection.connection
+        wanted = budget.ms
+        if _applied.get(raw) != wanted and _pending_ms(budget, connection, raw) != wanted:
+            with raw.cursor() as cursor:
+                cursor.execute(f'SET statement_timeout = {int(wanted)}')
+            if connection.in_atomic_block:
+                # SET trong transaction bị huỷ theo nếu rollback: chỉ ghi nhớ khi đã commit
+                _applied.pop(raw, None)
+                callback = functools.partial(_applied.__setitem__, raw, wanted)
+                budget.pending[raw] = (wanted, callback)
+                connection.on_commit(callback)
+            else:
+                _applied[raw] = wanted
+    return execute(sql, params, many, context)
+
+
+def install_budget(connection):
+    if _apply_budget not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_apply_budget)
+
+
+def _install_on_connect(sender, connection, **kwargs):
+    install_budget(connection)
+
+
+connection_created.connect(_install_on_connect)
+
+
+def timeout_reason(exception):
+    """'statement_timeout' / 'pool_timeout' nếu lỗi DB là do quá thời gian, ngược lại None."""
+    if not isinstance(exception, OperationalError):
+        return None
+    cause = exception.__cause__
+    if PoolTimeout is not None and isinstance(cause, PoolTimeout):
+        return 'pool_timeout'
+    code = getattr(cause, 'sqlstate', None) or getattr(cause, 'pgcode', None)
+    return 'statement_timeout' if code == QUERY_CANCELED else None
+
+
+class StatementTimeoutMiddleware:
+    """Đặt ngay sau InstrumentationMiddleware để 503 vẫn được đo và đếm."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        for alias in connections:
+            install_budget(connections[alias])
+        budget = RequestBudget(request)
+        token = _budget.set(budget)
+        try:
+            response = self.get_response(request)
+        finally:
+            _budget.reset(token)
+        return self.wrap_stream(response, budget)
+
+    async def __acall__(self, request):
+        budget = RequestBudget(request)
+        token = _budget.set(budget)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _budget.reset(token)
+        return self.wrap_stream(response, budget)
+
+    def wrap_stream(self, response, budget):
+        # Query của response stream chạy khi nội dung được đọc, sau khi __call__ đã trả về
+        if not isinstance(response, StreamingHttpResponse):
+            return response
+        if response.is_async:
+            response.streaming_content = self.afinish_stream(response.streaming_content, budget)
+        else:
+            response.streaming_content = self.finish_stream(response.streaming_content, budget)
+        return response
+
+    def finish_stream(self, content, budget):
+        _budget.set(budget)
+        try:
+            yield from content
+        finally:
+            _budget.set(None)
+
+    async def afinish_stream(self, content, budget):
+        _budget.set(budget)
+        try:
+            async for chunk in content:
+                yield chunk
+        finally:
+            _budget.set(None)
+
+    def process_exception(self, request, exception):
+        reason = timeout_reason(exception)
+        if reason is None:
+            return None
+        match = getattr(request, 'resolver_match', None)
+        registry.count_event(match.view_name if match else 'unresolved', reason)
+        response = JsonResponse({'error': TIMEOUT_MESSAGES[reason]}, status=503,
+                                json_dumps_params={'ensure_ascii': False})
+        response['Retry-After'] = '1'
+        return response
+
+
+def pool_stats():
+    """Thống kê pool kết nối theo alias (psycopg_pool); alias không dùng pool bị bỏ qua."""
+    stats = {}
+    for alias in connections:
+        pool = getattr(connections[alias], 'pool', None)
+        if pool is None:
+            continue
+        raw = pool.get_stats()
+        size, available = raw.get('pool_size', 0), raw.get('pool_available', 0)
+        requests = raw.get('requests_num', 0)
+        stats[alias] = {
+            'min_size': raw.get('pool_min', 0),
+            'max_size': raw.get('pool_max', 0),
+            'size': size,
+            'in_use': size - available,
+            'available': available,
+            'waiting': raw.get('requests_waiting', 0),
+            # Tỉ lệ kết nối đang bận so với kích thước tối đa; 1.0 nghĩa là request mới phải chờ
+            'saturation': round((size - available) / raw['pool_max'], 3) if raw.get('pool_max') else None,
+            'requests': requests,
+            'requests_queued': raw.get('requests_queued', 0),
+            'wait_ms_total': raw.get('requests_wait_ms', 0),
+            'mean_wait_ms': round(raw.get('requests_wait_ms', 0) / requests, 3) if requests else None,
+            'errors': raw.get('requests_errors', 0),
+        }
+    return stats
@@ -0,0 +1,87 @@
+# tour_api/districts.py
+# Hình học quận/huyện được đơn giản hoá sẵn theo nhiều mức phân giải.
+from django.db import connection, transaction
+
+from .caching import invalidate_on_commit
+from .snapshot import bump_version
+
+# (level, zoom tối đa, tolerance theo độ, số chữ số thập phân của toạ độ)
+# 1e-3 độ ~ 110 m ở Đà Nẵng; precision được chọn cỡ một pixel ở zoom tương ứng.
+GEOMETRY_LEVELS = [
+    (0, 9, 0.002, 3),
+    (1, 11, 0.0005, 4),
+    (2, 13, 0.0001, 5),
+    (3, 15, 0.00002, 6),
+    (4, 22, 0.000005, 6),
+]
+
+SIMPLIFY_SQL = """
+    INSERT INTO district_geometries (district_id, level, tolerance, geojson)
+    SELECT d.id, %(level)s, %(tolerance)s,
+           ST_AsGeoJSON(ST_Multi(ST_SimplifyPreserveTopology(d.geom, %(tolerance)s)), %(precision)s)
+    FROM districts d
+    WHERE %(ids)s::int[] IS NULL OR d.id = ANY(%(ids)s::int[])
+    ON CONFLICT (district_id, level) DO UPDATE
+        SET tolerance = EXCLUDED.tolerance, geojson = EXCLUDED.geojson
+"""
+
+
+def level_for_zoom(zoom):
+    for level, max_zoom, _tolerance, _precision in GEOMETRY_LEVELS:
+        if zoom <= max_zoom:
+            return level
+    return GEOMETRY_LEVELS[-1][0]
+
+
+def level_for_tolerance(tolerance):
+    # Mức thô nhất mà vẫn chi tiết hơn (tolerance nhỏ hơn hoặc bằng) giá trị yêu cầu
+    for level, _max_zoom, level_tolerance, _precision in GEOMETRY_LEVELS:
+        if level_tolerance <= tolerance:
+            return level
+    return GEOMETRY_LEVELS[-1][0]
+
+
+def rebuild_district_geometries(district_ids=None):
+    """Tính lại mọi mức đơn giản hoá cho các quận trong ``district_ids`` (None = tất cả)."""
+    ids = list(district_ids) if district_ids is not None else None
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for level, _max_zoom, tolerance, precision in GEOMETRY_LEVELS:
+                cursor.execute(SIMPLIFY_SQL, {
+                    'level': level,
+                    'tolerance': tolerance,
+                    'precision': precision,
+                    'ids': ids,
+                })
+    invalidate_on_commit('districts', 'districts:bulk')
+
+
+# Gán quận cho địa điểm bằng một câu spatial join thay vì ST_Within mỗi request
+ASSIGN_SQL = """
+    UPDATE locations l SET district_id = sub.district_id
+    FROM (
+        SELECT loc.id,
+               (SELECT d.id FROM districts d
+                WHERE loc.geom IS NOT NULL AND ST_Within(loc.geom, d.geom)
+                ORDER BY d.id LIMIT 1) AS district_id
+        FROM locations loc
+        WHERE %(ids)s::bigint[] IS NULL OR loc.id = ANY(%(ids)s::bigint[])
+    ) sub
+    WHERE l.id = sub.id AND l.district_id IS DISTINCT FROM sub.district_id
+    RETURNING l.id
+"""
+
+
+def assign_location_districts(location_ids=None):
+    """Cập nhật ``Location.district`` cho các địa điểm trong ``location_ids`` (None = tất cả).
+
+    Trả về số dòng thay đổi.
+    """
+    ids = list(location_ids) if location_ids is not None else None
+    with connection.cursor() as cursor:
+        cursor.execute(ASSIGN_SQL, {'ids': ids})
+        changed = [row[0] for row in cursor.fetchall()]
+    if changed:
+        bump_version()
+        invalidate_on_commit('locations', 'districts', 'districts:bulk', *(f'location:{pk}' for pk in changed))
+    return len(changed)
@@ -0,0 +1,89 @@
+# tour_api/fieldsets.py
+# Sparse fieldset: client chọn field cần trả về bằng ?fields=, thêm quan hệ bằng ?expand=,
+# hoặc dùng một profile đặt tên (?view=marker). Serializer bỏ các field không được chọn,
+# prefetching.optimize_queryset dựa vào đó để bỏ prefetch thừa và chỉ SELECT các cột cần thiết.
+from rest_framework.exceptions import ValidationError
+
+
+def _split(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def requested_fields(request, serializer_class):
+    """Tập field được yêu cầu cho ``serializer_class``; ``None`` nghĩa là trả về tất cả.
+
+    ``?fields=`` hoặc ``?view=`` chọn tập cơ sở, ``?expand=`` bổ sung thêm vào tập đó.
+    Không có ``?fields=``/``?view=`` thì giữ nguyên toàn bộ field như trước.
+    """
+    params = request.query_params
+    fields = params.get('fields')
+    view = params.get('view')
+    if not fields and not view:
+        return None
+
+    available = set(serializer_class().fields)
+    if fields:
+        selected = _split(fields)
+    else:
+        profiles = getattr(serializer_class, 'field_profiles', {})
+        if view not in profiles:
+            raise ValidationError({"error": f"Invalid view: {view}"})
+        selected = list(profiles[view])
+    selected += _split(params.get('expand', ''))
+
+    unknown = [name for name in selected if name not in available]
+    if unknown:
+        raise ValidationError({"error": f"Invalid field: {', '.join(unknown)}"})
+    return frozenset(selected)
+
+
+def sparse_context(request, serializer_class):
+    return {serializer_class.sparse_context_key: requested_fields(request, serializer_class)}
+
+
+class SparseFieldsMixin:
+    """Mixin cho ModelSerializer: chỉ giữ các field có trong ``context[sparse_context_key]``.
+
+    ``field_columns`` khai báo cột cần đọc cho các field không ánh xạ thẳng vào một cột
+    (SerializerMethodField, ...); ``field_profiles`` là các tập field đặt tên cho ``?view=``.
+    """
+    sparse_context_key = None
+    field_columns = {}
+    field_profiles = {}
+
+    def get_selected_fields(self):
+        return self.context.get(self.sparse_context_key)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected = self.get_selected_fields()
+        if selected is None:
+            return fields
+        return {name: field for name, field in fields.items() if name in selected}
+
+    def get_columns(self):
+        """Danh sách cột cho ``QuerySet.only()``, hoặc ``None`` khi cần cả bản ghi."""
+        if self.get_selected_fields() is None:
+            return None
+        concrete = {field.name for field in self.Meta.model._meta.concrete_fields}
+        columns = []
+        for name, field in self.fields.items():
+            if name in self.field_columns:
+                columns.extend(self.field_columns[name])
+            elif field.source in concrete:
+                columns.append(field.source)
+        return columns
+
+
+class SparseFieldsViewMixin:
+    """Mixin cho view: đưa field đã chọn vào context của serializer (và của cả bộ lập prefetch).
+
+    ``sparse_serializer_class`` là serializer nhận ?fields=, mặc định là serializer của view;
+    đặt khác đi khi nó chỉ là serializer lồng bên trong (vd. địa điểm trong lịch trình).
+    """
+    sparse_serializer_class = None
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context.update(sparse_context(self.request, self.sparse_serializer_class or self.get_serializer_class()))
+        return context
@@ -0,0 +1,36 @@
+# tour_api/geo.py
+# Truy vấn khoảng cách theo geography (mét) và sắp xếp KNN dùng index GiST.
+from django.contrib.gis.db.models import GeographyField
+from django.contrib.gis.measure import D
+from django.db.models import FloatField, Func, Value
+from django.db.models.functions import Cast
+
+
+def as_geography(expression):
+    # Phải khớp biểu thức của index locations_geog_idx để planner dùng được index
+    return Cast(expression, output_field=GeographyField(srid=4326))
+
+
+class KnnDistance(Func):
+    """Toán tử ``<->``: ORDER BY ... LIMIT được phục vụ trực tiếp từ index GiST."""
+    arg_joiner = ' <-> '
+    template = '(%(expressions)s)'
+    output_field = FloatField()
+
+
+def nearby_locations(queryset, point, radius_m=None):
+    """Lọc trong bán kính ``radius_m`` mét (nếu có), gắn ``distance_m`` và sắp xếp gần trước.
+
+    ``knn_distance`` là giá trị dùng để sắp xếp, cũng là khoá của phân trang cursor.
+    """
+    geog = as_geography('geom')
+    target = Value(point, output_field=GeographyField(srid=4326))
+
+    queryset = queryset.filter(geom__isnull=False).alias(geog=geog)
+    if radius_m is not None:
+        queryset = queryset.filter(geog__dwithin=(point, D(m=radius_m)))
+
+    return queryset.annotate(
+        distance_m=Func(geog, target, function='ST_Distance', output_field=FloatField()),
+        knn_distance=KnnDistance(geog, target),
+    ).order_by('knn_distance', 'id')
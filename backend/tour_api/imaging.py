@@ -0,0 +1,216 @@
+# tour_api/imaging.py
+# Sinh ảnh thu nhỏ (variant) cho media/images: nhiều chiều rộng, định dạng AVIF (nếu Pillow hỗ trợ),
+# WebP và JPEG dự phòng, kèm kích thước, dung lượng và blurhash để frontend hiện placeholder.
+#
+# Phần xử lý ảnh (process_image) chỉ dùng Pillow/NumPy, không chạm tới DB, để chạy được trong
+# ProcessPoolExecutor: lệnh build_image_variants xử lý hàng loạt, còn ImageVariantView sinh lười
+# variant được yêu cầu ở request đầu tiên rồi phục vụ từ cache trên đĩa (MEDIA_ROOT/variants).
+import os
+import tempfile
+import threading
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+try:
+    from PIL import Image as PILImage, ImageOps, UnidentifiedImageError, features
+except ImportError:  # Pillow là tuỳ chọn; không có thì ImageSerializer chỉ trả url gốc
+    PILImage = None
+
+    class UnidentifiedImageError(OSError):
+        pass
+
+VARIANT_WIDTHS = (320, 640, 1024)
+# Không sinh variant rộng hơn mức này dù ảnh gốc lớn hơn
+MAX_VARIANT_WIDTH = 1600
+
+FORMAT_OPTIONS = {
+    'avif': {'format': 'AVIF', 'quality': 55, 'speed': 8},
+    'webp': {'format': 'WEBP', 'quality': 75, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 78, 'optimize': True, 'progressive': True},
+}
+CONTENT_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+BLURHASH_COMPONENTS = (4, 3)
+BLURHASH_SAMPLE_WIDTH = 32
+BASE83 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+
+
+@lru_cache(maxsize=None)
+def available_formats():
+    """Định dạng sinh được với bản Pillow hiện có, tốt nhất trước; JPEG luôn có để dự phòng."""
+    if PILImage is None:
+        return ()
+    formats = []
+    if features.check('avif'):
+        formats.append('avif')
+    if features.check('webp'):
+        formats.append('webp')
+    formats.append('jpeg')
+    return tuple(formats)
+
+
+def variant_widths(width=None):
+    """Các chiều rộng variant của ảnh rộng ``width`` px (không phóng to ảnh nhỏ)."""
+    if width is None:
+        return list(VARIANT_WIDTHS)
+    top = min(width, MAX_VARIANT_WIDTH)
+    return sorted({w for w in VARIANT_WIDTHS if w < top} | {top})
+
+
+# Đường dẫn: MEDIA_ROOT/<ảnh gốc> -> MEDIA_ROOT/variants/<ảnh gốc không đuôi>-<width>.<format>
+
+def source_path(url):
+    return Path(settings.MEDIA_ROOT) / url.lstrip('/')
+
+
+def variant_base(url):
+    stem = os.path.splitext(url.lstrip('/'))[0]
+    return str(Path(settings.MEDIA_ROOT) / 'variants' / stem)
+
+
+def variant_path(url, width, fmt):
+    return Path(f'{variant_base(url)}-{width}.{fmt}')
+
+
+# Blurhash (https://blurha.sh), tính bằng NumPy trên ảnh đã thu nhỏ
+
+def _base83(value, length):
+    return ''.join(BASE83[(value // 83 ** (length - i - 1)) % 83] for i in range(length))
+
+
+def _srgb_to_linear(values):
+    values = values / 255.0
+    return np.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+
+
+def _linear_to_srgb(value):
+    value = min(max(value, 0.0), 1.0)
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def blurhash(pixels, components=BLURHASH_COMPONENTS):
+    """Blurhash của mảng RGB ``pixels`` (cao x rộng x 3, uint8)."""
+    cx, cy = components
+    height, width = pixels.shape[:2]
+    linear = _srgb_to_linear(pixels.astype(np.float64))
+
+    basis_x = np.cos(np.pi * np.outer(np.arange(cx), np.arange(width)) / width)     # cx x width
+    basis_y = np.cos(np.pi * np.outer(np.arange(cy), np.arange(height)) / height)   # cy x height
+    # factors[j, i] = trung bình của basis_y[j] * basis_x[i] * pixel, theo từng kênh màu
+    factors = np.einsum('jy,ix,yxc->jic', basis_y, basis_x, linear) / (width * height)
+    factors[1:, :] *= 2
+    factors[0, 1:] *= 2
+
+    dc = factors[0, 0]
+    ac = factors.reshape(-1, 3)[1:]
+
+    result = _base83((cx - 1) + (cy - 1) * 9, 1)
+    if len(ac):
+        quantised_max = int(max(0, min(82, np.floor(np.abs(ac).max() * 166 - 0.5))))
+        maximum = (quantised_max + 1) / 166
+        result += _base83(quantised_max, 1)
+    else:
+        maximum = 1.0
+        result += _base83(0, 1)
+
+    r, g, b = (_linear_to_srgb(value) for value in dc)
+    result += _base83((r << 16) + (g << 8) + b, 4)
+
+    quantised = np.floor(np.clip(np.sign(ac) * np.abs(ac / maximum) ** 0.5 * 9 + 9.5, 0, 18)).astype(int)
+    for qr, qg, qb in quantised:
+        result += _base83(qr * 19 * 19 + qg * 19 + qb, 2)
+    return result
+
+
+# Xử lý một ảnh (chạy trong process con)
+
+def _save_atomic(image, path, options):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Ghi ra file tạm rồi rename để request khác không đọc phải file ghi dở
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            image.save(f, **options)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return path.stat().st_size
+
+
+def process_image(source, jobs=(), variant_base=None, formats=(), force=False):
+    """Đọc ảnh ``source``, ghi các variant ``jobs = [(width, format, path), ...]``.
+
+    Với ``variant_base`` thì ghi thêm mọi variant của ``formats`` theo ``variant_widths`` (tính khi đã
+    biết kích thước ảnh). Variant đã có trên đĩa được giữ nguyên trừ khi ``force``. Trả về metadata
+    của ảnh gốc (width, height, byte_size, blurhash) và dung lượng các variant trong ``variants``.
+    """
+    with PILImage.open(source) as original:
+        image = ImageOps.exif_transpose(original).convert('RGB')
+    width, height = image.size
+
+    sample = image.copy()
+    sample.thumbnail((BLURHASH_SAMPLE_WIDTH, BLURHASH_SAMPLE_WIDTH))
+    metadata = {
+        'width': width,
+        'height': height,
+        'byte_size': os.path.getsize(source),
+        'blurhash': blurhash(np.asarray(sample)),
+        'variants': [],
+    }
+
+    jobs = list(jobs)
+    if variant_base is not None:
+        jobs += [(w, fmt, f'{variant_base}-{w}.{fmt}') for w in variant_widths(width) for fmt in formats]
+
+    resized = {}
+    for variant_width, fmt, path in jobs:
+        path = Path(path)
+        if force or not path.exists():
+            variant_width = min(variant_width, width)
+            if variant_width not in resized:
+                variant_height = max(1, round(height * variant_width / width))
+                resized[variant_width] = image.resize((variant_width, variant_height), PILImage.LANCZOS)
+            _save_atomic(resized[variant_width], path, FORMAT_OPTIONS[fmt])
+        metadata['variants'].append({'width': variant_width, 'format': fmt, 'byte_size': path.stat().st_size})
+    return metadata
+
+
+def closest_width(width, requested):
+    """Chiều rộng variant nhỏ nhất không nhỏ hơn ``requested`` (hoặc lớn nhất nếu không có)."""
+    widths = variant_widths(width)
+    return next((w for w in widths if w >= requested), widths[-1])
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def create_pool(workers=None):
+    workers = workers or getattr(settings, 'IMAGE_VARIANT_WORKERS', None) or min(4, os.cpu_count() or 1)
+    # spawn: không fork tiến trình Django đang giữ kết nối DB và các luồng
+    return ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'))
+
+
+def get_pool():
+    """Process pool dùng chung trong tiến trình web cho việc sinh variant lười."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = create_pool()
+        return _pool
+
+
+METADATA_FIELDS = ['width', 'height', 'byte_size', 'blurhash']
+
+
+def apply_metadata(image, metadata):
+    for name in METADATA_FIELDS:
+        setattr(image, name, metadata[name])
@@ -0,0 +1,315 @@
+# tour_api/importer.py
+# Nhập địa điểm từ file export của Overpass API (thay cho database/insert_data.py).
+#
+# File được đọc tuần tự (không json.load cả file), mỗi lô được COPY vào bảng tạm rồi upsert vào
+# locations/images bằng một câu SQL. content_hash của mỗi địa điểm cho phép bỏ qua các dòng không
+# đổi, nên chạy lại cùng một file không ghi gì và không tạo ảnh trùng.
+import csv
+import hashlib
+import io
+import json
+
+from django.db import connection, transaction
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+from . import tiles
+from .caching import invalidate
+from .districts import assign_location_districts
+from .snapshot import bump_version
+
+READ_CHUNK_SIZE = 64 * 1024
+DELIMITERS = frozenset(' \t\r\n,:]}')
+IMPORT_BATCH_SIZE = 5000
+
+# Các trường trong tags được gộp vào Location.details (giống script cũ)
+DETAIL_TAGS = ['title', 'basic_info', 'wikipedia', 'short_description', 'description_1', 'poem', 'videos',
+               'description_2']
+DETAIL_DEFAULTS = {'basic_info': {}, 'videos': []}
+IMAGE_TAGS = ['image_1', 'image_2']
+
+STAGING_TABLE = 'import_locations_staging'
+
+CREATE_STAGING_SQL = f"""
+    CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+        seq bigint,
+        id bigint,
+        type text,
+        name text,
+        name_vi text,
+        tourism_type text,
+        geom_wkt text,
+        details jsonb,
+        images jsonb,
+        content_hash text
+    ) ON COMMIT DROP
+"""
+
+COPY_SQL = f"""
+    COPY {STAGING_TABLE} (seq, id, type, name, name_vi, tourism_type, geom_wkt, details, images, content_hash)
+    FROM STDIN WITH (FORMAT csv)
+"""
+
+# Way đóng là đa giác: lấy trọng tâm diện tích; way mở lấy trọng tâm của đường.
+# Nếu một id xuất hiện nhiều lần trong lô thì bản ghi sau cùng thắng.
+UPSERT_LOCATIONS_SQL = f"""
+    WITH source AS (
+        SELECT DISTINCT ON (id) id, type, name, name_vi, tourism_type, details, content_hash,
+               ST_GeomFromText(geom_wkt, 4326) AS g
+        FROM {STAGING_TABLE}
+        ORDER BY id, seq DESC
+    )
+    INSERT INTO locations AS l (
+        id, type, name, name_vi, tourism_type, geom, details, content_hash,
+        rating_count, rating_total, score_1_count, score_2_count, score_3_count, score_4_count, score_5_count
+    )
+    SELECT id, type, name, name_vi, tourism_type,
+           CASE
+               WHEN g IS NULL THEN NULL
+               WHEN GeometryType(g) = 'POINT' THEN g
+               WHEN ST_IsClosed(g) AND ST_NPoints(g) >= 4 THEN ST_Centroid(ST_MakePolygon(g))
+               ELSE ST_Centroid(g)
+           END,
+           details, content_hash, 0, 0, 0, 0, 0, 0, 0
+    FROM source
+    ON CONFLICT (id) DO UPDATE SET
+        type = EXCLUDED.type,
+        name = EXCLUDED.name,
+        name_vi = EXCLUDED.name_vi,
+        tourism_type = EXCLUDED.tourism_type,
+        geom = EXCLUDED.geom,
+        details = EXCLUDED.details,
+        content_hash = EXCLUDED.content_hash
+    WHERE l.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+    RETURNING l.id, (l.xmax = 0) AS inserted
+"""
+
+# Ảnh chỉ được ghi cho các địa điểm vừa thêm/đổi; khoá (location_id, image_order) chống trùng
+DELETE_STALE_IMAGES_SQL = f"""
+    DELETE FROM images i
+    USING (SELECT DISTINCT ON (id) id, images FROM {STAGING_TABLE} ORDER BY id, seq DESC) s
+    WHERE i.location_id = s.id AND s.id = ANY(%(ids)s::bigint[])
+      AND NOT EXISTS (
+          SELECT 1 FROM jsonb_array_elements(s.images) img
+          WHERE (img->>'image_order')::int = i.image_order
+      )
+"""
+
+UPSERT_IMAGES_SQL = f"""
+    INSERT INTO images AS i (location_id, url, caption, image_order)
+    SELECT s.id, img->>'url', img->>'caption', (img->>'image_order')::int
+    FROM (SELECT DISTINCT ON (id) id, images FROM {STAGING_TABLE} ORDER BY id, seq DESC) s,
+         jsonb_array_elements(s.images) img
+    WHERE s.id = ANY(%(ids)s::bigint[])
+    ON CONFLICT (location_id, image_order) DO UPDATE SET
+        url = EXCLUDED.url,
+        caption = EXCLUDED.caption,
+        -- Ảnh đổi url thì metadata cũ không còn đúng; sẽ được tính lại (tour_api/imaging.py)
+        width = CASE WHEN i.url = EXCLUDED.url THEN i.width END,
+        height = CASE WHEN i.url = EXCLUDED.url THEN i.height END,
+        byte_size = CASE WHEN i.url = EXCLUDED.url THEN i.byte_size END,
+        blurhash = CASE WHEN i.url = EXCLUDED.url THEN i.blurhash END
+    WHERE (i.url, i.caption) IS DISTINCT FROM (EXCLUDED.url, EXCLUDED.caption)
+"""
+
+
+def iter_elements(path, chunk_size=READ_CHUNK_SIZE):
+    """Duyệt từng phần tử của mảng ``elements`` trong file Overpass mà không nạp cả file."""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = _Buffer(f, chunk_size)
+        reader.expect('{')
+        while True:
+            if reader.peek() == '}':
+                return
+            key = reader.decode(decoder)
+            reader.expect(':')
+            if key != 'elements':
+                reader.decode(decoder)
+            else:
+                reader.expect('[')
+                if reader.peek() == ']':
+                    reader.expect(']')
+                else:
+                    while True:
+                        yield reader.decode(decoder)
+                        if reader.peek() == ']':
+                            reader.expect(']')
+                            break
+                        reader.expect(',')
+            if reader.peek() == ',':
+                reader.expect(',')
+
+
+class _Buffer:
+    """Bộ đệm đọc file theo từng khúc cho JSONDecoder.raw_decode."""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Bỏ phần đã xử lý để bộ đệm không lớn dần theo file
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def skip_whitespace(self):
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.text) or not self.fill():
+                return
+
+    def peek(self):
+        self.skip_whitespace()
+        if self.pos >= len(self.text):
+            raise ValueError('Unexpected end of JSON input')
+        return self.text[self.pos]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f'Expected {char!r} at offset {self.pos}, got {self.text[self.pos]!r}')
+        self.pos += 1
+
+    def decode(self, decoder):
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # Giá trị phải kết thúc ở một dấu phân cách; nếu không (vd. số "16.06" của "16.0687" bị cắt
+            # ở cuối khúc) thì đọc thêm rồi giải mã lại
+            if (end == len(self.text) or self.text[end] not in DELIMITERS) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def element_row(element):
+    """Chuyển một phần tử Overpass thành dict các cột của locations (và danh sách ảnh)."""
+    tags = element.get('tags', {})
+    if element['type'] == 'node' and element.get('lat') is not None and element.get('lon') is not None:
+        geom_wkt = f"POINT({element['lon']!r} {element['lat']!r})"
+    elif element['type'] == 'way' and element.get('geometry'):
+        points = element['geometry']
+        if len(points) == 1:
+            geom_wkt = f"POINT({points[0]['lon']!r} {points[0]['lat']!r})"
+        else:
+            geom_wkt = 'LINESTRING(' + ', '.join(f"{p['lon']!r} {p['lat']!r}" for p in points) + ')'
+    else:
+        geom_wkt = None
+
+    details = {tag: tags.get(tag, DETAIL_DEFAULTS.get(tag)) for tag in DETAIL_TAGS}
+    images = [
+        {'url': tags[tag]['url'], 'caption': tags[tag].get('caption'), 'image_order': order}
+        for order, tag in enumerate(IMAGE_TAGS, 1)
+        if isinstance(tags.get(tag), dict) and tags[tag].get('url')
+    ]
+    row = {
+        'id': element['id'],
+        'type': element['type'],
+        'name': tags.get('name'),
+        'name_vi': tags.get('name:vi'),
+        'tourism_type': tags.get('tourism'),
+        'geom_wkt': geom_wkt,
+        'details': details,
+        'images': images,
+    }
+    row['content_hash'] = hashlib.sha256(
+        json.dumps(row, sort_keys=True, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    ).hexdigest()
+    return row
+
+
+def _copy_rows(cursor, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for seq, row in enumerate(rows):
+        writer.writerow([
+            seq, row['id'], row['type'], row['name'], row['name_vi'], row['tourism_type'], row['geom_wkt'],
+            json.dumps(row['details'], ensure_ascii=False), json.dumps(row['images'], ensure_ascii=False),
+            row['content_hash'],
+        ])
+    buffer.seek(0)
+    raw = cursor.cursor
+    if is_psycopg3:
+        with raw.copy(COPY_SQL) as copy:
+            copy.write(buffer.getvalue())
+    else:
+        raw.copy_expert(COPY_SQL, buffer)
+
+
+class ImportStats:
+    def __init__(self):
+        self.read = 0
+        self.skipped = 0
+        self.inserted = 0
+        self.updated = 0
+        self.changed_ids = []
+
+    @property
+    def unchanged(self):
+        return self.read - self.skipped - self.inserted - self.updated
+
+
+def import_batch(cursor, rows, stats):
+    cursor.execute(CREATE_STAGING_SQL)
+    cursor.execute(f'TRUNCATE {STAGING_TABLE}')
+    _copy_rows(cursor, rows)
+
+    cursor.execute(UPSERT_LOCATIONS_SQL)
+    changed = cursor.fetchall()
+    ids = [location_id for location_id, _ in changed]
+    stats.inserted += sum(1 for _, inserted in changed if inserted)
+    stats.updated += sum(1 for _, inserted in changed if not inserted)
+    stats.changed_ids.extend(ids)
+
+    if ids:
+        cursor.execute(DELETE_STALE_IMAGES_SQL, {'ids': ids})
+        cursor.execute(UPSERT_IMAGES_SQL, {'ids': ids})
+
+
+def import_locations(path, batch_size=IMPORT_BATCH_SIZE):
+    """Nhập file ``path``; gọi bên trong transaction. Trả về ``ImportStats``.
+
+    Phần tử không có tên hoặc loại hình (tourism) bị bỏ qua vì các cột đó là NOT NULL.
+    """
+    stats = ImportStats()
+    batch = []
+    with connection.cursor() as cursor:
+        for element in iter_elements(path):
+            stats.read += 1
+            if element.get('type') not in ('node', 'way') or 'id' not in element:
+                stats.skipped += 1
+                continue
+            row = element_row(element)
+            if not row['name'] or not row['tourism_type']:
+                stats.skipped += 1
+                continue
+            batch.append(row)
+            if len(batch) >= batch_size:
+                import_batch(cursor, batch, stats)
+                batch = []
+        if batch:
+            import_batch(cursor, batch, stats)
+
+    if stats.changed_ids:
+        # Ghi thẳng bằng SQL nên không có signal: tự cập nhật quận, snapshot, cache và tile.
+        # Snapshot, cache và tile chỉ được làm mới khi dữ liệu đã commit (lệnh import chạy trong atomic())
+        assign_location_districts(stats.changed_ids)
+        bump_version()
+        transaction.on_commit(lambda: invalidate('locations', 'locations:bulk', 'districts', 'districts:bulk'))
+        transaction.on_commit(lambda: tiles.invalidate_layer('locations'))
+    return stats
@@ -0,0 +1,366 @@
+# tour_api/instrumentation.py
+# Đo từng request: số query và tổng thời gian SQL, thời gian view/serializer và thời gian render JSON.
+# Kết quả được gửi về trong header Server-Timing (xem được ở tab Network của trình duyệt), cộng dồn
+# vào histogram độ trễ theo view (MetricsView, /api/metrics/) và, khi request chậm hơn
+# SLOW_REQUEST_THRESHOLD_MS, ghi một dòng log JSON kèm các câu SQL tốn thời gian nhất và EXPLAIN.
+import contextvars
+import json
+import logging
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.backends.signals import connection_created
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+logger = logging.getLogger('tour_api.slow_requests')
+
+# Biên trên (ms) của các bucket histogram; bucket cuối là +Inf
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_current = contextvars.ContextVar('tour_api_request_metrics', default=None)
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+class RequestMetrics:
+    """Số đo của một request; các câu SQL giống hệt nhau được gộp lại theo nội dung."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.statements = {}  # (alias, sql) -> {'count', 'total', 'max', 'params'}
+        self.total_time = None
+
+    def add_query(self, alias, sql, params, many, duration):
+        self.sql_count += 1
+        self.sql_time += duration
+        entry = self.statements.get((alias, sql))
+        if entry is None:
+            entry = self.statements[(alias, sql)] = {'count': 0, 'total': 0.0, 'max': 0.0, 'params': None}
+        entry['count'] += 1
+        entry['total'] += duration
+        if duration >= entry['max']:
+            entry['max'] = duration
+            entry['params'] = None if many else params
+
+    def finish(self):
+        self.total_time = time.perf_counter() - self.started
+
+    @property
+    def app_time(self):
+        # Phần còn lại ngoài SQL và render: chủ yếu là view và serializer
+        return max(0.0, (self.total_time or 0.0) - self.sql_time - self.render_time)
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.sql_count} queries"',
+            f'serialize;dur={self.app_time * 1000:.1f};desc="view + serializer"',
+            f'render;dur={self.render_time * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ])
+
+    def worst_statements(self, limit):
+        ranked = sorted(self.statements.items(), key=lambda item: item[1]['total'], reverse=True)
+        return [(alias, sql, entry) for (alias, sql), entry in ranked[:limit]]
+
+
+def _record_query(execute, sql, params, many, context):
+    # Gắn cố định vào kết nối (install_wrapper); ngoài request đang đo thì chỉ chuyển tiếp
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(context['connection'].alias, sql, params, many, time.perf_counter() - started)
+
+
+def install_wrapper(connection):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def _install_on_connect(sender, connection, **kwargs):
+    # ORM async chạy query trong luồng của sync_to_async, với kết nối riêng của luồng đó
+    install_wrapper(connection)
+
+
+connection_created.connect(_install_on_connect)
+
+
+class timed:
+    """Cộng thời gian của khối lệnh vào ``RequestMetrics.<field>`` của request hiện tại."""
+
+    def __init__(self, field):
+        self.field = field
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        metrics = _current.get()
+        if metrics is not None:
+            setattr(metrics, self.field, getattr(metrics, self.field) + time.perf_counter() - self.started)
+
+
+class TimedJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('render_time'):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+# Histogram độ trễ theo view (trong bộ nhớ của từng tiến trình)
+
+class LatencyHistogram:
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.sql_count = 0
+        self.statuses = {}
+
+    def observe(self, metrics, status_code):
+        duration_ms = metrics.total_time * 1000
+        index = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if duration_ms <= bound), len(LATENCY_BUCKETS_MS))
+        self.buckets[index] += 1
+        self.count += 1
+        self.sum_ms += duration_ms
+        self.sql_count += metrics.sql_count
+        self.statuses[status_code] = self.statuses.get(status_code, 0) + 1
+
+    def as_dict(self):
+        cumulative, running = {}, 0
+        for bound, count in zip([*map(str, LATENCY_BUCKETS_MS), '+Inf'], self.buckets):
+            running += count
+            cumulative[bound] = running
+        return {
+            'count': self.count,
+            'sum_ms': round(self.sum_ms, 3),
+            'mean_ms': round(self.sum_ms / self.count, 3) if self.count else None,
+            'mean_queries': round(self.sql_count / self.count, 2) if self.count else None,
+            'buckets_ms': cumulative,
+            'status_codes': {str(code): count for code, count in sorted(self.statuses.items())},
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.events = {}  # view -> {sự kiện (vd. statement_timeout): số lần}
+        self.started_at = time.time()
+
+    def observe(self, view_name, metrics, status_code):
+        with self.lock:
+            histogram = self.views.get(view_name)
+            if histogram is None:
+                histogram = self.views[view_name] = LatencyHistogram()
+            histogram.observe(metrics, status_code)
+
+    def count_event(self, view_name, event):
+        with self.lock:
+            counts = self.events.setdefault(view_name, {})
+            counts[event] = counts.get(event, 0) + 1
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                'uptime_s': round(time.time() - self.started_at, 1),
+                'views': {name: histogram.as_dict() for name, histogram in sorted(self.views.items())},
+                'events': {name: dict(counts) for name, counts in sorted(self.events.items())},
+            }
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+            self.events.clear()
+
+
+registry = MetricsRegistry()
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+class PrometheusRenderer(BaseRenderer):
+    """``?format=prometheus``: định dạng text của Prometheus cho MetricsView."""
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if 'views' not in data:  # lỗi (403, ...)
+            return json.dumps(data)
+        lines = ['# TYPE tour_request_duration_ms histogram']
+        for view, histogram in data['views'].items():
+            label = _label(view)
+            for bound, count in histogram['buckets_ms'].items():
+                lines.append(f'tour_request_duration_ms_bucket{{view="{label}",le="{bound}"}} {count}')
+            lines.append(f'tour_request_duration_ms_sum{{view="{label}"}} {histogram["sum_ms"]}')
+            lines.append(f'tour_request_duration_ms_count{{view="{label}"}} {histogram["count"]}')
+        lines.append('# TYPE tour_request_events_total counter')
+        for view, counts in data.get('events', {}).items():
+            label = _label(view)
+            for event, count in counts.items():
+                lines.append(f'tour_request_events_total{{view="{label}",event="{event}"}} {count}')
+        for alias, pool in data.get('db_pools', {}).items():
+            for name, value in pool.items():
+                if value is not None:
+                    lines.append(f'tour_db_pool_{name}{{alias="{alias}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def metrics_allowed(request):
+    """Chỉ DEBUG hoặc staff được xem metrics; IP trong INTERNAL_IPS chỉ khi bật METRICS_ALLOW_INTERNAL_IPS.
+
+    Sau reverse proxy mọi request đều có REMOTE_ADDR của proxy (thường là 127.0.0.1), nên mặc định không
+    tin địa chỉ IP.
+    """
+    user = getattr(request, 'user', None)
+    return (
+        settings.DEBUG
+        or (user is not None and user.is_staff)
+        or (setting('METRICS_ALLOW_INTERNAL_IPS', False)
+            and request.META.get('REMOTE_ADDR') in setting('INTERNAL_IPS', ()))
+    )
+
+
+# Log request chậm
+
+def explain(alias, sql, params):
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+    except DatabaseError as e:
+        return f'EXPLAIN failed: {e}'
+    return json.loads(plan) if isinstance(plan, str) else plan
+
+
+def log_slow_request(request, response, metrics):
+    statements = []
+    for alias, sql, entry in metrics.worst_statements(setting('SLOW_REQUEST_TOP_QUERIES', 3)):
+        statement = {
+            'sql': sql,
+            'count': entry['count'],
+            'total_ms': round(entry['total'] * 1000, 2),
+            'max_ms': round(entry['max'] * 1000, 2),
+        }
+        if setting('SLOW_REQUEST_EXPLAIN', True) and entry['params'] is not None:
+            statement['plan'] = explain(alias, sql, entry['params'])
+        statements.append(statement)
+
+    match = getattr(request, 'resolver_match', None)
+    logger.warning(json.dumps({
+        'event': 'slow_request',
+        'method': request.method,
+        'path': request.get_full_path(),
+        'view': match.view_name if match else None,
+        'status': response.status_code,
+        'total_ms': round(metrics.total_time * 1000, 2),
+        'sql_count': metrics.sql_count,
+        'sql_ms': round(metrics.sql_time * 1000, 2),
+        'serialize_ms': round(metrics.app_time * 1000, 2),
+        'render_ms': round(metrics.render_time * 1000, 2),
+        'statements': statements,
+    }, ensure_ascii=False, default=str))
+
+
+class InstrumentationMiddleware:
+    """Đặt đầu MIDDLEWARE để đo cả các middleware phía sau; chạy được cả dưới WSGI lẫn ASGI."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        for alias in connections:
+            install_wrapper(connections[alias])
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        if isinstance(response, StreamingHttpResponse):
+            return self.wrap_stream(request, response, metrics)
+        self.finish(response, metrics)
+        self.record(request, response, metrics)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        if isinstance(response, StreamingHttpResponse):
+            return self.wrap_stream(request, response, metrics)
+        self.finish(response, metrics)
+        if self.observe(request, response, metrics):
+            # EXPLAIN chạy query đồng bộ
+            await sync_to_async(log_slow_request)(request, response, metrics)
+        return response
+
+    def finish(self, response, metrics):
+        metrics.finish()
+        response['Server-Timing'] = metrics.server_timing()
+
+    def wrap_stream(self, request, response, metrics):
+        # Query và serialize của response stream chạy khi nội dung được đọc: đo đến hết stream.
+        # Header đã gửi đi từ trước nên chỉ còn histogram và log request chậm.
+        if response.is_async:
+            response.streaming_content = self.afinish_stream(request, response, response.streaming_content, metrics)
+        else:
+            response.streaming_content = self.finish_stream(request, response, response.streaming_content, metrics)
+        return response
+
+    def finish_stream(self, request, response, content, metrics):
+        _current.set(metrics)
+        try:
+            yield from content
+        finally:
+            _current.set(None)
+            metrics.finish()
+            self.record(request, response, metrics)
+
+    async def afinish_stream(self, request, response, content, metrics):
+        _current.set(metrics)
+        try:
+            async for chunk in content:
+                yield chunk
+        finally:
+            _current.set(None)
+            metrics.finish()
+            if self.observe(request, response, metrics):
+                await sync_to_async(log_slow_request)(request, response, metrics)
+
+    def observe(self, request, response, metrics):
+        """Cộng vào histogram; True nếu request chậm hơn SLOW_REQUEST_THRESHOLD_MS."""
+        match = getattr(request, 'resolver_match', None)
+        registry.observe(match.view_name if match else 'unresolved', metrics, response.status_code)
+        return metrics.total_time * 1000 >= setting('SLOW_REQUEST_THRESHOLD_MS', 500)
+
+    def record(self, request, response, metrics):
+        if self.observe(request, response, metrics):
+            log_slow_request(request, response, metrics)
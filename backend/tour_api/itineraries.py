@@ -0,0 +1,262 @@
+# tour_api/itineraries.py
+# Sao chép lịch trình (copy-on-write): khi người dùng lưu hoặc sửa lịch trình của người khác, họ
+# nhận một bản sao riêng. Các điểm dừng được chép bằng một câu INSERT ... SELECT trong cùng
+# transaction với lịch trình mới, thay vì một INSERT cho mỗi điểm dừng.
+#
+# Sửa theo lô: xem edit_itinerary bên dưới.
+import numpy as np
+from django.db import connection, transaction
+from django.utils.dateparse import parse_duration
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+
+from . import routing
+from .models import Itinerary, ItineraryLocation, Location
+from .snapshot import get_snapshot
+
+CLONE_STOPS_SQL = """
+    INSERT INTO itinerary_locations (itinerary_id, location_id, visit_order, day, estimated_time)
+    SELECT %(clone_id)s, location_id, visit_order, day, estimated_time
+    FROM itinerary_locations
+    WHERE itinerary_id = %(source_id)s
+    ORDER BY day, visit_order, id
+"""
+
+
+def clone_itinerary(source, user):
+    """Tạo bản sao của ``source`` (kèm mọi điểm dừng) thuộc về ``user``; ghi lại lịch trình gốc."""
+    with transaction.atomic():
+        clone = Itinerary.objects.create(survey_data=source.survey_data, user=user, source=source)
+        with connection.cursor() as cursor:
+            cursor.execute(CLONE_STOPS_SQL, {'clone_id': clone.pk, 'source_id': source.pk})
+    return clone
+
+
+# Thời gian dự kiến theo đường bộ
+#
+# Khi đã có đồ thị đường (tour_api/routing.py), estimated_time của mỗi điểm dừng là thời gian tham quan cộng
+# thời gian đi từ điểm trước đó (điểm đầu tiên: từ vị trí xuất phát trong survey_data). Toạ độ lấy từ
+# snapshot trong bộ nhớ nên không tốn thêm query; chưa có đồ thị thì estimated_time giữ nguyên.
+
+def retime_stops(itinerary, stops, keep=()):
+    """Đặt lại estimated_time của ``stops`` (các điểm dừng của một ngày, theo thứ tự thăm), trừ các địa
+    điểm trong ``keep``. Trả về các điểm dừng đã đổi."""
+    if not stops or routing.get_engine() is None:
+        return []
+    snapshot = get_snapshot()
+    start = (itinerary.survey_data or {}).get('current_location') or {}
+    points = [(start['lat'], start['lng'])] if 'lat' in start and 'lng' in start else []
+    for stop in stops:
+        idx = snapshot.index_by_id.get(stop.location_id)
+        if idx is None:
+            return []
+        points.append((snapshot.lat[idx], snapshot.lng[idx]))
+    seconds, _, _ = routing.travel_matrix([lat for lat, _ in points], [lng for _, lng in points])
+    legs = np.diagonal(seconds, offset=1)
+    if len(legs) < len(stops):
+        legs = np.concatenate(([0.0], legs))
+
+    changed = []
+    for stop, leg in zip(stops, legs):
+        if stop.location_id in keep:
+            continue
+        estimated_time = routing.stop_duration(leg)
+        if stop.estimated_time != estimated_time:
+            stop.estimated_time = estimated_time
+            changed.append(stop)
+    return changed
+
+
+# Sửa lịch trình theo lô (PATCH /api/itinerary/<pk>/update/; PUT đổi một địa điểm là một thao tác swap)
+#
+# Mọi thao tác được kiểm tra trên cùng một snapshot các điểm dừng (một query) rồi áp dụng trong bộ
+# nhớ; chỉ khi tất cả hợp lệ mới ghi xuống DB bằng một DELETE, một bulk_update và một bulk_create.
+# visit_order được đánh lại 1..n trong từng ngày sau khi áp dụng; ngày có thứ tự điểm dừng thay đổi được
+# tính lại estimated_time (retime_stops), trừ các điểm được đặt giờ trong chính lô thao tác đó.
+
+STOP_FIELDS = ['location', 'day', 'visit_order', 'estimated_time']
+
+
+class VersionConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = {"error": "Lịch trình đã bị thay đổi, hãy tải lại"}
+
+
+class _Plan:
+    """Các điểm dừng của lịch trình theo ngày, được sửa trong bộ nhớ."""
+
+    def __init__(self, itinerary, stops, locations):
+        self.itinerary = itinerary
+        self.locations = locations  # location_id -> tourism_type của mọi địa điểm liên quan
+        self.days = {}
+        for stop in sorted(stops, key=lambda stop: (stop.day, stop.visit_order, stop.pk)):
+            self.days.setdefault(stop.day, []).append(stop)
+        self.by_location = {stop.location_id: stop for stop in stops}
+        self.removed = []
+
+    def stop(self, location_id):
+        stop = self.by_location.get(location_id)
+        if stop is None:
+            raise ValidationError({"error": f"Địa điểm {location_id} không có trong lịch trình"})
+        return stop
+
+    def check_new_location(self, location_id):
+        if location_id not in self.locations:
+            raise ValidationError({"error": f"Địa điểm {location_id} không tồn tại"})
+        if location_id in self.by_location:
+            raise ValidationError({"error": f"Địa điểm {location_id} đã có trong lịch trình"})
+
+    def detach(self, stop):
+        self.days[stop.day].remove(stop)
+
+    def place(self, stop, day, visit_order=None):
+        stops = self.days.setdefault(day, [])
+        position = len(stops) if visit_order is None else min(visit_order, len(stops) + 1) - 1
+        stops.insert(position, stop)
+        stop.day = day
+
+    # Các thao tác
+
+    def swap(self, location_id, new_location_id):
+        stop = self.stop(location_id)
+        self.check_new_location(new_location_id)
+        if self.locations[new_location_id] != self.locations[location_id]:
+            raise ValidationError({"error": "Địa điểm mới phải có cùng loại hình du lịch"})
+        del self.by_location[location_id]
+        stop.location_id = new_location_id
+        self.by_location[new_location_id] = stop
+
+    def reorder(self, location_id, visit_order):
+        stop = self.stop(location_id)
+        self.detach(stop)
+        self.place(stop, stop.day, visit_order)
+
+    def move(self, location_id, day, visit_order=None):
+        stop = self.stop(location_id)
+        self.detach(stop)
+        self.place(stop, day, visit_order)
+
+    def insert(self, location_id, day, visit_order=None, estimated_time=None):
+        self.check_new_location(location_id)
+        stop = ItineraryLocation(itinerary=self.itinerary, location_id=location_id,
+                                 estimated_time=estimated_time, visit_order=0)
+        self.by_location[location_id] = stop
+        self.place(stop, day, visit_order)
+
+    def remove(self, location_id):
+        stop = self.stop(location_id)
+        self.detach(stop)
+        del self.by_location[location_id]
+        if stop.pk is not None:
+            self.removed.append(stop)
+
+    def set_time(self, location_id, estimated_time):
+        self.stop(location_id).estimated_time = estimated_time
+
+
+def _int(operation, name, required=True, minimum=1):
+    value = operation.get(name)
+    if value is None and not required:
+        return None
+    if not isinstance(value, int) or isinstance(value, bool) or value < minimum:
+        raise ValidationError({"error": f"'{name}' phải là số nguyên >= {minimum}"})
+    return value
+
+
+def _duration(operation):
+    value = operation.get('estimated_time')
+    if value is None:
+        return None
+    duration = parse_duration(str(value))
+    if duration is None:
+        raise ValidationError({"error": f"estimated_time không hợp lệ: {value}"})
+    return duration
+
+
+# Tên thao tác -> hàm đọc tham số từ JSON
+OPERATIONS = {
+    'swap': lambda op: {'location_id': _int(op, 'location_id'), 'new_location_id': _int(op, 'new_location_id')},
+    'reorder': lambda op: {'location_id': _int(op, 'location_id'), 'visit_order': _int(op, 'visit_order')},
+    'move': lambda op: {'location_id': _int(op, 'location_id'), 'day': _int(op, 'day'),
+                        'visit_order': _int(op, 'visit_order', required=False)},
+    'insert': lambda op: {'location_id': _int(op, 'location_id'), 'day': _int(op, 'day'),
+                          'visit_order': _int(op, 'visit_order', required=False), 'estimated_time': _duration(op)},
+    'remove': lambda op: {'location_id': _int(op, 'location_id')},
+    'set_time': lambda op: {'location_id': _int(op, 'location_id'), 'estimated_time': _duration(op)},
+}
+
+
+def parse_operations(operations):
+    """Kiểm tra cú pháp danh sách thao tác; trả về ``[(tên, tham số), ...]``."""
+    if not isinstance(operations, list) or not operations:
+        raise ValidationError({"error": "'operations' phải là danh sách thao tác không rỗng"})
+    parsed = []
+    for index, operation in enumerate(operations):
+        name = operation.get('op') if isinstance(operation, dict) else None
+        if name not in OPERATIONS:
+            raise ValidationError({"error": f"Thao tác {index}: 'op' phải là một trong {', '.join(OPERATIONS)}"})
+        try:
+            parsed.append((name, OPERATIONS[name](operation)))
+        except ValidationError as e:
+            raise ValidationError({"error": f"Thao tác {index}: {e.detail['error']}"})
+    return parsed
+
+
+def edit_itinerary(pk, user, operations, version=None):
+    """Áp dụng ``operations`` lên lịch trình ``pk`` trong một transaction.
+
+    Lịch trình của người khác được sao chép trước (copy-on-write). ``version`` (nếu có) phải khớp
+    phiên bản hiện tại, nếu không trả 409. Trả về ``(lịch trình, điểm dừng đã đổi/thêm, id đã xoá)``.
+    """
+    parsed = parse_operations(operations)
+    with transaction.atomic():
+        # Khoá dòng lịch trình: các PATCH đồng thời lên cùng lịch trình chạy lần lượt
+        itinerary = Itinerary.objects.select_for_update().filter(pk=pk).first()
+        if itinerary is None:
+            raise NotFound({"error": "Lịch trình không tồn tại"})
+        if version is not None and version != itinerary.version:
+            raise VersionConflict()
+        if itinerary.user_id and itinerary.user_id != user.pk:
+            itinerary = clone_itinerary(itinerary, user)
+
+        stops = list(ItineraryLocation.objects.filter(itinerary=itinerary).only(
+            'id', 'itinerary', 'location', 'day', 'visit_order', 'estimated_time'))
+        referenced = {stop.location_id for stop in stops}
+        referenced |= {args[key] for _, args in parsed for key in ('location_id', 'new_location_id') if key in args}
+        locations = dict(Location.objects.filter(id__in=referenced).values_list('id', 'tourism_type'))
+
+        plan = _Plan(itinerary, stops, locations)
+        before = {day: [stop.location_id for stop in day_stops] for day, day_stops in plan.days.items()}
+        original = {stop.pk: tuple(getattr(stop, f'{name}_id' if name == 'location' else name) for name in STOP_FIELDS)
+                    for stop in stops}
+        for index, (name, args) in enumerate(parsed):
+            try:
+                getattr(plan, name)(**args)
+            except ValidationError as e:
+                raise ValidationError({"error": f"Thao tác {index}: {e.detail['error']}"})
+
+        timed = {args['location_id'] for _, args in parsed if args.get('estimated_time') is not None}
+        for day, day_stops in plan.days.items():
+            if [stop.location_id for stop in day_stops] != before.get(day):
+                retime_stops(itinerary, day_stops, keep=timed)
+
+        changed, created = [], []
+        for day, day_stops in plan.days.items():
+            for visit_order, stop in enumerate(day_stops, 1):
+                stop.visit_order = visit_order
+                if stop.pk is None:
+                    created.append(stop)
+                elif original[stop.pk] != (stop.location_id, stop.day, stop.visit_order, stop.estimated_time):
+                    changed.append(stop)
+
+        removed = [stop.pk for stop in plan.removed]
+        if removed:
+            ItineraryLocation.objects.filter(pk__in=removed).delete()
+        if changed:
+            ItineraryLocation.objects.bulk_update(changed, STOP_FIELDS)
+        if created:
+            ItineraryLocation.objects.bulk_create(created)
+
+        itinerary.version += 1
+        itinerary.save(update_fields=['version', 'updated_at'])
+    return itinerary, changed + created, removed
@@ -0,0 +1,66 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tour_api.benchmarks import HEADER, HttpTransport, InProcessTransport, SCENARIOS, compare, run_benchmark
+
+
+class Command(BaseCommand):
+    help = ('Đo p50/p95/p99, throughput, số query và payload của mọi route tour_api với tải đồng thời, '
+            'ghi baseline JSON và so sánh với lần chạy trước (cần chạy seed_bench_data trước)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Số request mỗi kịch bản')
+        parser.add_argument('--concurrency', type=int, default=8, help='Số luồng gửi request đồng thời')
+        parser.add_argument('--warmup', type=int, default=5, help='Số request làm nóng mỗi kịch bản (không tính)')
+        parser.add_argument('--base-url', default=None,
+                            help='Gọi server đang chạy (vd. http://localhost:8000) thay vì gọi view trong tiến trình')
+        parser.add_argument('--only', default=None,
+                            help=f"Chỉ chạy các kịch bản này, cách nhau bởi dấu phẩy ({', '.join(s.name for s in SCENARIOS)})")
+        parser.add_argument('--skip-writes', action='store_true', help='Bỏ các kịch bản ghi dữ liệu')
+        parser.add_argument('--baseline', default=str(Path(settings.BASE_DIR) / 'bench' / 'baseline.json'),
+                            help='File baseline để so sánh và ghi kết quả mới')
+        parser.add_argument('--output', default=None, help='Ghi kết quả vào file này thay vì ghi đè baseline')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Tỉ lệ p95/throughput thay đổi được coi là hồi quy (mặc định 0.2 = 20%%)')
+        parser.add_argument('--fail-on-regression', action='store_true', help='Thoát với lỗi nếu có hồi quy')
+
+    def handle(self, *args, **options):
+        only = set(options['only'].split(',')) if options['only'] else None
+        unknown = only - {scenario.name for scenario in SCENARIOS} if only else set()
+        if unknown:
+            raise CommandError(f"Kịch bản không tồn tại: {', '.join(sorted(unknown))}")
+        transport = HttpTransport(options['base_url']) if options['base_url'] else InProcessTransport()
+
+        self.stdout.write(HEADER)
+        try:
+            result = run_benchmark(
+                transport, requests=options['requests'], concurrency=options['concurrency'],
+                warmup=options['warmup'], only=only, skip_writes=options['skip_writes'], log=self.stdout.write,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        if result['meta']['uncovered_routes']:
+            self.stdout.write(self.style.WARNING(
+                f"Route chưa có kịch bản: {', '.join(result['meta']['uncovered_routes'])}"))
+
+        baseline = Path(options['baseline'])
+        regressions = []
+        if baseline.exists():
+            lines, regressions = compare(json.loads(baseline.read_text()), result, options['threshold'])
+            self.stdout.write(f'\nSo với {baseline}:')
+            for line in lines:
+                self.stdout.write(line)
+
+        output = Path(options['output'] or baseline)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(result, indent=2, ensure_ascii=False))
+        self.stdout.write(f'\nĐã ghi kết quả vào {output}')
+
+        if regressions:
+            message = f'{len(regressions)} hồi quy so với baseline'
+            if options['fail_on_regression']:
+                raise CommandError(message + ':\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.WARNING(message))
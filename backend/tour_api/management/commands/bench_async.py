@@ -0,0 +1,57 @@
+import json
+import resource
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tour_api.benchmarks import CONCURRENCY_LEVELS, DEPLOYMENT_HEADER, DEPLOYMENT_SCENARIOS, compare_deployments
+
+
+class Command(BaseCommand):
+    help = ('So sánh throughput và độ trễ của các endpoint đọc giữa triển khai WSGI và ASGI ở 50, 200 và 1000 '
+            'kết nối đồng thời (hai server phải đang chạy trên cùng DB, sau seed_bench_data)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', default='http://127.0.0.1:8000', help='Server WSGI, vd. gunicorn tour.wsgi')
+        parser.add_argument('--asgi-url', default='http://127.0.0.1:8001',
+                            help='Server ASGI, vd. uvicorn tour.asgi:application')
+        parser.add_argument('--concurrency', default=','.join(map(str, CONCURRENCY_LEVELS)),
+                            help='Các mức kết nối đồng thời, cách nhau bởi dấu phẩy')
+        parser.add_argument('--duration', type=float, default=10.0, help='Số giây đo cho mỗi kịch bản/mức/server')
+        parser.add_argument('--warmup', type=float, default=2.0, help='Số giây làm nóng trước mỗi lượt đo')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Quá số giây này thì request tính là lỗi')
+        parser.add_argument('--only', default=None,
+                            help=f"Chỉ chạy các kịch bản này, cách nhau bởi dấu phẩy ({', '.join(DEPLOYMENT_SCENARIOS)})")
+        parser.add_argument('--output', default=str(Path(settings.BASE_DIR) / 'bench' / 'async.json'),
+                            help='File JSON ghi kết quả')
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency phải là các số nguyên cách nhau bởi dấu phẩy')
+        only = set(options['only'].split(',')) if options['only'] else None
+        unknown = only - set(DEPLOYMENT_SCENARIOS) if only else set()
+        if unknown:
+            raise CommandError(f"Kịch bản không tồn tại: {', '.join(sorted(unknown))}")
+
+        # Mỗi kết nối là một file descriptor: nâng giới hạn mềm cho mức 1000 kết nối
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        needed = max(levels) + 256
+        if soft != resource.RLIM_INFINITY and soft < needed:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (needed if hard == resource.RLIM_INFINITY else min(needed, hard), hard))
+
+        self.stdout.write(DEPLOYMENT_HEADER)
+        try:
+            result = compare_deployments(
+                options['wsgi_url'], options['asgi_url'], levels=levels, duration=options['duration'],
+                warmup=options['warmup'], timeout=options['timeout'], only=only, log=self.stdout.write,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        output = Path(options['output'])
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(result, indent=2, ensure_ascii=False))
+        self.stdout.write(f'\nĐã ghi kết quả vào {output}')
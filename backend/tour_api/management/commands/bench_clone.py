@@ -0,0 +1,91 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import Point
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from tour_api.itineraries import clone_itinerary
+from tour_api.models import Itinerary, ItineraryLocation, Location
+
+
+class _Rollback(Exception):
+    pass
+
+
+def clone_row_by_row(source, user):
+    # Cách cũ của ItinerarySaveView/ItineraryUpdateView: một INSERT cho mỗi điểm dừng
+    clone = Itinerary.objects.create(survey_data=source.survey_data, user=user)
+    for loc in source.locations.all():
+        ItineraryLocation.objects.create(
+            itinerary=clone,
+            location=loc.location,
+            visit_order=loc.visit_order,
+            day=loc.day,
+            estimated_time=loc.estimated_time
+        )
+    return clone
+
+
+class Command(BaseCommand):
+    help = 'So sánh thời gian sao chép lịch trình (từng dòng so với INSERT ... SELECT) với lịch trình nhiều ngày'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=10, help='Số ngày của lịch trình')
+        parser.add_argument('--stops', type=int, default=100, help='Tổng số điểm dừng')
+        parser.add_argument('--repeat', type=int, default=20, help='Số lần sao chép mỗi cách')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['days'], options['stops'], options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def run(self, days, stops, repeat):
+        owner = User.objects.create_user(username='bench_clone_owner')
+        user = User.objects.create_user(username='bench_clone_user')
+        source = Itinerary.objects.create(user=owner, survey_data={'days': days, 'bench': True})
+        ItineraryLocation.objects.bulk_create([
+            ItineraryLocation(
+                itinerary=source, location=location, day=i * days // stops + 1, visit_order=i + 1,
+                estimated_time=timedelta(hours=1),
+            )
+            for i, location in enumerate(self.locations(stops))
+        ])
+
+        self.stdout.write(f'{days} ngày, {stops} điểm dừng, {repeat} lần mỗi cách')
+        self.stdout.write(f"{'method':>12} {'queries':>8} {'median ms':>10} {'p95 ms':>8}")
+        for name, clone in (('row-by-row', clone_row_by_row), ('set-based', clone_itinerary)):
+            timings = []
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    with transaction.atomic():
+                        clone(source, user)
+                    timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            self.stdout.write(
+                f'{name:>12} {len(queries):>8} {statistics.median(timings):>10.2f} {p95:>8.2f}'
+            )
+
+    def locations(self, count):
+        # unique_together (itinerary, location): mỗi điểm dừng cần một địa điểm khác nhau
+        locations = list(Location.objects.only('id')[:count])
+        if len(locations) < count:
+            start_id = (Location.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+            locations += Location.objects.bulk_create([
+                Location(
+                    id=start_id + i,
+                    name=f'Bench location {start_id + i}',
+                    tourism_type='viewpoint',
+                    geom=Point(108.0 + i * 0.001, 16.0, srid=4326),
+                )
+                for i in range(count - len(locations))
+            ])
+        return locations
@@ -0,0 +1,50 @@
+import json
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tour_api.benchmarks import MATRIX_HEADER, MATRIX_SIZES, bench_matrices, synthetic_network
+from tour_api.routing import RoutingEngine, build_engine
+
+
+class Command(BaseCommand):
+    help = ('Đo thời gian tính ma trận thời gian đi đường bộ từ 10x10 tới 500x500 trên ROUTING_GRAPH, '
+            'hoặc trên mạng lưới đường giả khi dùng --synthetic')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--graph', default=str(settings.ROUTING_GRAPH), help='File đồ thị .npz đã build')
+        parser.add_argument('--synthetic', type=int, default=None, metavar='N',
+                            help='Dùng lưới đường giả N x N nút giao thay cho --graph (tiền xử lý trước khi đo)')
+        parser.add_argument('--sizes', default=','.join(str(size) for size in MATRIX_SIZES),
+                            help='Kích thước ma trận, cách nhau bởi dấu phẩy')
+        parser.add_argument('--repeats', type=int, default=3, help='Số lần đo lại khi cache lượt tìm đã nóng')
+        parser.add_argument('--output', default=str(Path(settings.BASE_DIR) / 'bench' / 'routing.json'),
+                            help='File JSON ghi kết quả')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--sizes phải là danh sách số nguyên, vd. 10,50,100')
+
+        if options['synthetic']:
+            started = time.perf_counter()
+            engine = build_engine(synthetic_network(options['synthetic'], options['synthetic']))
+            self.stdout.write(f'Tiền xử lý lưới {options["synthetic"]}x{options["synthetic"]}: '
+                              f'{time.perf_counter() - started:.1f}s')
+        else:
+            try:
+                engine = RoutingEngine.load(options['graph'])
+            except FileNotFoundError:
+                raise CommandError(f"Không tìm thấy {options['graph']}: chạy build_routing_graph hoặc dùng --synthetic")
+
+        self.stdout.write(MATRIX_HEADER)
+        result = bench_matrices(engine, sizes, options['repeats'], log=self.stdout.write)
+        result['meta']['graph'] = f"synthetic {options['synthetic']}" if options['synthetic'] else options['graph']
+
+        output = Path(options['output'])
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(result, indent=2, ensure_ascii=False))
+        self.stdout.write(f'\nĐã ghi kết quả vào {output}')
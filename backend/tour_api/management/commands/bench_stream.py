@@ -0,0 +1,105 @@
+import resource
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import Point
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+
+from tour_api.caching import invalidate
+from tour_api.models import Image, Location, Rating
+
+
+class _Rollback(Exception):
+    pass
+
+
+def rss_mb():
+    # RSS hiện tại của tiến trình (Linux); nơi khác trả về None
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * resource.getpagesize() / (1024 * 1024)
+
+
+class Command(BaseCommand):
+    help = 'So sánh bộ nhớ đỉnh của /api/locations/?all=true khi stream và khi render cả list (?stream=false)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,5000,20000',
+                            help='Số địa điểm giả lập, cách nhau bởi dấu phẩy')
+        parser.add_argument('--images', type=int, default=3, help='Số ảnh mỗi địa điểm')
+        parser.add_argument('--ratings', type=int, default=3, help='Số đánh giá mỗi địa điểm')
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        self.stdout.write(f"{'rows':>8} {'mode':>8} {'bytes':>12} {'peak MB':>9} {'RSS MB':>8} {'seconds':>8}")
+        try:
+            with transaction.atomic():
+                self.run(sizes, options['images'], options['ratings'])
+                raise _Rollback
+        except _Rollback:
+            pass
+        # Dữ liệu giả đã rollback; xoá các response đã cache trong lúc đo
+        invalidate('locations')
+
+    def run(self, sizes, images, ratings):
+        users = [User.objects.create_user(username=f'bench_stream_{i}') for i in range(ratings)]
+        start_id = (Location.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+        created = 0
+        # ALLOWED_HOSTS rỗng khi DEBUG chỉ nhận localhost
+        client = Client(HTTP_HOST='localhost')
+        for size in sizes:
+            self.seed(start_id + created, size - created, users, images)
+            created = size
+            for mode, query in (('stream', ''), ('list', '&stream=false')):
+                invalidate('locations')
+                self.measure(client, size, mode, '/api/locations/?all=true' + query)
+
+    def seed(self, first_id, count, users, images):
+        if count <= 0:
+            return
+        locations = Location.objects.bulk_create([
+            Location(
+                id=first_id + i,
+                name=f'Bench location {first_id + i}',
+                tourism_type='viewpoint',
+                geom=Point(108.0 + (i % 1000) * 0.0005, 16.0 + (i // 1000) * 0.0005, srid=4326),
+                details={'title': 'bench', 'description': 'x' * 200},
+            )
+            for i in range(count)
+        ], batch_size=2000)
+        Image.objects.bulk_create([
+            Image(location=loc, url=f'/media/images/{loc.id}_{order}.jpg', image_order=order)
+            for loc in locations for order in range(1, images + 1)
+        ], batch_size=5000)
+        Rating.objects.bulk_create([
+            Rating(user=user, location=loc, score=4)
+            for loc in locations for user in users
+        ], batch_size=5000)
+
+    def measure(self, client, size, mode, url):
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        response = client.get(url)
+        length = 0
+        if response.streaming:
+            for chunk in response.streaming_content:
+                length += len(chunk)
+        else:
+            length = len(response.content)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del response
+
+        rss = rss_mb()
+        self.stdout.write(
+            f"{size:>8} {mode:>8} {length:>12} {peak / (1024 * 1024):>9.1f} "
+            f"{rss if rss is not None else float('nan'):>8.1f} {elapsed:>8.2f}"
+        )
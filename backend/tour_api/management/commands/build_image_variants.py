@@ -0,0 +1,74 @@
+import time
+from collections import defaultdict
+from concurrent.futures import as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tour_api.caching import invalidate
+from tour_api.imaging import (
+    METADATA_FIELDS, apply_metadata, available_formats, create_pool, process_image, source_path, variant_base,
+)
+from tour_api.models import Image
+
+UPDATE_BATCH_SIZE = 200
+
+
+class Command(BaseCommand):
+    help = 'Sinh ảnh thu nhỏ (AVIF/WebP/JPEG) và metadata (kích thước, blurhash) cho mọi ảnh bằng process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Số process (mặc định theo số CPU)')
+        parser.add_argument('--formats', default=None,
+                            help='Định dạng cần sinh, cách nhau bởi dấu phẩy (mặc định mọi định dạng Pillow hỗ trợ)')
+        parser.add_argument('--force', action='store_true', help='Sinh lại cả các variant đã có trên đĩa')
+
+    def handle(self, *args, **options):
+        supported = available_formats()
+        if not supported:
+            raise CommandError('Cần cài Pillow để xử lý ảnh (pip install Pillow)')
+        formats = options['formats'].split(',') if options['formats'] else list(supported)
+        unknown = [fmt for fmt in formats if fmt not in supported]
+        if unknown:
+            raise CommandError(f"Định dạng không hỗ trợ: {', '.join(unknown)} (có: {', '.join(supported)})")
+
+        images = {image.pk: image for image in Image.objects.only('id', 'url')}
+        started = time.perf_counter()
+        done, failed = [], 0
+        original_bytes = 0
+        variant_bytes = defaultdict(int)
+
+        with create_pool(options['workers']) as pool:
+            futures = {
+                pool.submit(process_image, str(source_path(image.url)), variant_base=variant_base(image.url),
+                            formats=formats, force=options['force']): image
+                for image in images.values()
+            }
+            for future in as_completed(futures):
+                image = futures[future]
+                try:
+                    metadata = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'Bỏ qua ảnh {image.pk} ({image.url}): {e}')
+                    continue
+
+                apply_metadata(image, metadata)
+                original_bytes += metadata['byte_size']
+                for variant in metadata['variants']:
+                    variant_bytes[variant['format']] += variant['byte_size']
+                done.append(image)
+                if len(done) % UPDATE_BATCH_SIZE == 0:
+                    Image.objects.bulk_update(done[-UPDATE_BATCH_SIZE:], METADATA_FIELDS)
+
+        Image.objects.bulk_update(done[len(done) - len(done) % UPDATE_BATCH_SIZE:], METADATA_FIELDS)
+        # bulk_update không phát signal: tự xoá cache response chứa ảnh
+        invalidate('locations', 'locations:bulk')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'Ảnh gốc: {original_bytes / 1024 / 1024:.1f} MB')
+        for fmt in formats:
+            self.stdout.write(f'  {fmt}: {variant_bytes[fmt] / 1024 / 1024:.1f} MB cho mọi chiều rộng')
+        self.stdout.write(self.style.SUCCESS(
+            f'Đã xử lý {len(done)} ảnh ({failed} lỗi) trong {elapsed:.1f}s '
+            f'({len(done) / elapsed if elapsed > 0 else 0:.1f} ảnh/giây).'
+        ))
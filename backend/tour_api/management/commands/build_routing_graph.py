@@ -0,0 +1,38 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tour_api.routing import WITNESS_SETTLE_LIMIT, build_engine, osm_elements
+
+
+class Command(BaseCommand):
+    help = ('Dựng đồ thị đường bộ cho định tuyến offline từ file OSM cục bộ (Overpass JSON hoặc OSM XML), '
+            'tiền xử lý contraction hierarchies và ghi ra ROUTING_GRAPH')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File OSM, vd. export Overpass của way[highway] trong khung Đà Nẵng')
+        parser.add_argument('--output', default=str(settings.ROUTING_GRAPH), help='File .npz kết quả')
+        parser.add_argument('--witness-limit', type=int, default=WITNESS_SETTLE_LIMIT,
+                            help='Số nút tối đa của mỗi lượt tìm witness khi tiền xử lý')
+
+    def handle(self, *args, **options):
+        if options['witness_limit'] < 1:
+            raise CommandError('--witness-limit phải là số nguyên dương')
+
+        started = time.perf_counter()
+        try:
+            engine = build_engine(osm_elements(options['path']), options['witness_limit'], log=self.stdout.write)
+        except FileNotFoundError:
+            raise CommandError(f"Không tìm thấy file {options['path']}")
+        except ValueError as e:
+            raise CommandError(f'Lỗi khi đọc file OSM: {e}')
+
+        output = Path(options['output'])
+        output.parent.mkdir(parents=True, exist_ok=True)
+        engine.save(output)
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã ghi {output}: {len(engine)} nút, "
+            f"{len(engine.arrays['fwd_head']) + len(engine.arrays['bwd_head'])} cạnh đi lên, "
+            f'trong {time.perf_counter() - started:.1f}s.'))
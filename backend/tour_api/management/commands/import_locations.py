@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from tour_api.importer import IMPORT_BATCH_SIZE, import_locations
+
+
+class Command(BaseCommand):
+    help = 'Nhập địa điểm và ảnh từ file export JSON của Overpass API (chạy lại nhiều lần không tạo bản ghi trùng)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Đường dẫn file JSON, vd. database/data_dn_3.json')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+                            help='Số địa điểm mỗi lô COPY vào bảng tạm')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size phải là số nguyên dương')
+
+        started = time.perf_counter()
+        try:
+            with transaction.atomic():
+                stats = import_locations(options['path'], batch_size=options['batch_size'])
+        except FileNotFoundError:
+            raise CommandError(f"Không tìm thấy file {options['path']}")
+        except ValueError as e:
+            raise CommandError(f'Lỗi khi đọc file JSON: {e}')
+        elapsed = time.perf_counter() - started
+
+        rate = stats.read / elapsed if elapsed > 0 else float('inf')
+        self.stdout.write(
+            f'Đã đọc {stats.read} phần tử: thêm {stats.inserted}, cập nhật {stats.updated}, '
+            f'không đổi {stats.unchanged}, bỏ qua {stats.skipped}.'
+        )
+        self.stdout.write(self.style.SUCCESS(f'Hoàn tất trong {elapsed:.2f}s ({rate:,.0f} dòng/giây).'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from tour_api.ratings import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Tính lại average_score, rating_count và histogram điểm của mọi địa điểm từ bảng ratings'
+
+    def handle(self, *args, **options):
+        rebuild_rating_aggregates()
+        self.stdout.write(self.style.SUCCESS('Đã tính lại thống kê đánh giá.'))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tour_api.benchmarks import SCALES, flush_dataset, seed_dataset
+
+
+class Command(BaseCommand):
+    help = 'Sinh dữ liệu giả quanh Đà Nẵng cho benchmark (xoá dữ liệu benchmark cũ trước); chỉ dùng trên DB local'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', default='10k', help=f"Số địa điểm: {', '.join(SCALES)} hoặc một số nguyên")
+        parser.add_argument('--images', type=int, default=2, help='Số ảnh mỗi địa điểm')
+        parser.add_argument('--ratings', type=int, default=3, help='Số đánh giá mỗi địa điểm')
+        parser.add_argument('--itineraries', type=int, default=None, help='Số lịch trình (mặc định 1%% số địa điểm)')
+        parser.add_argument('--users', type=int, default=200, help='Số người dùng giả')
+        parser.add_argument('--seed', type=int, default=42, help='Seed của bộ sinh số ngẫu nhiên')
+        parser.add_argument('--flush', action='store_true', help='Chỉ xoá dữ liệu benchmark rồi thoát')
+
+    def handle(self, *args, **options):
+        if options['flush']:
+            flush_dataset()
+            self.stdout.write(self.style.SUCCESS('Đã xoá dữ liệu benchmark.'))
+            return
+
+        scale = options['scale'].lower()
+        try:
+            locations = SCALES[scale] if scale in SCALES else int(scale)
+        except ValueError:
+            raise CommandError(f"--scale phải là {', '.join(SCALES)} hoặc một số nguyên")
+
+        started = time.perf_counter()
+        summary = seed_dataset(
+            locations, images=options['images'], ratings=options['ratings'], itineraries=options['itineraries'],
+            users=options['users'], seed=options['seed'], log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã sinh {summary['locations']} địa điểm, {summary['images']} ảnh, {summary['ratings']} đánh giá, "
+            f"{summary['itineraries']} lịch trình trong {time.perf_counter() - started:.1f}s."
+        ))
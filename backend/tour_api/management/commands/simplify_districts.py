@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from tour_api.districts import GEOMETRY_LEVELS, rebuild_district_geometries
+
+
+class Command(BaseCommand):
+    help = 'Tính lại các phiên bản đơn giản hoá của hình học quận/huyện'
+
+    def handle(self, *args, **options):
+        rebuild_district_geometries()
+        self.stdout.write(self.style.SUCCESS(f'Đã tạo {len(GEOMETRY_LEVELS)} mức hình học cho mọi quận/huyện.'))
@@ -0,0 +1,82 @@
+# Generated by Django 5.1.6 on 2025-05-02 10:12
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tour_api', '0006_rating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='average_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='rating_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='rating_total',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='score_1_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='score_2_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='score_3_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='score_4_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='score_5_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(django.db.models.expressions.OrderBy(django.db.models.expressions.F('average_score'), descending=True, nulls_last=True), django.db.models.expressions.F('id'), name='locations_avg_score_idx'),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE locations l SET
+                    rating_count = a.cnt,
+                    rating_total = a.total,
+                    average_score = a.total::float / a.cnt,
+                    score_1_count = a.s1, score_2_count = a.s2, score_3_count = a.s3,
+                    score_4_count = a.s4, score_5_count = a.s5
+                FROM (
+                    SELECT location_id,
+                           COUNT(*) AS cnt,
+                           SUM(score) AS total,
+                           COUNT(*) FILTER (WHERE score = 1) AS s1,
+                           COUNT(*) FILTER (WHERE score = 2) AS s2,
+                           COUNT(*) FILTER (WHERE score = 3) AS s3,
+                           COUNT(*) FILTER (WHERE score = 4) AS s4,
+                           COUNT(*) FILTER (WHERE score = 5) AS s5
+                    FROM ratings
+                    GROUP BY location_id
+                ) a
+                WHERE l.id = a.location_id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
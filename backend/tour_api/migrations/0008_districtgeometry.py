@@ -0,0 +1,38 @@
+# Generated by Django 5.1.6 on 2025-05-03 09:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_levels(apps, schema_editor):
+    from tour_api.districts import GEOMETRY_LEVELS, SIMPLIFY_SQL
+
+    with schema_editor.connection.cursor() as cursor:
+        for level, _max_zoom, tolerance, precision in GEOMETRY_LEVELS:
+            cursor.execute(SIMPLIFY_SQL, {'level': level, 'tolerance': tolerance, 'precision': precision, 'ids': None})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tour_api', '0007_location_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DistrictGeometry',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('level', models.IntegerField()),
+                ('tolerance', models.FloatField()),
+                ('geojson', models.TextField()),
+                ('district', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='simplified_geometries', to='tour_api.district')),
+            ],
+            options={
+                'db_table': 'district_geometries',
+                'managed': True,
+                'unique_together': {('district', 'level')},
+            },
+        ),
+        migrations.RunPython(build_levels, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.6 on 2025-05-04 15:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tour_api', '0008_districtgeometry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='district',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='locations', to='tour_api.district'),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE locations l SET district_id = (
+                    SELECT d.id FROM districts d
+                    WHERE ST_Within(l.geom, d.geom)
+                    ORDER BY d.id LIMIT 1
+                )
+                WHERE l.geom IS NOT NULL
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
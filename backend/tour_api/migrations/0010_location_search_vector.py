@@ -0,0 +1,64 @@
+# Generated by Django 5.1.6 on 2025-05-06 20:05
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.expressions
+from django.contrib.postgres.operations import TrigramExtension, UnaccentExtension
+from django.db import migrations, models
+
+
+# tour_unaccent: unaccent + lower, khai báo IMMUTABLE để dùng được trong index và generated column.
+# tour_location_document: tsvector có trọng số (tên > tiêu đề > mô tả) trên các trường văn bản trong details.
+CREATE_FUNCTIONS_SQL = """
+CREATE OR REPLACE FUNCTION public.tour_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT lower(public.unaccent('public.unaccent'::regdictionary, $1)) $$;
+
+CREATE OR REPLACE FUNCTION public.tour_location_document(name text, name_vi text, details jsonb) RETURNS tsvector
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE
+    AS $$
+    SELECT setweight(to_tsvector('simple'::regconfig,
+               public.tour_unaccent(concat_ws(' ', name, name_vi))), 'A')
+        || setweight(to_tsvector('simple'::regconfig,
+               coalesce(public.tour_unaccent(details->>'title'), '')), 'B')
+        || setweight(to_tsvector('simple'::regconfig,
+               public.tour_unaccent(concat_ws(' ',
+                   details->>'short_description', details->>'description_1', details->>'description_2',
+                   details->>'poem', details->'basic_info'->>'address'))), 'C')
+    $$;
+"""
+
+DROP_FUNCTIONS_SQL = """
+DROP FUNCTION IF EXISTS public.tour_location_document(text, text, jsonb);
+DROP FUNCTION IF EXISTS public.tour_unaccent(text);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tour_api', '0009_location_district'),
+    ]
+
+    operations = [
+        UnaccentExtension(),
+        TrigramExtension(),
+        migrations.RunSQL(CREATE_FUNCTIONS_SQL, DROP_FUNCTIONS_SQL),
+        migrations.AddField(
+            model_name='location',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.Func(django.db.models.expressions.F('name'), django.db.models.expressions.F('name_vi'), django.db.models.expressions.F('details'), function='tour_location_document', output_field=django.contrib.postgres.search.SearchVectorField()), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='locations_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.expressions.Func(django.db.models.expressions.F('name'), function='tour_unaccent'), name='gin_trgm_ops'), name='locations_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.expressions.Func(django.db.models.expressions.F('name_vi'), function='tour_unaccent'), name='gin_trgm_ops'), name='locations_name_vi_trgm_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.6 on 2025-05-08 11:47
+
+import django.contrib.gis.db.models.fields
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tour_api', '0010_location_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='location',
+            index=django.contrib.postgres.indexes.GistIndex(django.db.models.functions.comparison.Cast('geom', output_field=django.contrib.gis.db.models.fields.GeographyField(srid=4326)), name='locations_geog_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2025-05-09 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tour_api', '0011_location_geog_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='itinerary',
+            index=models.Index(fields=['user', '-created_at', 'id'], name='itineraries_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['location', '-created_at', 'id'], name='ratings_location_created_idx'),
+        ),
+    ]
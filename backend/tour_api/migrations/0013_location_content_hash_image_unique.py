@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2025-05-10 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tour_api', '0012_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        # Script nhập cũ tạo ảnh trùng mỗi lần chạy lại: giữ bản ghi đầu tiên của mỗi (location, image_order)
+        migrations.RunSQL(
+            sql="""
+                DELETE FROM images i
+                USING images keep
+                WHERE i.location_id = keep.location_id
+                  AND i.image_order = keep.image_order
+                  AND i.id > keep.id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='image',
+            constraint=models.UniqueConstraint(fields=('location', 'image_order'), name='images_location_order_uniq'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2025-05-12 10:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tour_api', '0014_image_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itinerary',
+            name='source',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='clones', to='tour_api.itinerary'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2025-05-12 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tour_api', '0015_itinerary_source'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itinerary',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AlterUniqueTogether(
+            name='itinerarylocation',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='itinerarylocation',
+            constraint=models.UniqueConstraint(deferrable=models.Deferrable['DEFERRED'], fields=('itinerary', 'location'), name='itinerary_locations_itinerary_location_uniq'),
+        ),
+    ]
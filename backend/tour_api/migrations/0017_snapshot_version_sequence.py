@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2025-05-13 09:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tour_api', '0016_itinerary_version_deferrable_unique'),
+    ]
+
+    operations = [
+        # Version của snapshot địa điểm (snapshot.py), dùng chung cho mọi tiến trình
+        migrations.RunSQL(
+            'CREATE SEQUENCE IF NOT EXISTS tour_api_snapshot_version_seq',
+            'DROP SEQUENCE IF EXISTS tour_api_snapshot_version_seq',
+        ),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
 from django.contrib.gis.db import models as gis_models
-from django.db.models import JSONField 
+from django.db.models import JSONField, F, Func
+from django.db.models.functions import Cast
+from django.contrib.postgres.indexes import GinIndex, GistIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import User
 
 class District(gis_models.Model):
@@ -15,6 +18,27 @@ class District(gis_models.Model):
     def __str__(self):
         return self.name
 
+class DistrictGeometry(models.Model):
+    # Phiên bản đơn giản hoá của District.geom theo từng mức zoom (xem tour_api/districts.py)
+    id = models.AutoField(primary_key=True)
+    district = models.ForeignKey(District, on_delete=models.CASCADE, related_name='simplified_geometries')
+    level = models.IntegerField()
+    tolerance = models.FloatField()
+    geojson = models.TextField()
+
+    class Meta:
+        managed = True
+        db_table = 'district_geometries'
+        unique_together = ('district', 'level')
+
+    def __str__(self):
+        return f"{self.district.name} - Level {self.level}"
+
+class LocationManager(gis_models.Manager):
+    def get_queryset(self):
+        # search_vector chỉ dùng để lọc trong SQL, không cần tải về Python
+        return super().get_queryset().defer('search_vector')
+
 class Location(gis_models.Model):
     id = models.BigIntegerField(primary_key=True)
     type = models.CharField(max_length=50, blank=True, null=True)
@@ -22,13 +46,44 @@ class Location(gis_models.Model):
     name_vi = models.CharField(max_length=255, blank=True, null=True)
     tourism_type = models.CharField(max_length=50)
     geom = gis_models.PointField(srid=4326, blank=True, null=True)
+    # Quận chứa địa điểm, được tính sẵn bằng spatial join (tour_api/districts.py)
+    district = models.ForeignKey(District, on_delete=models.SET_NULL, related_name='locations', blank=True, null=True)
     details = JSONField(blank=True, null=True)  # Sử dụng JSONField từ django.db.models
     embed_url = models.URLField(max_length=500, blank=True, null=True)  # Trường mới để lưu URL nhúng
+    # sha256 của dữ liệu nguồn lần nhập gần nhất; import_locations bỏ qua dòng có hash không đổi
+    content_hash = models.CharField(max_length=64, blank=True, null=True)
+
+    # Thống kê đánh giá được cập nhật cùng transaction với Rating (xem tour_api/ratings.py)
+    average_score = models.FloatField(blank=True, null=True)
+    rating_count = models.IntegerField(default=0)
+    rating_total = models.IntegerField(default=0)
+    score_1_count = models.IntegerField(default=0)
+    score_2_count = models.IntegerField(default=0)
+    score_3_count = models.IntegerField(default=0)
+    score_4_count = models.IntegerField(default=0)
+    score_5_count = models.IntegerField(default=0)
+
+    # tsvector không dấu trên name, name_vi và các trường văn bản trong details (hàm SQL ở migration 0010)
+    search_vector = models.GeneratedField(
+        expression=Func(F('name'), F('name_vi'), F('details'), function='tour_location_document', output_field=SearchVectorField()),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = LocationManager()
 
     class Meta:
         managed = True
         db_table = 'locations'
         ordering = ['id']
+        indexes = [
+            models.Index(F('average_score').desc(nulls_last=True), F('id'), name='locations_avg_score_idx'),
+            GinIndex(fields=['search_vector'], name='locations_search_idx'),
+            GinIndex(OpClass(Func(F('name'), function='tour_unaccent'), name='gin_trgm_ops'), name='locations_name_trgm_idx'),
+            GinIndex(OpClass(Func(F('name_vi'), function='tour_unaccent'), name='gin_trgm_ops'), name='locations_name_vi_trgm_idx'),
+            # Index geography cho ST_DWithin theo mét và KNN <-> (xem tour_api/geo.py)
+            GistIndex(Cast('geom', output_field=gis_models.GeographyField(srid=4326)), name='locations_geog_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -39,10 +94,18 @@ class Image(models.Model):
     url = models.TextField()
     caption = models.TextField(blank=True, null=True)
     image_order = models.IntegerField(blank=True, null=True)
+    # Metadata của ảnh gốc, điền bởi build_image_variants hoặc lần đầu variant được yêu cầu (tour_api/imaging.py)
+    width = models.PositiveIntegerField(blank=True, null=True)
+    height = models.PositiveIntegerField(blank=True, null=True)
+    byte_size = models.PositiveIntegerField(blank=True, null=True)
+    blurhash = models.CharField(max_length=64, blank=True, null=True)
 
     class Meta:
         managed = True
         db_table = 'images'
+        constraints = [
+            models.UniqueConstraint(fields=['location', 'image_order'], name='images_location_order_uniq'),
+        ]
 
     def __str__(self):
         return f"Image for {self.location.name} - Order {self.image_order}"
@@ -51,12 +114,20 @@ class Itinerary(models.Model):
     id = models.AutoField(primary_key=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='itineraries',null=True)
     survey_data = JSONField(blank=True, null=True)  # Sử dụng JSONField từ django.db.models
+    # Lịch trình gốc nếu đây là bản sao (xem tour_api/itineraries.py)
+    source = models.ForeignKey('self', on_delete=models.SET_NULL, related_name='clones', null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Tăng mỗi lần lịch trình bị sửa; client gửi kèm khi PATCH để phát hiện sửa đồng thời
+    version = models.PositiveIntegerField(default=1)
 
     class Meta:
         managed = True
         db_table = 'itineraries'
+        indexes = [
+            # Phân trang cursor của danh sách lịch trình theo người dùng
+            models.Index(fields=['user', '-created_at', 'id'], name='itineraries_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"Itinerary {self.id} by {self.user.username}"
@@ -72,7 +143,13 @@ class ItineraryLocation(models.Model):
     class Meta:
         managed = True
         db_table = 'itinerary_locations'
-        unique_together = ('itinerary', 'location')
+        constraints = [
+            # Kiểm tra ở cuối transaction để một lần bulk_update có thể hoán đổi địa điểm giữa các dòng
+            models.UniqueConstraint(
+                fields=['itinerary', 'location'], name='itinerary_locations_itinerary_location_uniq',
+                deferrable=models.Deferrable.DEFERRED,
+            ),
+        ]
 
     def __str__(self):
         return f"{self.location.name} in Itinerary {self.itinerary.id} (Day {self.day}, Order: {self.visit_order})"
@@ -89,6 +166,10 @@ class Rating(models.Model):
         managed = True
         db_table = 'ratings'
         unique_together = ('user', 'location')  
+        indexes = [
+            # Phân trang cursor đánh giá của một địa điểm, mới nhất trước
+            models.Index(fields=['location', '-created_at', 'id'], name='ratings_location_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} rated {self.location.name} - {self.score} stars"
\ No newline at end of file
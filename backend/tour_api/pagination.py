@@ -0,0 +1,236 @@
+# tour_api/pagination.py
+# Phân trang cho các danh sách: ?page= (offset, như cũ) hoặc keyset/cursor (?pagination=cursor, sau đó
+# đi theo link next/previous). Keyset lọc "sau bản ghi cuối của trang trước" theo chính các cột sắp xếp
+# nên chi phí mỗi trang không tăng theo độ sâu. ?count=false bỏ COUNT(*) ở cả hai chế độ.
+import base64
+import binascii
+import json
+import operator
+from datetime import date, datetime, time
+from decimal import Decimal
+from functools import reduce
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import InvalidPage, Page
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def keyset_filter(keys, position, reverse=False):
+    """Điều kiện "đứng sau ``position``" theo thứ tự ``keys`` = [(tên, giảm dần), ...].
+
+    Với keys (a, b): a > x OR (a = x AND b > y), kèm a >= x để planner dùng được index trên a.
+    """
+    def lookup(descending):
+        # Tăng dần + đi tới, hoặc giảm dần + đi lùi: lấy giá trị lớn hơn
+        return 'gt' if descending == reverse else 'lt'
+
+    clauses = []
+    for i, (name, descending) in enumerate(keys):
+        clause = Q(**{f'{name}__{lookup(descending)}': position[i]})
+        for (previous, _), value in zip(keys[:i], position[:i]):
+            clause &= Q(**{previous: value})
+        clauses.append(clause)
+
+    first, descending = keys[0]
+    bound = Q(**{f'{first}__{lookup(descending)}e': position[0]})
+    return bound & reduce(operator.or_, clauses)
+
+
+class KeysetPagination(PageNumberPagination):
+    """``?page=`` giữ nguyên hành vi cũ; ``?pagination=cursor`` hoặc ``?cursor=`` dùng keyset.
+
+    View khai báo khoá sắp xếp bằng ``keyset_fields`` (vd. ``['-created_at', 'id']``) hoặc
+    ``get_keyset_fields()``; khoá cuối cùng phải duy nhất (thường là ``id``).
+    """
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        params = request.query_params
+        self.include_count = params.get(self.count_query_param, '').lower() != 'false'
+        self.cursor_mode = self.is_cursor_request(request)
+
+        if self.cursor_mode:
+            return self.paginate_keyset(queryset, request, view)
+        if self.include_count:
+            return super().paginate_queryset(queryset, request, view)
+        return self.paginate_without_count(queryset, request)
+
+    def is_cursor_request(self, request):
+        params = request.query_params
+        return bool(params.get(self.cursor_query_param)) or params.get(self.mode_query_param) == 'cursor'
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Bản dùng ORM async cho view ASGI (async_views.py); chỉ có chế độ ?page=, cursor vẫn đồng bộ."""
+        self.request = request
+        self.include_count = request.query_params.get(self.count_query_param, '').lower() != 'false'
+        self.cursor_mode = False
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        if not self.include_count:
+            offset = self.offset_for(request, page_size)
+            rows = [obj async for obj in queryset[offset:offset + page_size + 1]]
+            return self.offset_page(rows, page_size)
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        # count là cached_property: gán trước để Paginator không tự COUNT(*) đồng bộ
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        bottom = (number - 1) * page_size
+        self.page = Page([obj async for obj in queryset[bottom:bottom + page_size]], number, paginator)
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return list(self.page)
+
+    # Offset không COUNT(*): lấy dư một dòng để biết còn trang sau hay không
+
+    def paginate_without_count(self, queryset, request):
+        page_size = self.get_page_size(request)
+        offset = self.offset_for(request, page_size)
+        return self.offset_page(list(queryset[offset:offset + page_size + 1]), page_size)
+
+    def offset_for(self, request, page_size):
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            raise NotFound('Invalid page.')
+        if self.page_number < 1:
+            raise NotFound('Invalid page.')
+        return (self.page_number - 1) * page_size
+
+    def offset_page(self, rows, page_size):
+        if not rows and self.page_number > 1:
+            raise NotFound('Invalid page.')
+        self.has_next = len(rows) > page_size
+        self.has_previous = self.page_number > 1
+        return rows[:page_size]
+
+    # Keyset
+
+    def get_keys(self, view):
+        if hasattr(view, 'get_keyset_fields'):
+            fields = view.get_keyset_fields()
+        else:
+            fields = getattr(view, 'keyset_fields', ['id'])
+        return [(field.lstrip('-'), field.startswith('-')) for field in fields]
+
+    def paginate_keyset(self, queryset, request, view):
+        if queryset.query.is_sliced:
+            raise ValidationError({"error": "Cursor pagination cannot be combined with ?limit"})
+        self.keys = self.get_keys(view)
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        self.total = queryset.count() if self.include_count else None
+        queryset = queryset.order_by(*[
+            ('-' if descending != reverse else '') + name for name, descending in self.keys
+        ])
+        if position is not None:
+            queryset = queryset.filter(keyset_filter(self.keys, position, reverse))
+
+        rows = list(queryset[:page_size + 1])
+        more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        self.first_position = self.position_of(rows[0]) if rows else None
+        self.last_position = self.position_of(rows[-1]) if rows else None
+        self.has_next = more if not reverse else position is not None
+        self.has_previous = position is not None if not reverse else more
+        return rows
+
+    def position_of(self, obj):
+        return [getattr(obj, name) for name, _ in self.keys]
+
+    def encode_cursor(self, position, reverse):
+        values = []
+        for value in position:
+            if isinstance(value, (date, datetime, time)):
+                value = value.isoformat()
+            elif isinstance(value, Decimal):
+                value = str(value)
+            values.append(value)
+        payload = {'p': values}
+        if reverse:
+            payload['r'] = 1
+        token = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+            values = payload['p']
+            if not isinstance(values, list) or len(values) != len(self.keys):
+                raise ValueError
+            position = [self.parse_value(model, name, value) for (name, _), value in zip(self.keys, values)]
+        except (TypeError, KeyError, ValueError, binascii.Error, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, bool(payload.get('r'))
+
+    def parse_value(self, model, name, value):
+        # Cột của model: chuyển lại đúng kiểu (datetime, ...); annotation (khoảng cách, rank) là số thực
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                raise ValueError(name)
+            return value
+        return field.to_python(value)
+
+    # Response
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode and self.include_count:
+            return super().get_paginated_response(data)
+        response = {}
+        if self.cursor_mode and self.include_count:
+            response['count'] = self.total
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+        return Response(response)
+
+    def get_next_link(self):
+        if self.cursor_mode:
+            if not self.has_next or self.last_position is None:
+                return None
+            return self.encode_cursor(self.last_position, reverse=False)
+        if self.include_count:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.cursor_mode:
+            if not self.has_previous or self.first_position is None:
+                return None
+            return self.encode_cursor(self.first_position, reverse=True)
+        if self.include_count:
+            return super().get_previous_link()
+        if not self.has_previous:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
@@ -0,0 +1,188 @@
+# tour_api/planning.py
+# Lập lộ trình cho gợi ý lịch trình: ma trận khoảng cách vectorised bằng NumPy và
+# giải TSP đường đi mở (xuất phát cố định tại vị trí hiện tại) cho từng ngày; với lịch trình nhiều ngày,
+# ứng viên được chia thành các cụm địa lý theo ngày trước khi lập lộ trình.
+import time
+from itertools import permutations
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+
+# Thời gian tối đa (giây) cho bước cải thiện 2-opt/Or-opt của mỗi ngày
+ROUTE_TIME_BUDGET = 0.05
+
+# Số lần khởi tạo k-medoids++ và số vòng lặp tối đa mỗi lần khi chia cụm theo ngày
+CLUSTER_RESTARTS = 8
+CLUSTER_MAX_ITER = 20
+
+
+def haversine_matrix(lat_a, lng_a, lat_b=None, lng_b=None):
+    """Ma trận khoảng cách (mét) giữa hai tập toạ độ; bỏ trống tập b để tính từng cặp trong tập a."""
+    lat_a = np.radians(np.asarray(lat_a, dtype=np.float64))[:, None]
+    lng_a = np.radians(np.asarray(lng_a, dtype=np.float64))[:, None]
+    if lat_b is None:
+        lat_b, lng_b = lat_a.T, lng_a.T
+    else:
+        lat_b = np.radians(np.asarray(lat_b, dtype=np.float64))[None, :]
+        lng_b = np.radians(np.asarray(lng_b, dtype=np.float64))[None, :]
+
+    h = (np.sin((lat_b - lat_a) / 2) ** 2
+         + np.cos(lat_a) * np.cos(lat_b) * np.sin((lng_b - lng_a) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def path_length(dist, route):
+    route = np.asarray(route)
+    return float(dist[route[:-1], route[1:]].sum())
+
+
+def nearest_neighbour(dist):
+    """Lộ trình tham lam bắt đầu từ nút 0."""
+    n = len(dist)
+    route = [0]
+    visited = np.zeros(n, dtype=bool)
+    visited[0] = True
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, dist[route[-1]])
+        nxt = int(np.argmin(row))
+        route.append(nxt)
+        visited[nxt] = True
+    return route
+
+
+def two_opt(dist, route, deadline):
+    """Đảo ngược đoạn route[i..j] khi làm ngắn đường đi; nút 0 giữ cố định, điểm cuối tự do."""
+    route = list(route)
+    n = len(route)
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(1, n - 1):
+            a, b = route[i - 1], route[i]
+            for j in range(i + 1, n):
+                c = route[j]
+                e = route[j + 1] if j + 1 < n else None
+                before = dist[a, b] + (dist[c, e] if e is not None else 0.0)
+                after = dist[a, c] + (dist[b, e] if e is not None else 0.0)
+                if after < before - 1e-9:
+                    route[i:j + 1] = route[i:j + 1][::-1]
+                    b = route[i]
+                    improved = True
+            if time.perf_counter() >= deadline:
+                break
+    return route
+
+
+def or_opt(dist, route, deadline, max_segment=3):
+    """Di chuyển đoạn 1..3 điểm liên tiếp (giữ hoặc đảo chiều) sang vị trí tốt hơn."""
+    route = list(route)
+    best = path_length(dist, route)
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for seg_len in range(1, max_segment + 1):
+            for i in range(1, len(route) - seg_len + 1):
+                segment = route[i:i + seg_len]
+                rest = route[:i] + route[i + seg_len:]
+                for j in range(1, len(rest) + 1):
+                    if j == i:
+                        continue
+                    for candidate_segment in (segment, segment[::-1]):
+                        candidate = rest[:j] + candidate_segment + rest[j:]
+                        length = path_length(dist, candidate)
+                        if length < best - 1e-9:
+                            route, best, improved = candidate, length, True
+                            break
+                    if improved:
+                        break
+                if improved or time.perf_counter() >= deadline:
+                    break
+            if improved or time.perf_counter() >= deadline:
+                break
+    return route
+
+
+def plan_route(dist, time_budget=ROUTE_TIME_BUDGET):
+    """Thứ tự thăm cho ma trận ``dist`` với nút 0 là điểm xuất phát.
+
+    Trả về ``(order, length)``: ``order`` là chỉ số các điểm 1..n-1 theo thứ tự thăm,
+    ``length`` là tổng quãng đường (mét) tính từ điểm xuất phát.
+    """
+    dist = np.asarray(dist, dtype=np.float64)
+    if len(dist) <= 1:
+        return [], 0.0
+
+    deadline = time.perf_counter() + time_budget
+    route = nearest_neighbour(dist)
+    if len(route) > 2:
+        while True:
+            length = path_length(dist, route)
+            route = or_opt(dist, two_opt(dist, route, deadline), deadline)
+            if path_length(dist, route) >= length - 1e-9 or time.perf_counter() >= deadline:
+                break
+    return route[1:], path_length(dist, route)
+
+
+def route_estimate(dist, idx):
+    """Quãng đường nearest-neighbour từ nút 0 qua các nút ``idx``: ước lượng nhanh để so sánh cách chia cụm."""
+    idx = [0, *idx]
+    sub = dist[np.ix_(idx, idx)]
+    return path_length(sub, nearest_neighbour(sub))
+
+
+def _assign(dist, groups, choices, medoids):
+    # Với mỗi nhóm: chọn các ứng viên khác nhau cho từng ngày sao cho tổng khoảng cách tới medoid nhỏ nhất
+    days = np.arange(len(medoids))
+    members = []
+    for group, choice in zip(groups, choices):
+        cost = dist[np.ix_(group, medoids)]
+        members.append(group[choice[np.argmin(cost[choice, days].sum(axis=1))]])
+    return np.array(members).T
+
+
+def _medoids(dist, pool, members):
+    # Medoid của mỗi ngày: ứng viên có tổng khoảng cách tới các điểm của ngày đó nhỏ nhất
+    return pool[np.argmin(dist[pool][:, members].sum(axis=2), axis=0)]
+
+
+def _seed_medoids(dist, pool, days, rng):
+    # k-medoids++: medoid tiếp theo được chọn với xác suất tỉ lệ bình phương khoảng cách tới medoid gần nhất
+    medoids = [rng.choice(pool)]
+    for _ in range(days - 1):
+        weight = dist[np.ix_(pool, medoids)].min(axis=1) ** 2
+        medoids.append(rng.choice(pool, p=weight / weight.sum()) if weight.sum() > 0 else rng.choice(pool))
+    return np.array(medoids)
+
+
+def cluster_days(dist, groups, days, restarts=CLUSTER_RESTARTS, seed=0):
+    """Chia ứng viên thành ``days`` cụm địa lý, mỗi cụm có đúng một điểm của mỗi nhóm.
+
+    ``dist`` là ma trận khoảng cách với nút 0 là điểm xuất phát, ``groups`` là danh sách chỉ số nút của
+    từng loại địa điểm (mỗi nhóm có ít nhất ``days`` nút). k-medoids có ràng buộc: bước gán chọn cho mỗi
+    nhóm một nút khác nhau cho từng ngày (duyệt mọi hoán vị, vectorised), bước cập nhật chọn lại medoid.
+    Phương án có tổng ``route_estimate`` nhỏ nhất được giữ lại, trong đó luôn có cách chia theo thứ hạng
+    khoảng cách (ngày thứ d nhận điểm gần thứ d của mỗi nhóm). Trả về mảng ``(days, len(groups))``,
+    ngày có cụm gần điểm xuất phát hơn đứng trước.
+    """
+    groups = [np.asarray(group) for group in groups]
+    pool = np.concatenate(groups)
+    choices = [np.array(list(permutations(range(len(group)), days))) for group in groups]
+    rng = np.random.default_rng(seed)
+
+    by_rank = np.array([group[:days] for group in groups]).T
+    best, best_score = by_rank, sum(route_estimate(dist, day) for day in by_rank)
+    starts = [_medoids(dist, pool, by_rank)] + [_seed_medoids(dist, pool, days, rng) for _ in range(restarts)]
+    for medoids in starts:
+        members = None
+        for _ in range(CLUSTER_MAX_ITER):
+            assigned = _assign(dist, groups, choices, medoids)
+            if members is not None and np.array_equal(assigned, members):
+                break
+            members = assigned
+            medoids = _medoids(dist, pool, members)
+        score = sum(route_estimate(dist, day) for day in members)
+        if score < best_score - 1e-9:
+            best, best_score = members, score
+
+    return best[np.argsort(dist[0, _medoids(dist, pool, best)], kind='stable')]
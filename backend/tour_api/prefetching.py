@@ -0,0 +1,82 @@
+# tour_api/prefetching.py
+# Tự động thêm select_related / prefetch_related dựa trên cây serializer mà view trả về,
+# tránh N+1 query khi serialize các quan hệ lồng nhau (images, ratings__user, locations__location, ...).
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def _relation_model(model, field_name):
+    try:
+        field = model._meta.get_field(field_name)
+    except Exception:
+        return None, None
+    if not field.is_relation:
+        return None, None
+    return field, field.related_model
+
+
+def optimize_queryset(queryset, serializer_class, context=None):
+    """Trả về queryset đã được eager-load theo các field của ``serializer_class``.
+
+    ``context`` là context của serializer; với sparse fieldset (fieldsets.py) chỉ các field
+    được chọn mới được prefetch, và bảng gốc chỉ SELECT các cột cần thiết.
+    """
+    serializer = serializer_class(context=context or {})
+    select, prefetch = _plan(queryset.model, serializer)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    columns = serializer.get_columns() if hasattr(serializer, 'get_columns') else None
+    if columns is not None:
+        queryset = queryset.only(*columns)
+    return queryset
+
+
+def _plan(model, serializer, prefix=''):
+    select = []
+    prefetch = []
+
+    for name, field in serializer.fields.items():
+        source = field.source
+        if source == '*' or '.' in source:
+            continue
+
+        relation, related_model = _relation_model(model, source)
+        if relation is None:
+            continue
+
+        path = prefix + source
+        many = relation.many_to_many or relation.one_to_many
+
+        if isinstance(field, serializers.ListSerializer):
+            child = field.child.__class__
+            inner = optimize_queryset(related_model._default_manager.all(), child, serializer.context)
+            prefetch.append(Prefetch(path, queryset=inner))
+        elif isinstance(field, serializers.BaseSerializer):
+            # Quan hệ FK/OneToOne lồng serializer: join luôn và lập kế hoạch cho cây con
+            select.append(path)
+            child_select, child_prefetch = _plan(related_model, field, prefix=path + '__')
+            select.extend(child_select)
+            prefetch.extend(child_prefetch)
+        elif isinstance(field, serializers.ManyRelatedField):
+            prefetch.append(path)
+        elif isinstance(field, serializers.PrimaryKeyRelatedField):
+            # Chỉ cần cột <field>_id, không phải join
+            continue
+        elif isinstance(field, serializers.RelatedField) and not many:
+            # StringRelatedField, SlugRelatedField, ... cần đối tượng liên kết
+            select.append(path)
+
+    return select, prefetch
+
+
+class EagerLoadingMixin:
+    """Mixin cho generic view: queryset được tối ưu theo ``get_serializer_class()``.
+
+    Hook vào ``filter_queryset`` để áp dụng cả khi view tự override ``get_queryset``.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return optimize_queryset(queryset, self.get_serializer_class(), self.get_serializer_context())
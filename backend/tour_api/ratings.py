@@ -0,0 +1,95 @@
+# tour_api/ratings.py
+# Duy trì thống kê đánh giá (average_score, rating_count, histogram) trên bảng locations.
+# Các hàm ở đây phải được gọi bên trong transaction của thao tác ghi Rating.
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast, NullIf
+
+from .caching import invalidate_on_commit
+from .models import Location
+
+SCORES = range(1, 6)
+
+
+def histogram_field(score):
+    return f'score_{score}_count'
+
+
+def rating_histogram(location):
+    return {str(score): getattr(location, histogram_field(score)) for score in SCORES}
+
+
+def apply_rating_change(old=None, new=None):
+    """Cập nhật tăng dần thống kê khi một Rating được tạo/sửa/xoá.
+
+    ``old`` và ``new`` là cặp ``(location_id, score)`` trước và sau khi ghi
+    (``old=None`` khi tạo mới, ``new=None`` khi xoá). Mỗi location bị ảnh hưởng chỉ tốn một câu UPDATE
+    dùng biểu thức F() nên an toàn khi có nhiều request ghi đồng thời.
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    if old is not None:
+        location_id, score = old
+        deltas[location_id]['count'] -= 1
+        deltas[location_id]['total'] -= score
+        deltas[location_id][score] -= 1
+    if new is not None:
+        location_id, score = new
+        deltas[location_id]['count'] += 1
+        deltas[location_id]['total'] += score
+        deltas[location_id][score] += 1
+
+    for location_id, delta in deltas.items():
+        count = F('rating_count') + delta['count']
+        total = F('rating_total') + delta['total']
+        changes = {
+            'rating_count': count,
+            'rating_total': total,
+            # Postgres tính mọi vế phải theo giá trị cũ của dòng nên average dùng count/total mới
+            'average_score': Cast(total, FloatField()) / NullIf(count, 0),
+        }
+        for score in SCORES:
+            if delta[score]:
+                changes[histogram_field(score)] = F(histogram_field(score)) + delta[score]
+        Location.objects.filter(pk=location_id).update(**changes)
+
+
+RESET_SQL = """
+    UPDATE locations SET
+        rating_count = 0, rating_total = 0, average_score = NULL,
+        score_1_count = 0, score_2_count = 0, score_3_count = 0, score_4_count = 0, score_5_count = 0
+    WHERE rating_count <> 0 OR average_score IS NOT NULL
+"""
+
+REBUILD_SQL = """
+    UPDATE locations l SET
+        rating_count = a.cnt,
+        rating_total = a.total,
+        average_score = a.total::float / a.cnt,
+        score_1_count = a.s1, score_2_count = a.s2, score_3_count = a.s3,
+        score_4_count = a.s4, score_5_count = a.s5
+    FROM (
+        SELECT location_id,
+               COUNT(*) AS cnt,
+               SUM(score) AS total,
+               COUNT(*) FILTER (WHERE score = 1) AS s1,
+               COUNT(*) FILTER (WHERE score = 2) AS s2,
+               COUNT(*) FILTER (WHERE score = 3) AS s3,
+               COUNT(*) FILTER (WHERE score = 4) AS s4,
+               COUNT(*) FILTER (WHERE score = 5) AS s5
+        FROM ratings
+        GROUP BY location_id
+    ) a
+    WHERE l.id = a.location_id
+"""
+
+
+def rebuild_rating_aggregates():
+    """Tính lại toàn bộ thống kê từ bảng ratings."""
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('LOCK TABLE ratings IN SHARE MODE')
+            cursor.execute(RESET_SQL)
+            cursor.execute(REBUILD_SQL)
+    invalidate_on_commit('locations', 'locations:bulk')
@@ -0,0 +1,476 @@
+# tour_api/routing.py
+# Định tuyến offline trên mạng đường bộ Đà Nẵng: thời gian/quãng đường đi thực tế giữa các điểm dừng thay
+# cho khoảng cách đường chim bay (sai nhiều khi phải vòng qua cầu sông Hàn hay quanh bán đảo Sơn Trà).
+#
+# build_routing_graph đọc file OSM cục bộ (Overpass JSON như import_locations, hoặc OSM XML), rút gọn
+# thành đồ thị chỉ gồm các nút giao, tiền xử lý contraction hierarchies (CH) rồi lưu thành các mảng NumPy
+# (ROUTING_GRAPH, dạng .npz). Lúc chạy, ma trận nhiều-nhiều được tính bằng thuật toán bucket: mỗi điểm chỉ
+# cần một lượt Dijkstra "đi lên" trên đồ thị CH (vài trăm nút), kết quả lượt tìm của từng nút được cache
+# nên các địa điểm quen thuộc gần như không tốn gì. Không có file đồ thị thì travel_matrix dùng khoảng cách
+# đường chim bay như trước.
+import heapq
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from datetime import timedelta
+from functools import lru_cache
+from xml.etree import ElementTree
+
+import numpy as np
+from django.conf import settings
+
+from .importer import iter_elements
+from .planning import EARTH_RADIUS_M, haversine_matrix
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # scipy là tuỳ chọn; không có thì tìm nút gần nhất bằng NumPy
+    cKDTree = None
+
+logger = logging.getLogger(__name__)
+
+# Tốc độ (km/h) theo loại đường khi way không có maxspeed; chủ yếu là xe máy trong nội thành
+ROAD_SPEEDS_KMH = {
+    'motorway': 80, 'motorway_link': 45,
+    'trunk': 60, 'trunk_link': 40,
+    'primary': 45, 'primary_link': 35,
+    'secondary': 40, 'secondary_link': 30,
+    'tertiary': 35, 'tertiary_link': 25,
+    'unclassified': 25, 'residential': 25, 'road': 25,
+    'living_street': 10, 'service': 15, 'track': 10,
+}
+# Tốc độ đi từ địa điểm tới nút đường gần nhất, và giữa hai điểm không có đường nối trong đồ thị
+ACCESS_SPEED_KMH = 15
+# Tốc độ quy đổi khoảng cách đường chim bay ra thời gian khi chưa có đồ thị đường
+STRAIGHT_LINE_SPEED_KMH = 25
+# Thời gian tham quan mỗi điểm dừng; estimated_time = thời gian tham quan + thời gian đi tới điểm đó
+VISIT_DURATION = timedelta(hours=1)
+TRAVEL_ROUNDING = timedelta(minutes=5)
+
+# Số nút tối đa mà một lượt tìm witness được duyệt khi tiền xử lý; nhỏ hơn thì nhanh hơn nhưng thêm shortcut
+WITNESS_SETTLE_LIMIT = 100
+# Số lượt tìm "đi lên" được cache theo mỗi chiều
+SEARCH_CACHE_SIZE = 8192
+# Số đích được ghép cùng lúc khi tính ma trận (giới hạn bộ nhớ của bảng dày trong node_matrix)
+TARGET_BLOCK = 128
+GRAPH_FORMAT = 1
+
+ARRAYS = ['lat', 'lng', 'fwd_indptr', 'fwd_head', 'fwd_time', 'fwd_length',
+          'bwd_indptr', 'bwd_head', 'bwd_time', 'bwd_length']
+
+
+def osm_elements(path):
+    """Node và way của file OSM: Overpass JSON (``.json``) hoặc OSM XML, đọc tuần tự."""
+    if str(path).endswith('.json'):
+        yield from iter_elements(path)
+        return
+    for _, elem in ElementTree.iterparse(path, events=('end',)):
+        if elem.tag == 'node':
+            yield {'type': 'node', 'id': int(elem.get('id')),
+                   'lat': float(elem.get('lat')), 'lon': float(elem.get('lon'))}
+            elem.clear()
+        elif elem.tag == 'way':
+            yield {'type': 'way', 'id': int(elem.get('id')),
+                   'nodes': [int(nd.get('ref')) for nd in elem.iter('nd')],
+                   'tags': {tag.get('k'): tag.get('v') for tag in elem.iter('tag')}}
+            elem.clear()
+
+
+def road_attributes(tags):
+    """``(tốc độ km/h, đi chiều thuận, đi chiều ngược)`` của way, hoặc None nếu xe không đi được."""
+    highway = tags.get('highway')
+    speed = ROAD_SPEEDS_KMH.get(highway)
+    if speed is None or tags.get('area') == 'yes' or tags.get('access') in ('no', 'private'):
+        return None
+    maxspeed = re.match(r'\s*(\d+)', tags.get('maxspeed', ''))
+    if maxspeed and int(maxspeed.group(1)) > 0:
+        speed = int(maxspeed.group(1))
+    oneway = tags.get('oneway')
+    if oneway == '-1':
+        return speed, False, True
+    if oneway in ('yes', 'true', '1') or (
+            oneway is None and (tags.get('junction') in ('roundabout', 'circular') or highway == 'motorway')):
+        return speed, True, False
+    return speed, True, True
+
+
+def segment_lengths(lat, lng):
+    """Độ dài (mét) các đoạn nối liên tiếp của một đường gấp khúc."""
+    lat, lng = np.radians(lat), np.radians(lng)
+    h = (np.sin(np.diff(lat) / 2) ** 2
+         + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lng) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def road_network(elements):
+    """Đồ thị đường có hướng ``(lat, lng, src, dst, time_s, length_m)`` từ các phần tử OSM.
+
+    Chỉ giữ nút giao và đầu mút (các nút trung gian của một đoạn đường được gộp vào cạnh), cạnh song song
+    chỉ giữ cạnh nhanh nhất, và chỉ giữ thành phần liên thông lớn nhất.
+    """
+    coords = {}
+    ways = []
+    for element in elements:
+        if element.get('type') == 'node':
+            coords[element['id']] = (element['lat'], element['lon'])
+        elif element.get('type') == 'way':
+            road = road_attributes(element.get('tags') or {})
+            if road is not None and len(element.get('nodes') or ()) > 1:
+                ways.append((element['nodes'], *road))
+
+    # Way bị cắt ở rìa vùng trích xuất: tách thành các đoạn chỉ gồm nút có toạ độ
+    runs = []
+    for refs, *road in ways:
+        run = []
+        for ref in [*refs, None]:
+            if ref is not None and ref in coords:
+                run.append(ref)
+                continue
+            if len(run) > 1:
+                runs.append((run, *road))
+            run = []
+
+    usage = Counter(ref for run, *_ in runs for ref in run)
+    junctions = {ref for ref, count in usage.items() if count > 1}
+    junctions.update(ref for run, *_ in runs for ref in (run[0], run[-1]))
+
+    edges = []
+    for run, speed, forward, backward in runs:
+        lengths = segment_lengths([coords[ref][0] for ref in run], [coords[ref][1] for ref in run])
+        start, length = 0, 0.0
+        for k in range(1, len(run)):
+            length += float(lengths[k - 1])
+            if run[k] not in junctions:
+                continue
+            u, v = run[start], run[k]
+            if u != v:
+                seconds = length / (speed / 3.6)
+                if forward:
+                    edges.append((u, v, seconds, length))
+                if backward:
+                    edges.append((v, u, seconds, length))
+            start, length = k, 0.0
+
+    if not edges:
+        raise ValueError('File OSM không có đường nào cho xe đi được')
+    osm_ids = sorted({ref for u, v, _, _ in edges for ref in (u, v)})
+    index = {ref: idx for idx, ref in enumerate(osm_ids)}
+    src = np.array([index[u] for u, _, _, _ in edges], dtype=np.int64)
+    dst = np.array([index[v] for _, v, _, _ in edges], dtype=np.int64)
+    time = np.array([edge[2] for edge in edges])
+    length = np.array([edge[3] for edge in edges])
+
+    # Cạnh song song: giữ cạnh có thời gian nhỏ nhất
+    order = np.lexsort((time, dst, src))
+    src, dst, time, length = src[order], dst[order], time[order], length[order]
+    first = np.ones(len(src), dtype=bool)
+    first[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+    src, dst, time, length = src[first], dst[first], time[first], length[first]
+
+    keep = largest_component(len(osm_ids), src, dst)
+    remap = np.cumsum(keep) - 1
+    edge_mask = keep[src] & keep[dst]
+    lat = np.array([coords[ref][0] for ref in osm_ids])[keep]
+    lng = np.array([coords[ref][1] for ref in osm_ids])[keep]
+    return lat, lng, remap[src[edge_mask]], remap[dst[edge_mask]], time[edge_mask], length[edge_mask]
+
+
+def largest_component(n, src, dst):
+    """Mặt nạ các nút thuộc thành phần liên thông (yếu) lớn nhất."""
+    neighbours = [[] for _ in range(n)]
+    for u, v in zip(src.tolist(), dst.tolist()):
+        neighbours[u].append(v)
+        neighbours[v].append(u)
+    labels = np.full(n, -1, dtype=np.int64)
+    sizes = []
+    for root in range(n):
+        if labels[root] >= 0:
+            continue
+        label, stack, size = len(sizes), [root], 0
+        labels[root] = label
+        while stack:
+            node = stack.pop()
+            size += 1
+            for other in neighbours[node]:
+                if labels[other] < 0:
+                    labels[other] = label
+                    stack.append(other)
+        sizes.append(size)
+    return labels == int(np.argmax(sizes))
+
+
+def contract(n, src, dst, time, length, settle_limit=WITNESS_SETTLE_LIMIT, log=None):
+    """Tiền xử lý contraction hierarchies; trả về đồ thị "đi lên" theo hai chiều dạng CSR.
+
+    Nút được co lần lượt theo độ ưu tiên (edge difference + số láng giềng đã co, cập nhật lười); khi co
+    nút v, cặp cạnh u -> v -> w được thay bằng shortcut u -> w nếu lượt tìm witness (giới hạn
+    ``settle_limit`` nút) không thấy đường khác ngắn hơn. Các cạnh còn lại của v lúc co đều nối tới nút co
+    sau nó: cạnh ra thuộc đồ thị tìm xuôi, cạnh vào thuộc đồ thị tìm ngược.
+    """
+    out = [{} for _ in range(n)]
+    inc = [{} for _ in range(n)]
+    for u, v, t, m in zip(src.tolist(), dst.tolist(), time.tolist(), length.tolist()):
+        out[u][v] = (t, m)
+        inc[v][u] = (t, m)
+    deleted = [0] * n
+
+    def witness(u, skip, limit):
+        dist = {u: 0.0}
+        heap = [(0.0, u)]
+        settled = 0
+        while heap and settled < settle_limit:
+            d, x = heapq.heappop(heap)
+            if d > dist[x]:
+                continue
+            if d > limit:
+                break
+            settled += 1
+            for y, (t, _) in out[x].items():
+                if y != skip and d + t < dist.get(y, np.inf):
+                    dist[y] = d + t
+                    heapq.heappush(heap, (d + t, y))
+        return dist
+
+    def shortcuts(v):
+        found = []
+        for u, (tu, mu) in inc[v].items():
+            targets = [(w, edge) for w, edge in out[v].items() if w != u]
+            if not targets:
+                continue
+            dist = witness(u, v, tu + max(t for _, (t, _) in targets))
+            for w, (tw, mw) in targets:
+                # Đường tìm được (kể cả chưa chốt) không dài hơn thì không cần shortcut
+                if dist.get(w, np.inf) > tu + tw:
+                    found.append((u, w, tu + tw, mu + mw))
+        return found
+
+    def priority(v, found):
+        return len(found) - len(inc[v]) - len(out[v]) + deleted[v]
+
+    heap = [(priority(v, shortcuts(v)), v) for v in range(n)]
+    heapq.heapify(heap)
+    contracted = bytearray(n)
+    up_out, up_in = [None] * n, [None] * n
+    done = 0
+    while heap:
+        _, v = heapq.heappop(heap)
+        if contracted[v]:
+            continue
+        found = shortcuts(v)
+        current = priority(v, found)
+        if heap and current > heap[0][0]:
+            heapq.heappush(heap, (current, v))
+            continue
+
+        contracted[v] = 1
+        up_out[v], up_in[v] = list(out[v].items()), list(inc[v].items())
+        neighbours = set(out[v]) | set(inc[v])
+        for w in out[v]:
+            del inc[w][v]
+        for u in inc[v]:
+            del out[u][v]
+        out[v], inc[v] = {}, {}
+        for u, w, t, m in found:
+            if t < out[u].get(w, (np.inf,))[0]:
+                out[u][w] = inc[w][u] = (t, m)
+        # Độ ưu tiên của láng giềng chỉ được tính lại khi chúng lên đỉnh heap (cập nhật lười)
+        for x in neighbours:
+            deleted[x] += 1
+
+        done += 1
+        if log and done % 10000 == 0:
+            log(f'  đã co {done}/{n} nút')
+
+    graph = {}
+    for prefix, edges in (('fwd', up_out), ('bwd', up_in)):
+        counts = np.array([len(node_edges) for node_edges in edges], dtype=np.int64)
+        graph[f'{prefix}_indptr'] = np.concatenate(([0], np.cumsum(counts)))
+        flat = [edge for node_edges in edges for edge in node_edges]
+        graph[f'{prefix}_head'] = np.array([head for head, _ in flat], dtype=np.int64)
+        graph[f'{prefix}_time'] = np.array([t for _, (t, _) in flat], dtype=np.float64)
+        graph[f'{prefix}_length'] = np.array([m for _, (_, m) in flat], dtype=np.float64)
+    return graph
+
+
+def build_engine(elements, settle_limit=WITNESS_SETTLE_LIMIT, log=None):
+    lat, lng, src, dst, time, length = road_network(elements)
+    if log:
+        log(f'Đồ thị rút gọn: {len(lat)} nút, {len(src)} cạnh; đang tiền xử lý CH...')
+    return RoutingEngine(lat=lat, lng=lng, **contract(len(lat), src, dst, time, length, settle_limit, log))
+
+
+class RoutingEngine:
+    """Ma trận thời gian/quãng đường đi đường bộ trên đồ thị CH đã tiền xử lý."""
+
+    def __init__(self, **arrays):
+        self.arrays = {name: np.asarray(arrays[name]) for name in ARRAYS}
+        self.lat, self.lng = self.arrays['lat'], self.arrays['lng']
+        # Vòng lặp Dijkstra chạy trên list Python: nhanh hơn nhiều so với đánh chỉ số từng phần tử NumPy
+        fwd = [self.arrays[f'fwd_{name}'].tolist() for name in ('indptr', 'head', 'time', 'length')]
+        bwd = [self.arrays[f'bwd_{name}'].tolist() for name in ('indptr', 'head', 'time', 'length')]
+        self.forward = lru_cache(maxsize=SEARCH_CACHE_SIZE)(lambda node: self.upward(node, *fwd, *bwd[:3]))
+        self.backward = lru_cache(maxsize=SEARCH_CACHE_SIZE)(lambda node: self.upward(node, *bwd, *fwd[:3]))
+
+        self.lat0 = float(self.lat.mean())
+        self.xy = self.project(self.lat, self.lng)
+        self.tree = cKDTree(self.xy) if cKDTree is not None else None
+
+    def __len__(self):
+        return len(self.lat)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if int(data['format']) != GRAPH_FORMAT:
+                raise ValueError(f'{path}: định dạng đồ thị không hỗ trợ, hãy chạy lại build_routing_graph')
+            return cls(**{name: data[name] for name in ARRAYS})
+
+    def save(self, path):
+        np.savez(path, format=GRAPH_FORMAT, **self.arrays)
+
+    def clear_cache(self):
+        self.forward.cache_clear()
+        self.backward.cache_clear()
+
+    def project(self, lat, lng):
+        lat = np.radians(np.asarray(lat, dtype=np.float64))
+        lng = np.radians(np.asarray(lng, dtype=np.float64))
+        return np.column_stack((lng * np.cos(np.radians(self.lat0)), lat)) * EARTH_RADIUS_M
+
+    def snap(self, lat, lng):
+        """Nút đường gần nhất của mỗi điểm và khoảng cách (mét) tới nút đó."""
+        xy = self.project(lat, lng)
+        if self.tree is not None:
+            offsets, nodes = self.tree.query(xy)
+            return np.asarray(nodes, dtype=np.int64), np.asarray(offsets)
+        nodes = np.empty(len(xy), dtype=np.int64)
+        for start in range(0, len(xy), 64):
+            block = xy[start:start + 64]
+            nodes[start:start + 64] = np.argmin(
+                ((block[:, None, :] - self.xy[None, :, :]) ** 2).sum(axis=2), axis=1)
+        return nodes, np.sqrt(((xy - self.xy[nodes]) ** 2).sum(axis=1))
+
+    @staticmethod
+    def upward(node, indptr, head, time, length, down_indptr, down_head, down_time):
+        """Dijkstra trên đồ thị đi lên: các nút đã gặp (sắp theo id nút) với thời gian và quãng đường.
+
+        Stall-on-demand: nút x không được duyệt tiếp nếu đi tới nó qua một nút cao hơn (cạnh của đồ thị
+        chiều kia) còn nhanh hơn, vì khi đó đường qua x chắc chắn không phải đường ngắn nhất.
+        """
+        dist, metres = {node: 0.0}, {node: 0.0}
+        heap = [(0.0, node)]
+        while heap:
+            d, x = heapq.heappop(heap)
+            if d > dist[x]:
+                continue
+            if any(dist.get(down_head[k], np.inf) + down_time[k] < d
+                   for k in range(down_indptr[x], down_indptr[x + 1])):
+                continue
+            for k in range(indptr[x], indptr[x + 1]):
+                y, nd = head[k], d + time[k]
+                if nd < dist.get(y, np.inf):
+                    dist[y], metres[y] = nd, metres[x] + length[k]
+                    heapq.heappush(heap, (nd, y))
+        nodes = np.fromiter(dist, dtype=np.int64, count=len(dist))
+        order = np.argsort(nodes)
+        return (nodes[order], np.fromiter(dist.values(), dtype=np.float64, count=len(dist))[order],
+                np.fromiter(metres.values(), dtype=np.float64, count=len(dist))[order])
+
+    def node_matrix(self, sources, targets):
+        """``(giây, mét)`` đường đi ngắn nhất (theo thời gian) giữa các nút; inf nếu không có đường."""
+        seconds = np.full((len(sources), len(targets)), np.inf)
+        metres = np.full_like(seconds, np.inf)
+        forward = [self.forward(int(source)) for source in sources]
+        position = np.full(len(self), -1, dtype=np.int64)
+        for start in range(0, len(targets), TARGET_BLOCK):
+            cols = np.arange(start, min(start + TARGET_BLOCK, len(targets)))
+            searches = [self.backward(int(targets[col])) for col in cols]
+            # Bảng dày (nút đã gặp trong các lượt tìm ngược) x (đích) của thời gian/quãng đường tới đích
+            seen = np.unique(np.concatenate([nodes for nodes, _, _ in searches]))
+            position[seen] = np.arange(len(seen))
+            b_time = np.full((len(seen), len(cols)), np.inf)
+            b_length = np.zeros_like(b_time)
+            for col, (nodes, time, length) in enumerate(searches):
+                b_time[position[nodes], col] = time
+                b_length[position[nodes], col] = length
+
+            for row, (nodes, time, length) in enumerate(forward):
+                rows = position[nodes]
+                common = rows >= 0
+                if not common.any():
+                    continue
+                # Điểm gặp tốt nhất của hai lượt tìm cho từng đích
+                candidate = time[common, None] + b_time[rows[common]]
+                best = np.argmin(candidate, axis=0)
+                span = np.arange(len(cols))
+                seconds[row, cols] = candidate[best, span]
+                metres[row, cols] = length[common][best] + b_length[rows[common][best], span]
+            position[seen] = -1
+        return seconds, metres
+
+    def matrix(self, lat_a, lng_a, lat_b=None, lng_b=None):
+        """``(giây, mét)`` đi đường bộ giữa hai tập toạ độ (bỏ trống tập b để tính từng cặp trong tập a).
+
+        Gồm cả đoạn từ mỗi điểm tới nút đường gần nhất; cặp không có đường nối dùng đường chim bay.
+        """
+        if lat_b is None:
+            lat_b, lng_b = lat_a, lng_a
+        src, src_offset = self.snap(lat_a, lng_a)
+        dst, dst_offset = self.snap(lat_b, lng_b)
+        seconds, metres = self.node_matrix(src, dst)
+        access = ACCESS_SPEED_KMH / 3.6
+        seconds += (src_offset[:, None] + dst_offset[None, :]) / access
+        metres += src_offset[:, None] + dst_offset[None, :]
+
+        straight = haversine_matrix(lat_a, lng_a, lat_b, lng_b)
+        unreachable = ~np.isfinite(seconds)
+        seconds[unreachable] = straight[unreachable] / access
+        metres[unreachable] = straight[unreachable]
+        same = straight == 0
+        seconds[same], metres[same] = 0.0, 0.0
+        return seconds, metres
+
+
+_engine = None
+_engine_key = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """RoutingEngine của file ROUTING_GRAPH (nạp lại khi file đổi), hoặc None nếu chưa có file."""
+    global _engine, _engine_key
+    path = getattr(settings, 'ROUTING_GRAPH', None)
+    try:
+        key = (str(path), os.stat(path).st_mtime) if path else None
+    except OSError:
+        key = None
+    if key is None:
+        return None
+    if key != _engine_key:
+        with _engine_lock:
+            if key != _engine_key:
+                try:
+                    _engine = RoutingEngine.load(path)
+                except Exception:  # file hỏng hoặc ghi dở: BadZipFile, EOFError, ...
+                    logger.exception('Không nạp được đồ thị đường %s, dùng khoảng cách đường chim bay', path)
+                    _engine = None
+                _engine_key = key
+    return _engine
+
+
+def travel_matrix(lat, lng):
+    """``(giây, mét, chế độ)`` giữa mọi cặp điểm; chế độ là ``'road'`` hoặc ``'straight_line'``."""
+    engine = get_engine()
+    if engine is not None:
+        seconds, metres = engine.matrix(lat, lng)
+        return seconds, metres, 'road'
+    metres = haversine_matrix(lat, lng)
+    return metres / (STRAIGHT_LINE_SPEED_KMH / 3.6), metres, 'straight_line'
+
+
+def stop_duration(travel_seconds):
+    """estimated_time của điểm dừng: thời gian tham quan + thời gian đi tới (làm tròn lên 5 phút)."""
+    step = TRAVEL_ROUNDING.total_seconds()
+    return VISIT_DURATION + timedelta(seconds=float(np.ceil(travel_seconds / step) * step))
@@ -0,0 +1,44 @@
+# tour_api/search.py
+# Tìm kiếm địa điểm: full-text (tsvector không dấu) + trigram cho lỗi gõ, có xếp hạng.
+import re
+import unicodedata
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db.models import F, Func, Q
+from django.db.models.functions import Greatest
+
+
+def unaccent(text):
+    """Bỏ dấu tiếng Việt giống hàm SQL tour_unaccent (đ -> d, chữ thường)."""
+    text = text.replace('đ', 'd').replace('Đ', 'D')
+    text = unicodedata.normalize('NFD', text)
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def build_tsquery(text):
+    # Mỗi từ là một prefix để gợi ý được ngay khi người dùng đang gõ: "ban co" -> "ban:* & co:*"
+    tokens = re.findall(r'\w+', unaccent(text))
+    return ' & '.join(f'{token}:*' for token in tokens)
+
+
+def search_locations(queryset, text):
+    """Lọc và gắn ``search_rank`` cho ``queryset`` theo chuỗi tìm kiếm ``text``."""
+    plain = ' '.join(re.findall(r'\w+', unaccent(text)))
+    if not plain:
+        return queryset.none()
+
+    query = SearchQuery(build_tsquery(text), config='simple', search_type='raw')
+    queryset = queryset.alias(
+        name_plain=Func(F('name'), function='tour_unaccent'),
+        name_vi_plain=Func(F('name_vi'), function='tour_unaccent'),
+    ).filter(
+        Q(search_vector=query)
+        | Q(name_plain__trigram_word_similar=plain)
+        | Q(name_vi_plain__trigram_word_similar=plain)
+    )
+    return queryset.annotate(
+        search_rank=SearchRank(F('search_vector'), query) + Greatest(
+            TrigramWordSimilarity(plain, 'name_plain'),
+            TrigramWordSimilarity(plain, 'name_vi_plain'),
+        ),
+    )
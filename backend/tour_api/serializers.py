@@ -1,11 +1,36 @@
 # itinerary/serializers.py
+from django.urls import reverse
 from rest_framework import serializers
 from .models import Location, Image, Itinerary, ItineraryLocation, District,Rating
+from .ratings import SCORES, histogram_field, rating_histogram
+from .fieldsets import SparseFieldsMixin
+from .imaging import CONTENT_TYPES, available_formats, variant_widths
 
 class ImageSerializer(serializers.ModelSerializer):
+    # srcset dạng WebP; ``sources`` liệt kê mọi định dạng (AVIF trước) cho thẻ <picture>
+    srcset = serializers.SerializerMethodField()
+    sources = serializers.SerializerMethodField()
+
     class Meta:
         model = Image
-        fields = ['id', 'url', 'caption', 'image_order']
+        fields = ['id', 'url', 'caption', 'image_order', 'width', 'height', 'blurhash', 'byte_size',
+                  'srcset', 'sources']
+        read_only_fields = ['width', 'height', 'blurhash', 'byte_size']
+
+    def build_srcset(self, obj, fmt):
+        return ', '.join(
+            f"{reverse('image-variant', args=[obj.pk, width, fmt])} {width}w"
+            for width in variant_widths(obj.width)
+        )
+
+    def get_srcset(self, obj):
+        formats = available_formats()
+        if not formats:
+            return None
+        return self.build_srcset(obj, 'webp' if 'webp' in formats else formats[-1])
+
+    def get_sources(self, obj):
+        return [{'type': CONTENT_TYPES[fmt], 'srcset': self.build_srcset(obj, fmt)} for fmt in available_formats()]
 
 class RatingSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)  # Hiển thị username
@@ -16,25 +41,38 @@ class RatingSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'location', 'score', 'comment', 'created_at', 'updated_at']
         read_only_fields = ['user', 'created_at', 'updated_at']
 
-class LocationSerializer(serializers.ModelSerializer):
+class LocationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     images = ImageSerializer(many=True, read_only=True)
     ratings = RatingSerializer(many=True, read_only=True)
     geom = serializers.SerializerMethodField()
+    rating_histogram = serializers.SerializerMethodField()
+    distance_m = serializers.FloatField(read_only=True)  # Chỉ có khi tìm kiếm lân cận (?nearby=)
 
     class Meta:
         model = Location
-        fields = ['id', 'name', 'name_vi', 'tourism_type', 'geom', 'details', 'images', 'embed_url','ratings']
+        fields = ['id', 'name', 'name_vi', 'tourism_type', 'geom', 'details', 'images', 'embed_url','ratings',
+                  'average_score', 'rating_count', 'rating_histogram', 'distance_m']
+        read_only_fields = ['average_score', 'rating_count']
+
+    # ?fields= / ?expand= / ?view= (xem fieldsets.py)
+    sparse_context_key = 'location_fields'
+    field_columns = {
+        'geom': ['geom'],
+        'rating_histogram': [histogram_field(score) for score in SCORES],
+        'distance_m': [],
+    }
+    field_profiles = {
+        # Marker trên bản đồ: đủ để vẽ và chọn icon (embed_url), chi tiết nạp khi mở địa điểm
+        'marker': ['id', 'name', 'name_vi', 'tourism_type', 'geom', 'embed_url', 'distance_m'],
+    }
 
     def get_geom(self, obj):
         if obj.geom:
             return {'lat': obj.geom.y, 'lng': obj.geom.x}
         return None
-    
-    def get_average_rating(self, obj):
-        ratings = obj.ratings.all()
-        if ratings.exists():
-            return round(sum(r.score for r in ratings) / ratings.count(), 1)
-        return None
+
+    def get_rating_histogram(self, obj):
+        return rating_histogram(obj)
 
 class ItineraryLocationSerializer(serializers.ModelSerializer):
     location = LocationSerializer(read_only=True)
@@ -43,21 +81,33 @@ class ItineraryLocationSerializer(serializers.ModelSerializer):
         model = ItineraryLocation
         fields = ['id', 'location', 'visit_order', 'day', 'estimated_time']
 
+# Dòng ItineraryLocation trả về sau PATCH: chỉ id địa điểm, không lồng LocationSerializer
+class ItineraryStopSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ItineraryLocation
+        fields = ['id', 'location', 'day', 'visit_order', 'estimated_time']
+
 class ItinerarySerializer(serializers.ModelSerializer):
     locations = ItineraryLocationSerializer(many=True, read_only=True)
 
     class Meta:
         model = Itinerary
-        fields = ['id', 'user', 'survey_data', 'created_at', 'updated_at', 'locations']
+        fields = ['id', 'user', 'source', 'survey_data', 'created_at', 'updated_at', 'version', 'locations']
 
 class DistrictSerializer(serializers.ModelSerializer):
     geom = serializers.SerializerMethodField()
+    location_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = District
-        fields = ['id', 'name', 'geom']
+        fields = ['id', 'name', 'geom', 'location_count']
 
     def get_geom(self, obj):
+        # Nếu view yêu cầu một mức đơn giản hoá (?zoom= / ?tolerance=) thì dùng GeoJSON đã tính sẵn
+        if self.context.get('geometry_level') is not None:
+            simplified = getattr(obj, 'level_geometries', None)
+            if simplified:
+                return simplified[0].geojson
         if obj.geom:
             return obj.geom.geojson
         return None
@@ -0,0 +1,135 @@
+# tour_api/signals.py
+# Đồng bộ dữ liệu phụ thuộc (cache tile, ...) khi Location/District thay đổi.
+# Signal chạy trước khi transaction commit nên cache dùng chung giữa các worker được xoá lại sau commit.
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import authentication, snapshot, tiles
+from .caching import invalidate_on_commit
+from .districts import assign_location_districts, rebuild_district_geometries
+from .models import District, Image, Itinerary, ItineraryLocation, Location, Rating
+from .ratings import apply_rating_change
+
+
+@receiver(pre_save, sender=Location)
+def remember_location_geom(sender, instance, raw=False, **kwargs):
+    # Lưu lại toạ độ cũ để xoá cả tile ở vị trí trước khi di chuyển
+    if raw or instance.pk is None:
+        return
+    instance._previous_geom = Location.objects.filter(pk=instance.pk).values_list('geom', flat=True).first()
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def invalidate_location_tiles(sender, instance, **kwargs):
+    points = [getattr(instance, '_previous_geom', None), instance.geom]
+
+    def invalidate_tiles():
+        for point in points:
+            tiles.invalidate_point('locations', point)
+
+    # Xoá lại sau commit: tile mà worker khác render trong lúc chờ commit vẫn mang dữ liệu cũ
+    invalidate_tiles()
+    transaction.on_commit(invalidate_tiles)
+
+
+@receiver(post_save, sender=District)
+@receiver(post_delete, sender=District)
+def invalidate_district_tiles(sender, instance, **kwargs):
+    tiles.invalidate_layer('districts')
+    transaction.on_commit(lambda: tiles.invalidate_layer('districts'))
+
+
+@receiver(post_save, sender=District)
+def simplify_district_geometry(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    rebuild_district_geometries([instance.pk])
+
+
+@receiver(post_save, sender=Location)
+def assign_district(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    assign_location_districts([instance.pk])
+
+
+@receiver(post_save, sender=District)
+@receiver(post_delete, sender=District)
+def reassign_districts(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    assign_location_districts()
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+@receiver(post_save, sender=District)
+@receiver(post_delete, sender=District)
+def refresh_location_snapshot(sender, instance, raw=False, **kwargs):
+    snapshot.bump_version()
+
+
+@receiver(post_delete, sender=Rating)
+def remove_rating_from_aggregates(sender, instance, **kwargs):
+    # Tạo/sửa cập nhật thống kê trong view; xoá (kể cả CASCADE khi xoá user/địa điểm, admin) đi qua đây
+    apply_rating_change(old=(instance.location_id, instance.score))
+
+
+# Cache response (tour_api/caching.py)
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def invalidate_location_responses(sender, instance, **kwargs):
+    invalidate_on_commit('locations', f'location:{instance.pk}')
+    if kwargs.get('signal') is post_delete and instance.district_id is not None:
+        invalidate_on_commit('districts', 'districts:bulk')
+
+
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+def invalidate_image_responses(sender, instance, **kwargs):
+    invalidate_on_commit('locations', f'location:{instance.location_id}')
+
+
+@receiver(pre_save, sender=Rating)
+def remember_rating_location(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    instance._previous_location_id = Rating.objects.filter(pk=instance.pk).values_list('location_id', flat=True).first()
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def invalidate_rating_responses(sender, instance, **kwargs):
+    location_ids = {instance.location_id, getattr(instance, '_previous_location_id', None)} - {None}
+    invalidate_on_commit('locations', *(f'location:{location_id}' for location_id in location_ids))
+
+
+@receiver(post_save, sender=District)
+@receiver(post_delete, sender=District)
+def invalidate_district_responses(sender, instance, **kwargs):
+    invalidate_on_commit('districts', 'districts:bulk', 'locations')
+
+
+# Gợi ý thay thế theo lịch trình phụ thuộc vào các điểm dừng của lịch trình đó
+@receiver(post_save, sender=Itinerary)
+@receiver(post_delete, sender=Itinerary)
+def invalidate_itinerary_responses(sender, instance, **kwargs):
+    invalidate_on_commit(f'itinerary:{instance.pk}')
+
+
+@receiver(post_save, sender=ItineraryLocation)
+@receiver(post_delete, sender=ItineraryLocation)
+def invalidate_itinerary_location_responses(sender, instance, **kwargs):
+    invalidate_on_commit(f'itinerary:{instance.itinerary_id}')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    # Đổi mật khẩu hay khoá tài khoản có hiệu lực ngay, không phải chờ hết AUTH_USER_CACHE_TTL
+    user_id = instance.pk  # sau khi xoá, instance.pk thành None trước lúc commit
+    authentication.forget_user(user_id)
+    transaction.on_commit(lambda: authentication.forget_user(user_id))
@@ -0,0 +1,249 @@
+# tour_api/snapshot.py
+# Ảnh chụp (snapshot) toạ độ của mọi địa điểm trong bộ nhớ tiến trình để trả lời truy vấn
+# k-gần-nhất / bán kính mà không cần gọi PostGIS. Snapshot được nạp lại khi version khác với bản
+# đang giữ. Version là sequence tour_api_snapshot_version_seq trong PostgreSQL (migration 0017) nên
+# mọi worker và management command cùng thấy; nó được tăng sau khi transaction thay đổi
+# Location/District commit.
+import logging
+import threading
+import time
+
+import numpy as np
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F, FloatField, Func
+from django.db.models.expressions import RawSQL
+
+from .planning import EARTH_RADIUS_M, haversine_matrix
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # scipy là tuỳ chọn; không có thì quét vector hoá bằng NumPy
+    cKDTree = None
+
+logger = logging.getLogger(__name__)
+
+VERSION_SEQUENCE = 'tour_api_snapshot_version_seq'
+# Khoảng thời gian (giây) giữa hai lần kiểm tra version trong DB
+CHECK_INTERVAL = 1.0
+# Sai số của phép chiếu phẳng so với khoảng cách haversine được bù bằng hệ số này
+RADIUS_SLACK = 1.01
+# ordered_by_snapshot dùng array_position (quét tuyến tính) cho mỗi dòng nên chi phí tăng theo bình phương
+# số kết quả; nhiều hơn ngưỡng này thì sắp xếp KNN của PostGIS nhanh hơn
+MAX_ORDERED_ROWS = 2000
+
+
+class LocationSnapshot:
+    def __init__(self, ids, lat, lng, tourism_types, district_ids, district_names, version):
+        self.version = version
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lng = np.asarray(lng, dtype=np.float64)
+        self.district_ids = np.asarray(
+            [-1 if district_id is None else district_id for district_id in district_ids], dtype=np.int64)
+        self.district_names = dict(district_names)
+
+        self.type_names = sorted(set(tourism_types))
+        codes = {name: code for code, name in enumerate(self.type_names)}
+        self.type_codes = np.asarray([codes[name] for name in tourism_types], dtype=np.int16)
+
+        # Chiếu equirectangular quanh vĩ độ trung bình: khoảng cách Euclid xấp xỉ mét trong phạm vi một tỉnh
+        self.lat0 = float(self.lat.mean()) if len(self.lat) else 0.0
+        self.xy = self.project(self.lat, self.lng)
+        self.index_by_id = {int(location_id): idx for idx, location_id in enumerate(self.ids)}
+
+        self.tree = None
+        self.type_trees = {}
+        self.type_indices = {
+            name: np.flatnonzero(self.type_codes == code) for code, name in enumerate(self.type_names)
+        }
+        self.type_xy = {name: self.xy[indices] for name, indices in self.type_indices.items()}
+        self.district_indices = {
+            int(district_id): np.flatnonzero(self.district_ids == district_id)
+            for district_id in np.unique(self.district_ids)
+        }
+        if cKDTree is not None and len(self.ids):
+            self.tree = cKDTree(self.xy)
+            self.type_trees = {
+                name: cKDTree(self.xy[indices]) for name, indices in self.type_indices.items() if len(indices)
+            }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def type_code(self, tourism_type):
+        try:
+            return self.type_names.index(tourism_type)
+        except ValueError:
+            return -1
+
+    def project(self, lat, lng):
+        lat = np.radians(np.asarray(lat, dtype=np.float64))
+        lng = np.radians(np.asarray(lng, dtype=np.float64))
+        return np.column_stack((lng * np.cos(np.radians(self.lat0)), lat)) * EARTH_RADIUS_M
+
+    def query(self, lat, lng, k=None, radius_m=None, tourism_type=None, district=None, exclude_ids=None):
+        """Các địa điểm gần (lat, lng) nhất, gần trước.
+
+        ``k`` giới hạn số kết quả, ``radius_m`` giới hạn bán kính (mét); ``district`` là tên quận.
+        Trả về ``(indices, distances_m)`` — chỉ số vào các mảng của snapshot và khoảng cách haversine.
+        """
+        point = self.project([lat], [lng])[0]
+
+        if tourism_type is not None:
+            base = self.type_indices.get(tourism_type, np.empty(0, dtype=np.int64))
+            base_xy = self.type_xy.get(tourism_type, np.empty((0, 2)))
+            tree = self.type_trees.get(tourism_type)
+        else:
+            base = None
+            base_xy = self.xy
+            tree = self.tree
+
+        exclude = np.fromiter(exclude_ids or (), dtype=np.int64)
+
+        if district is not None:
+            # Lọc theo quận: quét tập con (nhỏ) của quận đó
+            district_id = self.district_names.get(district, -2)
+            candidates = self.district_indices.get(district_id, np.empty(0, dtype=np.int64))
+            if tourism_type is not None:
+                candidates = candidates[self.type_codes[candidates] == self.type_code(tourism_type)]
+            if len(exclude):
+                candidates = candidates[~np.isin(self.ids[candidates], exclude)]
+            candidates = self._scan_candidates(candidates, self.xy[candidates], point, k, radius_m)
+        elif tree is not None:
+            # Lấy thêm len(exclude) điểm để sau khi loại trừ vẫn đủ k
+            extra_k = k + len(exclude) if k is not None else None
+            candidates = self._tree_candidates(tree, point, extra_k, radius_m).astype(np.int64)
+            if base is not None:
+                candidates = base[candidates]
+            if len(exclude):
+                candidates = candidates[~np.isin(self.ids[candidates], exclude)]
+        else:
+            candidates = np.arange(len(self.ids)) if base is None else base
+            if len(exclude):
+                selected = ~np.isin(self.ids[candidates], exclude)
+                candidates, base_xy = candidates[selected], base_xy[selected]
+            candidates = self._scan_candidates(candidates, base_xy, point, k, radius_m)
+
+        distances = haversine_matrix([lat], [lng], self.lat[candidates], self.lng[candidates])[0]
+        if radius_m is not None:
+            inside = distances <= radius_m
+            candidates, distances = candidates[inside], distances[inside]
+        order = np.lexsort((self.ids[candidates], distances))
+        if k is not None:
+            order = order[:k]
+        return candidates[order], distances[order]
+
+    def _tree_candidates(self, tree, point, k, radius_m):
+        n = tree.n
+        if k is None:
+            if radius_m is None:
+                return np.arange(n)
+            return np.asarray(tree.query_ball_point(point, radius_m * RADIUS_SLACK), dtype=np.int64)
+        # Lấy dư một chút để sắp xếp lại theo haversine không bỏ sót điểm ở biên
+        count = min(n, k + max(4, k // 10))
+        upper = radius_m * RADIUS_SLACK if radius_m is not None else np.inf
+        distances, indices = tree.query(point, k=count, distance_upper_bound=upper)
+        indices = np.atleast_1d(indices)
+        return indices[indices < n].astype(np.int64)
+
+    def _scan_candidates(self, candidates, xy, point, k, radius_m):
+        d2 = ((xy - point) ** 2).sum(axis=1)
+        if radius_m is not None:
+            inside = d2 <= (radius_m * RADIUS_SLACK) ** 2
+            candidates, d2 = candidates[inside], d2[inside]
+        if k is not None and len(candidates) > k:
+            count = k + max(4, k // 10)
+            if count < len(candidates):
+                nearest = np.argpartition(d2, count)[:count]
+                candidates = candidates[nearest]
+        return candidates
+
+
+def load_snapshot(version=None):
+    from .models import District, Location
+
+    rows = list(
+        Location.objects.filter(geom__isnull=False)
+        .annotate(
+            lng=Func(F('geom'), function='ST_X', output_field=FloatField()),
+            lat=Func(F('geom'), function='ST_Y', output_field=FloatField()),
+        )
+        .values_list('id', 'lat', 'lng', 'tourism_type', 'district_id')
+    )
+    district_names = District.objects.values_list('name', 'id')
+    columns = list(zip(*rows)) if rows else [(), (), (), (), ()]
+    return LocationSnapshot(*columns, district_names=district_names, version=version)
+
+
+def ordered_by_snapshot(queryset, snapshot, indices, distances):
+    """Giới hạn ``queryset`` vào kết quả snapshot, giữ nguyên thứ tự và gắn ``distance_m``.
+
+    Chỉ dùng cho kết quả có giới hạn (tối đa MAX_ORDERED_ROWS dòng).
+    """
+    ids = snapshot.ids[indices].tolist()
+    distances = [float(distance) for distance in distances]
+    position = RawSQL('array_position(%s::bigint[], locations.id)', (ids,))
+    return queryset.filter(id__in=ids).annotate(
+        distance_m=RawSQL('(%s::float8[])[array_position(%s::bigint[], locations.id)]', (distances, ids),
+                          output_field=FloatField()),
+    ).order_by(position)
+
+
+_snapshot = None
+_checked_at = 0.0
+# Tiến trình này vừa ghi thay đổi (có thể chưa commit): nạp lại ngay ở lần get_snapshot kế tiếp
+_dirty = False
+_lock = threading.Lock()
+
+
+def current_version():
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT last_value + is_called::int FROM {VERSION_SEQUENCE}')
+        return cursor.fetchone()[0]
+
+
+def advance_version():
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT nextval('{VERSION_SEQUENCE}')")
+
+
+def bump_version():
+    """Gọi sau mọi thay đổi toạ độ/loại/quận của địa điểm để các worker nạp lại snapshot."""
+    global _dirty
+    _dirty = True
+    # nextval không bị rollback nên chỉ tăng khi transaction đã commit, lúc các worker khác thấy được dữ liệu mới
+    transaction.on_commit(advance_version)
+
+
+def get_snapshot():
+    global _snapshot, _checked_at, _dirty
+    now = time.monotonic()
+    if _dirty:
+        # Bản nạp từ dữ liệu chưa commit không mang version nào nên lần kiểm tra sau sẽ nạp lại bản đã commit
+        with _lock:
+            _dirty = False
+            _checked_at = now
+            _snapshot = load_snapshot(None)
+            return _snapshot
+
+    snapshot = _snapshot
+    if snapshot is not None and now - _checked_at < CHECK_INTERVAL:
+        return snapshot
+
+    version = current_version()
+    _checked_at = now
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    with _lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = load_snapshot(version)
+        return _snapshot
+
+
+def warm_snapshot():
+    # Nạp sẵn khi khởi động worker; lỗi DB (chưa migrate, ...) thì để nạp lười ở request đầu
+    try:
+        get_snapshot()
+    except DatabaseError:
+        logger.warning('Could not preload location snapshot', exc_info=True)
@@ -0,0 +1,51 @@
+# tour_api/streaming.py
+# Ghi mảng JSON từng phần cho các response lớn (?all=true) thay vì dựng cả list trong bộ nhớ.
+from rest_framework.renderers import JSONRenderer
+
+STREAM_CHUNK_SIZE = 500
+
+
+def can_stream(request):
+    # Chỉ stream JSON dạng compact; ?indent hay Browsable API vẫn đi đường render thông thường
+    if request.query_params.get('stream', '').lower() == 'false':
+        return False
+    renderer = getattr(request, 'accepted_renderer', None)
+    if not isinstance(renderer, JSONRenderer):
+        return False
+    return 'indent' not in (request.accepted_media_type or '')
+
+
+def json_array_stream(queryset, serializer, chunk_size=STREAM_CHUNK_SIZE):
+    """Sinh ra đúng các byte mà JSONRenderer tạo cho ``serializer(queryset, many=True).data``.
+
+    ``queryset.iterator`` dùng server-side cursor và chạy prefetch_related theo từng lô
+    ``chunk_size`` dòng, nên bộ nhớ không tăng theo kích thước bảng.
+    """
+    renderer = JSONRenderer()
+    yield b'['
+    separator = b''
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        yield separator + renderer.render(serializer.to_representation(obj))
+        separator = b','
+    yield b']'
+
+
+async def ajson_array_stream(queryset, serializer, chunk_size=STREAM_CHUNK_SIZE):
+    """Bản async của ``json_array_stream`` cho view chạy dưới ASGI (async_views.py).
+
+    Đọc bằng ``queryset.aiterator`` và gửi mỗi lô ``chunk_size`` đối tượng thành một chunk,
+    thay vì một chunk cho từng đối tượng; nối lại vẫn ra đúng các byte như bản đồng bộ.
+    """
+    renderer = JSONRenderer()
+    parts = [b'[']
+    count = 0
+    async for obj in queryset.aiterator(chunk_size=chunk_size):
+        if count:
+            parts.append(b',')
+        parts.append(renderer.render(serializer.to_representation(obj)))
+        count += 1
+        if count % chunk_size == 0:
+            yield b''.join(parts)
+            parts = []
+    parts.append(b']')
+    yield b''.join(parts)
@@ -1,3 +1,695 @@
-from django.test import TestCase
+import heapq
+import json
+import os
+import tempfile
+import time
+from itertools import permutations
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import Point
+from django.db import OperationalError, connection, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import tiles
+from .models import Location, Image, Itinerary, ItineraryLocation, Rating
+from .authentication import TourRefreshToken
+from .benchmarks import compare, synthetic_network, uncovered_routes
+from .caching import get_cache
+from .database import StatementTimeoutMiddleware
+from .importer import element_row, iter_elements
+from .imaging import blurhash, closest_width, variant_widths
+from .instrumentation import registry
+from .ratings import rebuild_rating_aggregates
+from .planning import cluster_days, haversine_matrix, path_length, plan_route
+from .routing import RoutingEngine, contract, get_engine, road_network, travel_matrix
+
+
+class QueryCountTests(APITestCase):
+    """Số query của mỗi endpoint phải cố định, không phụ thuộc số bản ghi trả về."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester', password='secret123')
+        self.next_id = 1
+
+    def seed(self, count):
+        users = [User.objects.create_user(username=f'user{self.next_id}_{i}') for i in range(3)]
+        locations = []
+        for _ in range(count):
+            loc = Location.objects.create(
+                id=self.next_id,
+                name=f'Location {self.next_id}',
+                tourism_type='viewpoint',
+                geom=Point(108.2 + self.next_id * 0.001, 16.05, srid=4326),
+                details={'title': 'test'},
+            )
+            self.next_id += 1
+            for order in (1, 2):
+                Image.objects.create(location=loc, url=f'/media/images/{loc.id}_{order}.jpg', image_order=order)
+            for user in users:
+                Rating.objects.create(user=user, location=loc, score=4)
+            locations.append(loc)
+
+        itinerary = Itinerary.objects.create(user=self.user, survey_data={'days': 1})
+        ItineraryLocation.objects.bulk_create([
+            ItineraryLocation(itinerary=itinerary, location=loc, visit_order=idx, day=1)
+            for idx, loc in enumerate(locations, 1)
+        ])
+        return locations
+
+    def assertConstantQueries(self, num, url, auth=False):
+        if auth:
+            self.client.force_authenticate(self.user)
+        self.seed(2)
+        with self.assertNumQueries(num):
+            response = self.fetch(url)
+        self.assertEqual(response.status_code, 200)
+        self.seed(10)
+        with self.assertNumQueries(num):
+            response = self.fetch(url)
+        self.assertEqual(response.status_code, 200)
+
+    def fetch(self, url):
+        # Response dạng stream chỉ chạy query khi nội dung được đọc
+        response = self.client.get(url)
+        if response.streaming:
+            response.streaming_content = [b''.join(response.streaming_content)]
+        return response
+
+    def test_location_list(self):
+        # COUNT + locations + images + ratings (join auth_user)
+        self.assertConstantQueries(4, reverse('location-list'))
+
+    def test_location_list_all(self):
+        self.assertConstantQueries(3, reverse('location-list') + '?all=true')
+
+    def test_location_list_stream_matches_rendered(self):
+        self.seed(5)
+        url = reverse('location-list') + '?all=true'
+        streamed = self.client.get(url)
+        self.assertTrue(streamed.streaming)
+        body = b''.join(streamed.streaming_content)
+        rendered = self.client.get(url + '&stream=false')
+        self.assertFalse(rendered.streaming)
+        self.assertEqual(body, rendered.content)
+        rows = json.loads(body)
+        self.assertEqual(len(rows), 5)
+        self.assertEqual((len(rows[0]['images']), len(rows[0]['ratings'])), (2, 3))
+
+    def test_location_list_marker_view(self):
+        # Profile marker không cần images/ratings: chỉ một query, không prefetch
+        self.assertConstantQueries(1, reverse('location-list') + '?all=true&view=marker')
+
+    def test_location_list_sparse_fields(self):
+        # COUNT + locations + images; ratings không được yêu cầu nên không prefetch
+        self.assertConstantQueries(3, reverse('location-list') + '?view=marker&expand=images')
+        response = self.client.get(reverse('location-list') + '?fields=id,name,images')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name', 'images'})
+
+    def test_location_list_unknown_field(self):
+        response = self.client.get(reverse('location-list') + '?fields=id,password')
+        self.assertEqual(response.status_code, 400)
+
+    def test_location_list_invalid_nearby_params(self):
+        url = reverse('location-list') + '?nearby=true&lat=16.05&lng=108.2'
+        for params in ('&limit=abc', '&limit=0', '&radius=abc'):
+            self.assertEqual(self.client.get(url + params).status_code, 400, params)
+        self.assertEqual(self.client.get(reverse('location-list') + '?nearby=true&lat=x&lng=108.2').status_code, 400)
+
+    def test_location_list_nearby_bounded_and_unbounded(self):
+        # Có ?limit: snapshot; ?all=true không giới hạn: KNN của PostGIS. Hai đường phải cùng thứ tự
+        self.seed(5)
+        url = reverse('location-list') + '?nearby=true&lat=16.05&lng=108.2'
+        bounded = self.client.get(url + '&limit=5&all=true&stream=false').json()
+        unbounded = self.client.get(url + '&all=true&stream=false').json()
+        self.assertEqual([row['id'] for row in bounded], [1, 2, 3, 4, 5])
+        self.assertEqual([row['id'] for row in unbounded], [1, 2, 3, 4, 5])
+        for a, b in zip(bounded, unbounded):
+            self.assertAlmostEqual(a['distance_m'], b['distance_m'], delta=b['distance_m'] * 0.01 + 0.01)
+
+    def test_location_list_cursor(self):
+        # Không COUNT(*): locations + images + ratings, ở trang nào cũng vậy
+        self.assertConstantQueries(3, reverse('location-list') + '?pagination=cursor&count=false')
+
+    def test_location_list_cursor_invalid_ordering(self):
+        url = reverse('location-list') + '?pagination=cursor&ordering='
+        for ordering in ('password', 'average_score', '-name,geom'):
+            self.assertEqual(self.client.get(url + ordering).status_code, 400, ordering)
+
+    def test_district_list_invalid_geometry_level(self):
+        for params in ('?zoom=abc', '?tolerance=abc'):
+            self.assertEqual(self.client.get(reverse('district-list') + params).status_code, 400, params)
+
+    def test_location_cursor_walk(self):
+        self.seed(15)
+        url, ids = reverse('location-list') + '?pagination=cursor', []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.data['count'], 15)
+            ids += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(ids, list(range(1, 16)))
+
+        previous = self.client.get(response.data['previous'])
+        self.assertEqual([row['id'] for row in previous.data['results']], list(range(7, 13)))
+
+    def test_location_detail(self):
+        self.seed(1)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('location-detail', args=[1]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_alternative_locations(self):
+        # Serializer gọn mặc định: locations + images, không prefetch ratings
+        self.assertConstantQueries(2, reverse('alternative-locations', args=['viewpoint']))
+
+    def test_itinerary_list(self):
+        # COUNT + itineraries + itinerary_locations (join locations) + images + ratings
+        self.assertConstantQueries(5, reverse('itinerary-list'), auth=True)
+
+    def test_itinerary_clone(self):
+        owner = self.user
+        self.user = User.objects.create_user(username='cloner')
+        self.client.force_authenticate(self.user)
+        counts = []
+        for size in (2, 10):
+            self.seed(size)
+            source = Itinerary.objects.filter(user=owner).latest('id')
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(reverse('itinerary-save', args=[source.pk]))
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(response.data['source'], source.pk)
+            self.assertEqual(
+                sorted((loc['location']['id'], loc['visit_order']) for loc in response.data['locations']),
+                sorted(source.locations.values_list('location_id', 'visit_order')),
+            )
+            counts.append(len(queries))
+        # Chép điểm dừng bằng một câu INSERT ... SELECT: số query không phụ thuộc số điểm dừng
+        self.assertEqual(counts[0], counts[1])
+
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.location = Location.objects.create(id=1, name='Location 1', tourism_type='viewpoint',
+                                                geom=Point(108.2, 16.05, srid=4326), details={'title': 'test'})
+        self.url = reverse('location-detail', args=[1])
+
+    def test_conditional_request_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_write_invalidates_again_on_commit(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Image.objects.create(location=self.location, url='/media/images/1_1.jpg', image_order=1)
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertEqual(self.client.get(self.url)['X-Cache'], 'HIT')
+        # Entry lưu trước khi commit có thể mang dữ liệu cũ (worker khác) nên bị bỏ sau commit
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'MISS')
+
+
+class RatingAggregateTests(APITestCase):
+    """Thống kê đánh giá trên locations phải khớp với bảng ratings sau mọi thao tác ghi."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='rater', password='secret123')
+        self.other = User.objects.create_user(username='other', password='secret123')
+        for i in (1, 2):
+            Location.objects.create(id=i, name=f'Location {i}', tourism_type='viewpoint',
+                                    geom=Point(108.2 + i * 0.001, 16.05, srid=4326), details={'title': 'test'})
+
+    def aggregates(self, location_id):
+        return Location.objects.values(
+            'rating_count', 'rating_total', 'average_score', 'score_3_count', 'score_5_count').get(pk=location_id)
+
+    def rate(self, user, location_id, score):
+        self.client.force_authenticate(user)
+        response = self.client.post(reverse('rating-create'), {'location': location_id, 'score': score}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def test_create_update_delete(self):
+        rating_id = self.rate(self.user, 1, 3)
+        self.rate(self.other, 1, 5)
+        self.assertEqual(self.aggregates(1), {'rating_count': 2, 'rating_total': 8, 'average_score': 4.0,
+                                              'score_3_count': 1, 'score_5_count': 1})
+
+        self.client.force_authenticate(self.user)
+        response = self.client.put(reverse('rating-update', args=[rating_id]), {'location': 2, 'score': 5}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.aggregates(1), {'rating_count': 1, 'rating_total': 5, 'average_score': 5.0,
+                                              'score_3_count': 0, 'score_5_count': 1})
+        self.assertEqual(self.aggregates(2), {'rating_count': 1, 'rating_total': 5, 'average_score': 5.0,
+                                              'score_3_count': 0, 'score_5_count': 1})
+
+        self.other.delete()  # rating bị xoá theo CASCADE
+        self.assertEqual(self.aggregates(1), {'rating_count': 0, 'rating_total': 0, 'average_score': None,
+                                              'score_3_count': 0, 'score_5_count': 0})
+
+    def test_rebuild_matches_incremental(self):
+        self.rate(self.user, 1, 3)
+        self.rate(self.other, 1, 5)
+        self.rate(self.other, 2, 3)
+        expected = [self.aggregates(1), self.aggregates(2)]
+        Location.objects.update(rating_count=9, rating_total=9, average_score=1.0, score_3_count=9)
+        rebuild_rating_aggregates()
+        self.assertEqual([self.aggregates(1), self.aggregates(2)], expected)
+
+    def test_invalid_ordering_is_bad_request(self):
+        response = self.client.get(reverse('location-list') + '?ordering=password')
+        self.assertEqual(response.status_code, 400)
+
+
+class VectorTileTests(APITestCase):
+    def setUp(self):
+        tile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tile_dir.cleanup)
+        tile_settings = override_settings(TILE_CACHE_DIR=tile_dir.name)
+        tile_settings.enable()
+        self.addCleanup(tile_settings.disable)
+
+    def test_tile_bounds(self):
+        self.assertTrue(tiles.is_valid_tile(0, 0, 0))
+        self.assertTrue(tiles.is_valid_tile(3, 7, 7))
+        self.assertTrue(tiles.is_valid_tile(tiles.MAX_ZOOM, 0, 0))
+        for z, x, y in ((-1, 0, 0), (tiles.MAX_ZOOM + 1, 0, 0), (3, 8, 0), (3, 0, 8), (3, -1, 0), (3, 0, -1)):
+            self.assertFalse(tiles.is_valid_tile(z, x, y), (z, x, y))
+        self.assertEqual(self.client.get(reverse('vector-tile', args=['locations', 1, 2, 0])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('vector-tile', args=['roads', 0, 0, 0])).status_code, 404)
+
+    def test_invalidate_and_regenerate(self):
+        location = Location.objects.create(id=1, name='Location 1', tourism_type='viewpoint',
+                                           geom=Point(108.2, 16.05, srid=4326))
+        z, x, y = tiles.point_tiles(108.2, 16.05)[14]
+        path = tiles.tile_path('locations', z, x, y)
+        url = reverse('vector-tile', args=['locations', z, x, y])
+        before = self.client.get(url).content
+        self.assertTrue(before)
+        self.assertEqual(path.read_bytes(), before)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            location.geom = Point(108.3, 16.1, srid=4326)
+            location.save()
+            self.assertFalse(path.exists())
+            self.assertEqual(self.client.get(url).content, b'')
+            self.assertTrue(path.exists())
+        # Tile render trong lúc chờ commit bị xoá lại khi transaction commit
+        self.assertFalse(path.exists())
+        self.assertEqual(self.client.get(url).content, b'')
+        self.assertTrue(path.exists())
+
+    def test_tile_rendered_during_invalidation_not_kept(self):
+        Location.objects.create(id=1, name='Location 1', tourism_type='viewpoint', geom=Point(108.2, 16.05, srid=4326))
+        z, x, y = tiles.point_tiles(108.2, 16.05)[14]
+        render_tile = tiles.render_tile
+
+        def render_then_invalidate(*args):
+            data = render_tile(*args)
+            tiles.invalidate_point('locations', Point(108.2, 16.05, srid=4326))  # write commit trong lúc render
+            return data
+
+        with mock.patch.object(tiles, 'render_tile', render_then_invalidate):
+            self.assertTrue(tiles.get_tile('locations', z, x, y))
+        self.assertFalse(tiles.tile_path('locations', z, x, y).exists())
+        tiles.get_tile('locations', z, x, y)
+        self.assertTrue(tiles.tile_path('locations', z, x, y).exists())
+
+
+class PlanRouteTests(SimpleTestCase):
+    def test_matches_brute_force_on_small_days(self):
+        rng = np.random.default_rng(7)
+        for _ in range(20):
+            lat = 16.0 + rng.random(5) * 0.1
+            lng = 108.15 + rng.random(5) * 0.1
+            dist = haversine_matrix(lat, lng)
+            order, length = plan_route(dist, time_budget=1.0)
+            self.assertEqual(sorted(order), [1, 2, 3, 4])
+            best = min(path_length(dist, [0, *p]) for p in permutations(range(1, 5)))
+            self.assertLessEqual(length, best * 1.05)
+
+    def test_bounded_time_on_large_input(self):
+        rng = np.random.default_rng(7)
+        dist = haversine_matrix(16.0 + rng.random(300) * 0.1, 108.15 + rng.random(300) * 0.1)
+        started = time.perf_counter()
+        order, _ = plan_route(dist, time_budget=0.05)
+        elapsed = time.perf_counter() - started
+        self.assertEqual(sorted(order), list(range(1, 300)))
+        # Vượt ngân sách nhiều nhất là một vòng cải thiện
+        self.assertLess(elapsed, 0.05 + 0.25)
+
+    def test_cluster_days_keeps_each_day_compact(self):
+        # Hai khu cách điểm xuất phát gần như bằng nhau, mỗi khu có một điểm của mỗi loại; chia theo thứ hạng
+        # khoảng cách sẽ trộn hai khu trong cùng một ngày
+        lat = [16.0, 16.05, 16.051, 16.052, 15.95, 15.951, 15.952]
+        lng = [108.2, 108.2, 108.201, 108.2, 108.2, 108.201, 108.2]
+        dist = haversine_matrix(lat, lng)
+        groups = [[1, 4], [5, 2], [3, 6]]
+        days = cluster_days(dist, groups, 2)
+        self.assertEqual(sorted(sorted(day) for day in days.tolist()), [[1, 2, 3], [4, 5, 6]])
+        by_rank = [[1, 5, 3], [4, 2, 6]]
+        total = lambda parts: sum(plan_route(dist[np.ix_([0, *day], [0, *day])])[1] for day in parts)
+        self.assertLess(total(days), total(by_rank))
+
+
+class ImportParserTests(SimpleTestCase):
+    def test_streams_elements_across_chunk_boundaries(self):
+        data = {
+            'version': 0.6,
+            'elements': [
+                {'type': 'node', 'id': 1, 'lat': 16.0687444, 'lon': 108.2138951, 'tags': {'name': 'A'}},
+                {'type': 'way', 'id': 2, 'geometry': [{'lat': 16.1, 'lon': 108.2}, {'lat': 16.2, 'lon': 108.3}]},
+            ],
+            'remark': 'done',
+        }
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(data, f, indent=2)
+        self.addCleanup(os.unlink, f.name)
+        for chunk_size in (1, 5, 4096):
+            self.assertEqual(list(iter_elements(f.name, chunk_size)), data['elements'])
+
+    def test_content_hash_ignores_key_order(self):
+        tags = {'name': 'A', 'tourism': 'museum', 'image_1': {'url': '/images/a.jpg'}}
+        a = element_row({'type': 'node', 'id': 1, 'lat': 16.0, 'lon': 108.0, 'tags': tags})
+        b = element_row({'tags': dict(reversed(tags.items())), 'lon': 108.0, 'lat': 16.0, 'id': 1, 'type': 'node'})
+        self.assertEqual(a['content_hash'], b['content_hash'])
+        self.assertEqual(a['images'], [{'url': '/images/a.jpg', 'caption': None, 'image_order': 1}])
+
+
+class ImagingTests(SimpleTestCase):
+    def test_variant_widths(self):
+        self.assertEqual(variant_widths(None), [320, 640, 1024])
+        self.assertEqual(variant_widths(500), [320, 500])
+        self.assertEqual(variant_widths(4000), [320, 640, 1024, 1600])
+        self.assertEqual(closest_width(4000, 700), 1024)
+        self.assertEqual(closest_width(500, 700), 500)
+
+    def test_blurhash_solid_colour(self):
+        pixels = np.full((24, 32, 3), 128, dtype=np.uint8)
+        result = blurhash(pixels)
+        # 4x3 thành phần: 1 (kích thước) + 1 (max AC) + 4 (DC) + 11 * 2 (AC)
+        self.assertEqual(len(result), 28)
+        self.assertTrue(result.startswith('L'))
+
+
+class ItineraryEditTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='editor')
+        self.client.force_authenticate(self.user)
+        self.locations = [
+            Location.objects.create(id=i, name=f'Location {i}', tourism_type='museum' if i % 2 else 'viewpoint',
+                                    geom=Point(108.2 + i * 0.001, 16.05, srid=4326))
+            for i in range(1, 9)
+        ]
+        self.itinerary = Itinerary.objects.create(user=self.user, survey_data={'days': 2})
+        # Ngày 1: 1, 2, 3; ngày 2: 4, 5
+        ItineraryLocation.objects.bulk_create([
+            ItineraryLocation(itinerary=self.itinerary, location_id=location_id, day=day, visit_order=order)
+            for day, ids in ((1, [1, 2, 3]), (2, [4, 5])) for order, location_id in enumerate(ids, 1)
+        ])
+        self.url = reverse('itinerary-update', args=[self.itinerary.pk])
+
+    def stops(self):
+        return list(self.itinerary.locations.order_by('day', 'visit_order').values_list('day', 'location_id'))
+
+    def test_batch_operations(self):
+        response = self.client.patch(self.url, {'version': 1, 'operations': [
+            {'op': 'swap', 'location_id': 1, 'new_location_id': 7},
+            {'op': 'swap', 'location_id': 3, 'new_location_id': 1},
+            {'op': 'reorder', 'location_id': 1, 'visit_order': 1},
+            {'op': 'move', 'location_id': 2, 'day': 2, 'visit_order': 1},
+            {'op': 'remove', 'location_id': 5},
+            {'op': 'insert', 'location_id': 6, 'day': 2, 'estimated_time': '01:30:00'},
+            {'op': 'set_time', 'location_id': 4, 'estimated_time': '00:45:00'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['version'], 2)
+        self.assertEqual(len(response.data['removed']), 1)
+        self.assertEqual(self.stops(), [(1, 1), (1, 7), (2, 2), (2, 4), (2, 6)])
+        self.assertEqual({row['location'] for row in response.data['changed']}, {1, 7, 2, 4, 6})
+
+    def test_invalid_operation_rolls_back(self):
+        before = self.stops()
+        response = self.client.patch(self.url, {'operations': [
+            {'op': 'remove', 'location_id': 1},
+            {'op': 'swap', 'location_id': 2, 'new_location_id': 3},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stops(), before)
+
+        response = self.client.patch(self.url, {'version': 5, 'operations': [{'op': 'remove', 'location_id': 1}]},
+                                     format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.stops(), before)
+
+    def test_legacy_swap(self):
+        response = self.client.put(self.url, {'location_id': 2, 'new_location_id': 6}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stops(), [(1, 1), (1, 6), (1, 3), (2, 4), (2, 5)])
+        self.itinerary.refresh_from_db()
+        self.assertEqual(self.itinerary.version, 2)
+
+        # Khác loại hình: không ghi gì
+        response = self.client.put(self.url, {'location_id': 6, 'new_location_id': 7}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stops(), [(1, 1), (1, 6), (1, 3), (2, 4), (2, 5)])
+
+    def test_alternatives_for_stop(self):
+        url = reverse('alternative-locations', args=['viewpoint'])
+        response = self.client.get(url, {'itinerary': self.itinerary.pk, 'location': 2})
+        self.assertEqual(response.status_code, 200)
+        # 4 đã có trong lịch trình; 6 gần hai điểm dừng kề (1 và 3) hơn 8
+        self.assertEqual([row['id'] for row in response.data], [6, 8])
+        self.assertNotIn('ratings', response.data[0])
+
+        response = self.client.get(url, {'itinerary': self.itinerary.pk, 'location': 2, 'limit': 1})
+        self.assertEqual([row['id'] for row in response.data], [6])
+
+        # Response của chủ lịch trình đã nằm trong cache; lịch trình của user khác vẫn trả 404 như không tồn tại
+        self.assertEqual(self.client.get(url, {'itinerary': self.itinerary.pk, 'location': 2})['X-Cache'], 'HIT')
+        self.client.force_authenticate(User.objects.create_user(username='stranger'))
+        self.assertEqual(self.client.get(url, {'itinerary': self.itinerary.pk, 'location': 2}).status_code, 404)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(url, {'itinerary': self.itinerary.pk, 'location': 2}).status_code, 404)
+        Itinerary.objects.filter(pk=self.itinerary.pk).update(user=None)
+        self.assertEqual(self.client.get(url, {'itinerary': self.itinerary.pk, 'location': 2}).status_code, 200)
+
+
+class TokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester', password='secret123')
+        self.url = reverse('itinerary-list')
+
+    def authorize(self):
+        token = TourRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_no_user_query_with_warm_cache(self):
+        self.client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as baseline:
+            self.client.get(self.url)
+        self.client.force_authenticate(None)
+
+        self.authorize()
+        self.client.get(self.url)  # nạp trạng thái user vào cache
+        with self.assertNumQueries(len(baseline)):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_changed_password_and_inactive_user_rejected(self):
+        self.authorize()
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.user.set_password('changed123')
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+        self.authorize()
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+
+class RoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.network = road_network(synthetic_network(12, 12, bridges=1))
+        lat, lng, src, dst, time, length = self.network
+        self.engine = RoutingEngine(lat=lat, lng=lng, **contract(len(lat), src, dst, time, length))
+
+    def dijkstra(self, source):
+        _, _, src, dst, time, _ = self.network
+        dist, heap = {source: 0.0}, [(0.0, source)]
+        while heap:
+            d, x = heapq.heappop(heap)
+            if d > dist[x]:
+                continue
+            for k in np.flatnonzero(src == x):
+                if d + time[k] < dist.get(dst[k], np.inf):
+                    dist[dst[k]] = d + time[k]
+                    heapq.heappush(heap, (d + time[k], dst[k]))
+        return dist
+
+    def test_matrix_matches_dijkstra(self):
+        nodes = np.random.default_rng(7).choice(len(self.engine), 25, replace=False)
+        seconds, _ = self.engine.node_matrix(nodes, nodes)
+        for row, source in enumerate(nodes):
+            dist = self.dijkstra(int(source))
+            expected = [dist.get(int(target), np.inf) for target in nodes]
+            np.testing.assert_allclose(seconds[row], expected)
+
+    def test_river_forces_detour(self):
+        # Hai bờ "sông" ở giữa lưới, xa cây cầu duy nhất: đường bộ dài hơn hẳn đường chim bay
+        lat, lng = self.engine.lat, self.engine.lng
+        row = np.argsort(lat)[:12]
+        west, east = row[np.argsort(lng[row])][[5, 6]]
+        _, metres = self.engine.matrix(lat[[west, east]], lng[[west, east]])
+        straight = haversine_matrix(lat[[west, east]], lng[[west, east]])
+        self.assertGreater(metres[0, 1], 3 * straight[0, 1])
+
+    def test_corrupt_graph_falls_back_to_straight_line(self):
+        with tempfile.NamedTemporaryFile(suffix='.npz', delete=False) as f:
+            f.write(b'PK\x03\x04 truncated')
+        self.addCleanup(os.unlink, f.name)
+        with override_settings(ROUTING_GRAPH=f.name):
+            with self.assertLogs('tour_api.routing', 'ERROR'):
+                self.assertIsNone(get_engine())
+            _, _, mode = travel_matrix([16.05, 16.06], [108.2, 108.21])
+        self.assertEqual(mode, 'straight_line')
+
+
+class BenchmarkTests(SimpleTestCase):
+    def test_every_route_has_scenario(self):
+        self.assertEqual(uncovered_routes(), [])
+
+    def test_compare_flags_regressions(self):
+        route = {'p95_ms': 10.0, 'throughput_rps': 100.0, 'queries': 3, 'errors': 0, 'payload_bytes': 500}
+        previous = {'routes': {'a': route, 'b': route}}
+        current = {'routes': {
+            'a': {**route, 'p95_ms': 11.0, 'payload_bytes': 400},
+            'b': {**route, 'p95_ms': 20.0, 'queries': 4},
+            'c': route,
+        }}
+        _, regressions = compare(previous, current, threshold=0.2)
+        self.assertEqual(regressions, ['b: p95 10.0 -> 20.0 ms', 'b: queries 3 -> 4'])
+
+
+class InstrumentationTests(APITestCase):
+    def test_server_timing_and_metrics(self):
+        Location.objects.create(id=1, name='A', tourism_type='museum', geom=Point(108.2, 16.05, srid=4326))
+        registry.reset()
+        response = self.client.get(reverse('location-detail', args=[1]))
+        timing = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+        self.assertEqual(set(timing), {'db', 'serialize', 'render', 'total'})
+        self.assertIn('desc="3 queries"', timing['db'])
+
+        # REMOTE_ADDR của test client là 127.0.0.1 nhưng INTERNAL_IPS không được tin mặc định
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        with override_settings(METRICS_ALLOW_INTERNAL_IPS=True):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+        self.client.force_authenticate(User.objects.create_user(username='staff', is_staff=True))
+        data = self.client.get(reverse('metrics')).data
+        self.assertEqual(data['views']['location-detail']['count'], 1)
+        self.assertEqual(data['views']['location-detail']['buckets_ms']['+Inf'], 1)
+        self.assertIn('db_pools', data)
+
+    def test_statement_timeout_returns_503(self):
+        class QueryCanceled(Exception):
+            sqlstate = '57014'
+
+        try:
+            try:
+                raise QueryCanceled('canceling statement due to statement timeout')
+            except QueryCanceled as e:
+                raise OperationalError(str(e)) from e
+        except OperationalError as e:
+            error = e
+
+        registry.reset()
+        request = RequestFactory().get(reverse('location-detail', args=[1]))
+        request.resolver_match = resolve(request.path)
+        middleware = StatementTimeoutMiddleware(lambda request: None)
+        response = middleware.process_exception(request, error)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(registry.as_dict()['events'], {'location-detail': {'statement_timeout': 1}})
+        # Lỗi DB khác vẫn đi đường xử lý lỗi thông thường
+        self.assertIsNone(middleware.process_exception(request, OperationalError('connection refused')))
+
+    def statement_timeout(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW statement_timeout')
+            return cursor.fetchone()[0]
+
+    @override_settings(DB_STATEMENT_TIMEOUT_MS=1234, DB_STATEMENT_TIMEOUTS={})
+    def test_statement_budget_reapplied_after_rollback(self):
+        def view(request):
+            with self.assertRaises(ZeroDivisionError), transaction.atomic():
+                self.assertEqual(self.statement_timeout(), '1234ms')
+                1 / 0
+            # Lệnh SET bị huỷ cùng savepoint nên query tiếp theo phải đặt lại
+            return HttpResponse(self.statement_timeout())
+
+        response = StatementTimeoutMiddleware(view)(RequestFactory().get('/'))
+        self.assertEqual(response.content, b'1234ms')
+
+    @override_settings(DB_STATEMENT_TIMEOUT_MS=1234, DB_STATEMENT_TIMEOUTS={})
+    def test_statement_budget_covers_streamed_body(self):
+        middleware = StatementTimeoutMiddleware(
+            lambda request: StreamingHttpResponse(self.statement_timeout() for _ in range(1)))
+        response = middleware(RequestFactory().get('/'))
+        self.assertEqual(b''.join(response.streaming_content), b'1234ms')
+
+
+class AsyncReadPathTests(APITestCase):
+    """View async (tour/urls_asgi.py) phải trả đúng nội dung như view DRF đồng bộ."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester', password='secret123')
+        itinerary = Itinerary.objects.create(user=self.user, survey_data={'days': 1})
+        for i in range(1, 9):
+            location = Location.objects.create(id=i, name=f'Location {i}', tourism_type='museum' if i % 2 else 'viewpoint',
+                                               geom=Point(108.2 + i * 0.001, 16.05, srid=4326), details={'title': 'test'})
+            Image.objects.create(location=location, url=f'/media/images/{i}_1.jpg', image_order=1)
+            ItineraryLocation.objects.create(itinerary=itinerary, location=location, visit_order=i, day=1)
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    async def fetch(self, path, headers):
+        get_cache().clear()
+        response = await self.async_client.get(path, headers=headers)
+        if response.streaming:
+            return response.status_code, b''.join([chunk async for chunk in response.streaming_content])
+        return response.status_code, response.content
+
+    async def test_matches_sync_views(self):
+        locations = reverse('location-list')
+        auth = {'Authorization': f'Bearer {self.token}'}
+        cases = [
+            (locations, {}),
+            (locations + '?page=2&tourism_type=museum', {}),
+            (locations + '?view=marker&count=false', {}),
+            (locations + '?all=true&view=marker', {}),
+            (locations + '?all=true&stream=false', {}),
+            (locations + '?pagination=cursor', {}),
+            (locations + '?page=9', {}),
+            (reverse('location-detail', args=[3]), {}),
+            (reverse('location-detail', args=[99]), {}),
+            (reverse('district-list'), {}),
+            (reverse('itinerary-list'), auth),
+            (reverse('itinerary-list'), {}),
+        ]
+        for path, headers in cases:
+            expected = await self.fetch(path, headers)
+            with override_settings(ROOT_URLCONF='tour.urls_asgi'):
+                self.assertEqual(await self.fetch(path, headers), expected, path)
+        self.assertEqual(expected[0], 401)
@@ -0,0 +1,148 @@
+# tour_api/tiles.py
+# Sinh Mapbox Vector Tile (MVT) bằng ST_AsMVT của PostGIS và cache tile ra đĩa.
+import math
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+
+from .caching import invalidate, tag_versions
+
+# Mỗi layer: bảng nguồn và các thuộc tính theo mức zoom tối thiểu.
+# Ở zoom thấp chỉ gửi những thuộc tính cần để vẽ, tên chỉ xuất hiện khi đã zoom gần.
+LAYERS = {
+    'locations': {
+        'table': 'locations',
+        'attributes': [
+            (0, ['id', 'tourism_type']),
+            (13, ['name', 'name_vi']),
+        ],
+    },
+    'districts': {
+        'table': 'districts',
+        'attributes': [
+            (0, ['id']),
+            (9, ['name']),
+        ],
+    },
+}
+
+MAX_ZOOM = 22
+EXTENT = 4096
+BUFFER = 64
+
+TILE_SQL = """
+    WITH bounds AS (
+        SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS geom
+    ),
+    mvtgeom AS (
+        SELECT ST_AsMVTGeom(ST_Transform(t.geom, 3857), bounds.geom, {extent}, {buffer}, true) AS geom,
+               {columns}
+        FROM {table} t, bounds
+        WHERE t.geom && ST_Transform(bounds.geom, 4326)
+    )
+    SELECT ST_AsMVT(mvtgeom.*, %(layer)s, {extent}, 'geom') FROM mvtgeom
+"""
+
+
+def layer_attributes(layer, z):
+    columns = []
+    for min_zoom, names in LAYERS[layer]['attributes']:
+        if z >= min_zoom:
+            columns.extend(names)
+    return columns
+
+
+def is_valid_tile(z, x, y):
+    if z < 0 or z > MAX_ZOOM:
+        return False
+    n = 1 << z
+    return 0 <= x < n and 0 <= y < n
+
+
+def render_tile(layer, z, x, y):
+    config = LAYERS[layer]
+    columns = ', '.join(f't.{name}' for name in layer_attributes(layer, z))
+    sql = TILE_SQL.format(extent=EXTENT, buffer=BUFFER, columns=columns, table=config['table'])
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {'z': z, 'x': x, 'y': y, 'layer': layer})
+        row = cursor.fetchone()
+    return bytes(row[0]) if row and row[0] is not None else b''
+
+
+# Cache trên đĩa: <TILE_CACHE_DIR>/<layer>/<z>/<x>/<y>.mvt
+#
+# Mỗi layer có một tag version (caching.py) được tăng trước khi xoá file. Tile render trong lúc layer bị
+# invalidate (vd. một thay đổi vừa commit) có thể đọc dữ liệu cũ nên không được giữ lại trên đĩa.
+
+def cache_dir():
+    return Path(getattr(settings, 'TILE_CACHE_DIR', settings.BASE_DIR / 'cache' / 'tiles'))
+
+
+def tile_path(layer, z, x, y):
+    return cache_dir() / layer / str(z) / str(x) / f'{y}.mvt'
+
+
+def layer_tag(layer):
+    return f'tiles:{layer}'
+
+
+def get_tile(layer, z, x, y):
+    path = tile_path(layer, z, x, y)
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        pass
+
+    versions = tag_versions([layer_tag(layer)])
+    data = render_tile(layer, z, x, y)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Ghi ra file tạm rồi rename để worker khác không đọc phải tile ghi dở
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+    # Kiểm tra sau khi rename: invalidate xảy ra trước đó thì tự xoá, sau đó thì invalidate xoá
+    if tag_versions([layer_tag(layer)]) != versions:
+        path.unlink(missing_ok=True)
+    return data
+
+
+def point_tiles(lng, lat):
+    """Danh sách (z, x, y) chứa điểm ở mọi mức zoom."""
+    lat = max(min(lat, 85.0511), -85.0511)
+    lat_rad = math.radians(lat)
+    merc_y = (1 - math.log(math.tan(lat_rad) + 1 / math.cos(lat_rad)) / math.pi) / 2
+    merc_x = (lng + 180.0) / 360.0
+    tiles = []
+    for z in range(MAX_ZOOM + 1):
+        n = 1 << z
+        x = min(int(merc_x * n), n - 1)
+        y = min(int(merc_y * n), n - 1)
+        tiles.append((z, x, y))
+    return tiles
+
+
+def invalidate_point(layer, point):
+    if point is None:
+        return
+    invalidate(layer_tag(layer))
+    # Tile đệm BUFFER pixel nên điểm gần biên cũng xuất hiện ở tile kề; xoá cả các tile lân cận
+    for z, x, y in point_tiles(point.x, point.y):
+        n = 1 << z
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                tx, ty = x + dx, y + dy
+                if 0 <= tx < n and 0 <= ty < n:
+                    try:
+                        tile_path(layer, z, tx, ty).unlink()
+                    except FileNotFoundError:
+                        pass
+
+
+def invalidate_layer(layer):
+    invalidate(layer_tag(layer))
+    shutil.rmtree(cache_dir() / layer, ignore_errors=True)
@@ -2,8 +2,8 @@ from django.urls import path
 from .views import (
     LocationListView, LocationDetailView, ItinerarySuggestionView, ItineraryUpdateView,
     AlternativeLocationsView, DistrictListView, DistrictDetailView,
-    SignUpView, SignInView, RatingCreateView, RatingUpdateView, ItinerarySaveView,
-    ItineraryListView, ItineraryDeleteView
+    SignUpView, SignInView, RatingCreateView, RatingUpdateView, ItinerarySaveView, LocationRatingListView,
+    ItineraryListView, ItineraryDeleteView, VectorTileView, ImageVariantView, MetricsView
 )
 
 urlpatterns = [
@@ -20,6 +20,10 @@ urlpatterns = [
     path('api/districts/<str:name>/', DistrictDetailView.as_view(), name='district-detail'),
     path('api/auth/signup/', SignUpView.as_view(), name='signup'),
     path('api/auth/signin/', SignInView.as_view(), name='signin'),
+    path('api/locations/<int:pk>/ratings/', LocationRatingListView.as_view(), name='location-ratings'),
     path('api/ratings/create/', RatingCreateView.as_view(), name='rating-create'),
     path('api/ratings/<int:pk>/update/', RatingUpdateView.as_view(), name='rating-update'),
+    path('api/tiles/<str:layer>/<int:z>/<int:x>/<int:y>.mvt', VectorTileView.as_view(), name='vector-tile'),
+    path('api/images/<int:pk>/<int:width>.<str:fmt>', ImageVariantView.as_view(), name='image-variant'),
+    path('api/metrics/', MetricsView.as_view(), name='metrics'),
 ]
\ No newline at end of file
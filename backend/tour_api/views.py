@@ -1,18 +1,43 @@
-from django.forms import ValidationError
+import numpy as np
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views import View
 from rest_framework import generics, status
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
-from django.db.models import Q
-from .models import Location, Itinerary, ItineraryLocation, District, Rating
-from .serializers import LocationSerializer, ItinerarySerializer, DistrictSerializer, RatingSerializer
+from django.db import transaction
+from django.db.models import Count, F, Prefetch, Q
+from .models import Location, Image, Itinerary, ItineraryLocation, District, DistrictGeometry, Rating
+from .serializers import (
+    LocationSerializer, ItinerarySerializer, ItineraryStopSerializer, DistrictSerializer, RatingSerializer,
+)
 from django.contrib.gis.geos import Point
-from django.contrib.gis.db.models.functions import Distance
 from django.contrib.gis.measure import D
-from rest_framework.pagination import PageNumberPagination
+from .prefetching import EagerLoadingMixin, optimize_queryset
+from .ratings import apply_rating_change
+from . import database, imaging, instrumentation, routing, tiles
+from .districts import level_for_tolerance, level_for_zoom
+from .search import search_locations
+from .geo import nearby_locations
+from .planning import cluster_days, plan_route
+from .snapshot import MAX_ORDERED_ROWS, get_snapshot, ordered_by_snapshot
+from .caching import CachedResponseMixin
+from .streaming import can_stream, json_array_stream
+from .fieldsets import SparseFieldsViewMixin, sparse_context
+from .pagination import KeysetPagination
+from .itineraries import clone_itinerary, edit_itinerary
+from .alternatives import ranked_alternatives, stop_anchors
+from .authentication import TourRefreshToken
+
+
+def serialize_itinerary(itinerary):
+    # Nạp lại lịch trình kèm toàn bộ quan hệ lồng nhau trong một số query cố định
+    itinerary = optimize_queryset(Itinerary.objects.filter(pk=itinerary.pk), ItinerarySerializer).get()
+    return ItinerarySerializer(itinerary).data
 
 
 # Authentication
@@ -39,7 +64,7 @@ class SignUpView(APIView):
             return Response({"error": "Email đã được sử dụng"}, status=status.HTTP_400_BAD_REQUEST)
 
         user = User.objects.create_user(username=username, email=email, password=password)
-        refresh = RefreshToken.for_user(user)
+        refresh = TourRefreshToken.for_user(user)
 
         return Response({
             'refresh': str(refresh),
@@ -62,7 +87,7 @@ class SignInView(APIView):
         if user is None:
             return Response({"error": "Thông tin đăng nhập không hợp lệ"}, status=status.HTTP_401_UNAUTHORIZED)
 
-        refresh = RefreshToken.for_user(user)
+        refresh = TourRefreshToken.for_user(user)
         return Response({
             'refresh': str(refresh),
             'access': str(refresh.access_token),
@@ -72,9 +97,13 @@ class SignInView(APIView):
 
 # Location
 # Danh sách địa điểm
-class LocationListView(generics.ListAPIView):
+class LocationListView(CachedResponseMixin, SparseFieldsViewMixin, EagerLoadingMixin, generics.ListAPIView):
     serializer_class = LocationSerializer
-    pagination_class = PageNumberPagination
+    pagination_class = KeysetPagination
+    ordering_fields = ['id', 'name', 'average_score', 'rating_count']
+
+    def get_cache_tags(self):
+        return ['locations']
 
     def paginate_queryset(self, queryset):
         if self.request.query_params.get('all', '').lower() == 'true':
@@ -92,18 +121,16 @@ class LocationListView(generics.ListAPIView):
         lng = params.get('lng')
         district = params.get('district')
         radius_km = params.get('radius')
+        ordering = params.get('ordering')
+        limit_param = params.get('limit')
+        limit = None
 
         if district:
-            district_obj = District.objects.filter(name=district).first()
-            if district_obj:
-                queryset = queryset.filter(geom__within=district_obj.geom)
+            queryset = queryset.filter(district__name=district)
 
         if search_query:
-            queryset = queryset.filter(
-                Q(name__icontains=search_query) |
-                Q(name_vi__icontains=search_query) |
-                Q(details__icontains=search_query)
-            )
+            # Kết quả xếp theo độ liên quan, trừ khi có ?nearby hoặc ?ordering
+            queryset = search_locations(queryset, search_query).order_by('-search_rank', 'id')
 
         if tourism_type:
             queryset = queryset.filter(tourism_type=tourism_type)
@@ -112,45 +139,186 @@ class LocationListView(generics.ListAPIView):
             try:
                 point = Point(float(lng), float(lat), srid=4326)
             except ValueError:
-                raise ValidationError("Invalid latitude/longitude format.")
-
-            queryset = queryset.filter(geom__isnull=False)
+                raise ValidationError({"error": "Invalid latitude/longitude format."})
 
+            radius_m = None
             if radius_km:
                 try:
                     radius_m = float(radius_km) * 1000
-                    queryset = queryset.filter(geom__dwithin=(point, radius_m / 111000))
                 except ValueError:
-                    raise ValidationError("Invalid radius format. Must be a number.")
+                    raise ValidationError({"error": "Invalid radius format. Must be a number."})
+
+            if limit_param:
+                # ?limit=N: chỉ lấy N địa điểm gần nhất
+                try:
+                    limit = int(limit_param)
+                except ValueError:
+                    raise ValidationError({"error": "Invalid limit format. Must be an integer."})
+                if limit < 1:
+                    raise ValidationError({"error": "Limit must be a positive integer."})
+
+            if not search_query and not ordering and (limit or radius_m is not None):
+                # Chỉ lọc theo loại/quận và có ?limit hoặc ?radius: trả lời bằng snapshot trong bộ nhớ, DB chỉ còn
+                # nạp các dòng kết quả. Không giới hạn (vd. ?all=true) hay quá nhiều kết quả thì dùng KNN của PostGIS
+                snapshot = get_snapshot()
+                indices, distances = snapshot.query(
+                    point.y, point.x, k=limit, radius_m=radius_m, tourism_type=tourism_type, district=district)
+                if len(indices) <= MAX_ORDERED_ROWS:
+                    self.snapshot_nearby = True
+                    return ordered_by_snapshot(queryset, snapshot, indices, distances)
+
+            # ST_DWithin theo mét trên geography + sắp xếp KNN (<->) qua index GiST
+            queryset = nearby_locations(queryset, point, radius_m)
+
+        if ordering:
+            queryset = queryset.order_by(*self.get_ordering(ordering))
 
-            queryset = queryset.annotate(distance=Distance('geom', point)).order_by('distance')
+        if limit:
+            queryset = queryset[:limit]
 
         return queryset
 
+    def get_ordering(self, ordering):
+        # ?ordering=-average_score,name ; giá trị NULL (chưa có đánh giá) luôn xếp cuối
+        order_by = []
+        names = []
+        for term in ordering.split(','):
+            term = term.strip()
+            name = term.lstrip('-')
+            if name not in self.ordering_fields:
+                raise ValidationError({"error": f"Invalid ordering field: {name}"})
+            names.append(name)
+            if term.startswith('-'):
+                order_by.append(F(name).desc(nulls_last=True))
+            else:
+                order_by.append(F(name).asc(nulls_last=True))
+        if 'id' not in names:
+            order_by.append('id')
+        return order_by
+
+    def get_keyset_fields(self):
+        # Khoá cho phân trang cursor, phải khớp với thứ tự mà get_queryset tạo ra
+        params = self.request.query_params
+        ordering = params.get('ordering')
+        if ordering:
+            terms = [term.strip() for term in ordering.split(',')]
+            names = [term.lstrip('-') for term in terms]
+            for name in names:
+                if name not in self.ordering_fields:
+                    raise ValidationError({"error": f"Invalid ordering field: {name}"})
+                if Location._meta.get_field(name).null:
+                    raise ValidationError({"error": f"Cursor pagination cannot order by nullable field: {name}"})
+            return terms if 'id' in names else terms + ['id']
+        if params.get('nearby') and params.get('lat') and params.get('lng'):
+            # Snapshot gắn distance_m theo thứ tự (khoảng cách, id); PostGIS sắp theo toán tử KNN
+            return ['distance_m', 'id'] if getattr(self, 'snapshot_nearby', False) else ['knn_distance', 'id']
+        if params.get('search'):
+            return ['-search_rank', 'id']
+        return ['id']
+
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
         page = self.paginate_queryset(queryset)
+        if page is None and can_stream(request):
+            # ?all=true: stream mảng JSON theo từng lô, cùng định dạng byte với response thường
+            return StreamingHttpResponse(
+                json_array_stream(queryset, self.get_serializer()),
+                content_type=request.accepted_renderer.media_type,
+            )
         serializer = self.get_serializer(page if page is not None else queryset, many=True)
         if page is not None:
             return self.get_paginated_response(serializer.data)
         return Response(serializer.data)
 
 # Chi tiết địa điểm
-class LocationDetailView(generics.RetrieveAPIView):
+class LocationDetailView(CachedResponseMixin, SparseFieldsViewMixin, EagerLoadingMixin, generics.RetrieveAPIView):
     queryset = Location.objects.all()
     serializer_class = LocationSerializer
 
+    def get_cache_tags(self):
+        return [f"location:{self.kwargs['pk']}", 'locations:bulk']
+
     
 # thay đổi địa điểm trong lịch trình
-class AlternativeLocationsView(APIView):
+# ?itinerary=<id>&location=<id địa điểm cần thay>: xếp theo quãng đường đi thêm giữa hai điểm dừng kề
+# và điểm đánh giá, bỏ các địa điểm đã có trong lịch trình; ?lat=&lng=: theo khoảng cách tới toạ độ;
+# không có cả hai thì theo điểm đánh giá. Tối đa ?limit= kết quả.
+class AlternativeLocationsView(CachedResponseMixin, APIView):
+    DEFAULT_LIMIT = 20
+    MAX_LIMIT = 100
+    # Hộp thoại đổi địa điểm chỉ cần thông tin marker, ảnh và điểm đánh giá
+    COMPACT_FIELDS = frozenset(LocationSerializer.field_profiles['marker']) | {'images', 'average_score', 'rating_count'}
+
+    def get_cache_tags(self):
+        tags = ['locations']
+        itinerary_id = self.request.query_params.get('itinerary')
+        if itinerary_id:
+            tags.append(f'itinerary:{itinerary_id}')
+        return tags
+
     def get(self, request, tourism_type):
-        locations = Location.objects.filter(tourism_type=tourism_type)
-        serializer = LocationSerializer(locations, many=True)
+        # Key cache không chứa user nên quyền trên lịch trình phải được kiểm tra trước khi tra cache
+        self.itinerary_stop = self.get_itinerary_stop()
+        return self.cached_get(self.get_alternatives, request, tourism_type=tourism_type)
+
+    def get_itinerary_stop(self):
+        """``(lịch trình, id địa điểm cần thay)`` của ?itinerary=&location=, hoặc None nếu không có."""
+        params = self.request.query_params
+        if not (params.get('itinerary') or params.get('location')):
+            return None
+        try:
+            itinerary_id, location_id = int(params['itinerary']), int(params['location'])
+        except (KeyError, ValueError):
+            raise ValidationError({"error": "Both itinerary and location must be integers"})
+        # Chỉ chủ lịch trình (hoặc lịch trình không gắn user) được dùng, tránh lộ điểm dừng và vị trí hiện tại
+        owner = Q(user=None)
+        if self.request.user.is_authenticated:
+            owner |= Q(user=self.request.user)
+        itinerary = Itinerary.objects.filter(owner, pk=itinerary_id).only('id', 'survey_data').first()
+        if itinerary is None:
+            raise NotFound({"error": "Itinerary not found"})
+        return itinerary, location_id
+
+    def get_alternatives(self, request, tourism_type):
+        params = request.query_params
+        try:
+            limit = int(params.get('limit', self.DEFAULT_LIMIT))
+        except ValueError:
+            return Response({"error": "Invalid limit format. Must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= limit <= self.MAX_LIMIT:
+            return Response({"error": f"Limit must be between 1 and {self.MAX_LIMIT}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if 'fields' in params or 'view' in params:
+            context = sparse_context(request, LocationSerializer)
+        else:
+            context = {LocationSerializer.sparse_context_key: self.COMPACT_FIELDS}
+        queryset = optimize_queryset(Location.objects.filter(tourism_type=tourism_type), LocationSerializer, context)
+
+        anchors, exclude_ids = None, []
+        if self.itinerary_stop is not None:
+            itinerary, location_id = self.itinerary_stop
+            anchors, exclude_ids = stop_anchors(get_snapshot(), itinerary, location_id)
+            if anchors is None:
+                return Response({"error": "Location is not in this itinerary"}, status=status.HTTP_404_NOT_FOUND)
+        elif params.get('lat') and params.get('lng'):
+            try:
+                anchors = [(float(params['lat']), float(params['lng']))]
+            except ValueError:
+                return Response({"error": "Invalid latitude/longitude format."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if anchors:
+            locations = ranked_alternatives(queryset, get_snapshot(), tourism_type, anchors, exclude_ids, limit)
+        else:
+            locations = queryset.exclude(id__in=exclude_ids).order_by(F('average_score').desc(nulls_last=True), 'id')[:limit]
+        serializer = LocationSerializer(locations, many=True, context=context)
         return Response(serializer.data)
 
 # Itinerary
 # Gợi ý lịch trình
 class ItinerarySuggestionView(APIView):
+    CANDIDATES_PER_TYPE = 10
+
     def post(self, request):
         days = request.data.get('days', 1)
         current_lat = request.data.get('latitude')
@@ -170,47 +338,60 @@ class ItinerarySuggestionView(APIView):
         except (ValueError, TypeError):
             return Response({"error": "Invalid input for days, latitude, or longitude"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Tạo Point
-        current_location = Point(current_lng, current_lat, srid=4326)
-
-        # Lấy danh sách địa điểm
-        all_locations = Location.objects.filter(
-            tourism_type__in=tourism_types,
-            geom__isnull=False
-        ).annotate(
-            distance=Distance('geom', current_location)
-        ).order_by('distance')
-
-        if not all_locations.exists():
+        # Ứng viên: CANDIDATES_PER_TYPE địa điểm gần nhất của mỗi loại, lấy từ snapshot trong bộ nhớ,
+        # nên thời gian lập lộ trình không phụ thuộc vào tổng số địa điểm trong bảng
+        snapshot = get_snapshot()
+        candidates = {}
+        for tourism_type in tourism_types:
+            indices, _ = snapshot.query(current_lat, current_lng, k=self.CANDIDATES_PER_TYPE, tourism_type=tourism_type)
+            candidates[tourism_type] = [
+                (int(snapshot.ids[idx]), snapshot.lat[idx], snapshot.lng[idx]) for idx in indices
+            ]
+
+        if not any(candidates.values()):
             return Response({"error": "No available locations found"}, status=status.HTTP_404_NOT_FOUND)
 
-        # Phân bổ địa điểm cho từng ngày
-        itinerary_locations = []
-        used_location_ids = set()
-        locations_per_day = len(tourism_types)  #Xác định số lượng địa điểm cần chọn mỗi ngày (có 4 loại du lịch, vậy mỗi ngày sẽ chọn 4 địa điểm).
-        available_locations = list(all_locations)
-
         for day in range(1, days + 1):
-            day_locations = []
-            for tourism_type in tourism_types:
-                for loc in available_locations:
-                    if loc.id not in used_location_ids and loc.tourism_type == tourism_type:
-                        day_locations.append(loc)
-                        used_location_ids.add(loc.id)
-                        break
-
-            if len(day_locations) != locations_per_day:
+            if any(len(candidates[tourism_type]) < day for tourism_type in tourism_types):
                 return Response({"error": f"Not enough locations for day {day}"}, status=status.HTTP_404_NOT_FOUND)
 
-            # Sắp xếp trong ngày theo khoảng cách
-            day_locations.sort(key=lambda loc: loc.distance.m)
-
-            for idx, loc in enumerate(day_locations, 1):
+        # Ma trận thời gian/quãng đường đi giữa điểm xuất phát (nút 0) và mọi ứng viên: theo đường bộ khi
+        # đã có đồ thị đường (tour_api/routing.py), nếu không thì theo đường chim bay
+        nodes = [(None, current_lat, current_lng)] + [row for rows in candidates.values() for row in rows]
+        lats = [lat for _, lat, _ in nodes]
+        lngs = [lng for _, _, lng in nodes]
+        seconds, metres, mode = routing.travel_matrix(lats, lngs)
+        # Chia cụm và 2-opt giả định ma trận đối xứng; đường một chiều chỉ làm hai chiều lệch nhau ít
+        cost = (seconds + seconds.T) / 2
+
+        # Chia ứng viên thành các cụm địa lý theo ngày (mỗi ngày một địa điểm của mỗi loại), rồi sắp xếp
+        # thứ tự thăm trong ngày bằng TSP (nearest-neighbour + 2-opt/Or-opt)
+        groups, start = [], 1
+        for tourism_type in tourism_types:
+            groups.append(list(range(start, start + len(candidates[tourism_type]))))
+            start += len(candidates[tourism_type])
+        itinerary_locations = []
+        route_summary = []
+        for day, day_nodes in enumerate(cluster_days(cost, groups, days), 1):
+            idx = [0, *day_nodes]
+            order, _ = plan_route(cost[np.ix_(idx, idx)])
+            path = [0] + [idx[position] for position in order]
+            leg_seconds = seconds[path[:-1], path[1:]]
+            leg_metres = metres[path[:-1], path[1:]]
+            route_summary.append({
+                "day": day,
+                "distance_m": round(float(leg_metres.sum()), 1),
+                # Quãng đường giữa các điểm trong ngày, không tính chặng từ điểm xuất phát tới điểm đầu tiên
+                "intra_day_m": round(float(leg_metres[1:].sum()), 1),
+                "duration_s": round(float(leg_seconds.sum())),
+            })
+
+            for visit_order, (node, travel) in enumerate(zip(path[1:], leg_seconds), 1):
                 itinerary_locations.append(ItineraryLocation(
-                    location=loc,
-                    visit_order=idx,
+                    location_id=nodes[node][0],
+                    visit_order=visit_order,
                     day=day,
-                    estimated_time="01:00:00"
+                    estimated_time=routing.stop_duration(travel) if mode == 'road' else routing.VISIT_DURATION
                 ))
 
         # Tạo itinerary
@@ -227,13 +408,23 @@ class ItinerarySuggestionView(APIView):
             loc.itinerary = itinerary
         ItineraryLocation.objects.bulk_create(itinerary_locations)
 
-        # Serialize và trả về
-        serializer = ItinerarySerializer(itinerary)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        # Serialize và trả về, kèm quãng đường di chuyển của từng ngày
+        data = serialize_itinerary(itinerary)
+        data['route'] = {
+            "days": route_summary,
+            "total_distance_m": round(sum(day["distance_m"] for day in route_summary), 1),
+            "total_intra_day_m": round(sum(day["intra_day_m"] for day in route_summary), 1),
+            "total_duration_s": sum(day["duration_s"] for day in route_summary),
+            "mode": mode,
+        }
+        return Response(data, status=status.HTTP_201_CREATED)
     
 # View lấy danh sách lịch trình của người dùng
-class ItineraryListView(generics.ListAPIView):
+class ItineraryListView(SparseFieldsViewMixin, EagerLoadingMixin, generics.ListAPIView):
     serializer_class = ItinerarySerializer
+    # ?fields= / ?view= áp dụng cho địa điểm lồng trong lịch trình
+    sparse_serializer_class = LocationSerializer
+    keyset_fields = ['-created_at', 'id']
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -246,29 +437,15 @@ class ItinerarySaveView(APIView):
         try:
             original_itinerary = Itinerary.objects.get(pk=pk)
             # Kiểm tra xem lịch trình đã có người dùng khác sở hữu chưa
-            if original_itinerary.user and original_itinerary.user != request.user:
-                # Tạo bản sao của lịch trình
-                new_itinerary = Itinerary.objects.create(
-                    survey_data=original_itinerary.survey_data,
-                    user=request.user
-                )
-                # Sao chép các ItineraryLocation
-                for loc in original_itinerary.locations.all():
-                    ItineraryLocation.objects.create(
-                        itinerary=new_itinerary,
-                        location=loc.location,
-                        visit_order=loc.visit_order,
-                        day=loc.day,
-                        estimated_time=loc.estimated_time
-                    )
-                serializer = ItinerarySerializer(new_itinerary)
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
+            if original_itinerary.user_id and original_itinerary.user_id != request.user.pk:
+                # Tạo bản sao của lịch trình (kèm các ItineraryLocation)
+                new_itinerary = clone_itinerary(original_itinerary, request.user)
+                return Response(serialize_itinerary(new_itinerary), status=status.HTTP_201_CREATED)
             else:
                 # Nếu lịch trình chưa có người dùng hoặc thuộc về người dùng hiện tại, gắn người dùng
                 original_itinerary.user = request.user
                 original_itinerary.save()
-                serializer = ItinerarySerializer(original_itinerary)
-                return Response(serializer.data, status=status.HTTP_200_OK)
+                return Response(serialize_itinerary(original_itinerary), status=status.HTTP_200_OK)
         except Itinerary.DoesNotExist:
             return Response(
                 {"error": "Itinerary not found"},
@@ -279,86 +456,46 @@ class ItineraryUpdateView(APIView):
     permission_classes = [IsAuthenticated]
 
     def put(self, request, pk):
+        # Đổi một địa điểm (API cũ): đi qua edit_itinerary như PATCH để có transaction, khoá dòng và tăng version
+        location_id_to_change = request.data.get('location_id')
+        new_location_id = request.data.get('new_location_id')
+
+        if location_id_to_change and new_location_id:
+            try:
+                operation = {'op': 'swap', 'location_id': int(location_id_to_change),
+                             'new_location_id': int(new_location_id)}
+            except (TypeError, ValueError):
+                return Response({"error": "location_id và new_location_id phải là số nguyên"},
+                                status=status.HTTP_400_BAD_REQUEST)
+            itinerary, _stops, _removed = edit_itinerary(pk, request.user, [operation])
+            return Response(serialize_itinerary(itinerary), status=status.HTTP_200_OK)
+
         try:
             itinerary = Itinerary.objects.get(pk=pk)
-            # Nếu lịch trình thuộc về người dùng khác, tạo bản sao
-            if itinerary.user and itinerary.user != request.user:
-                # Tạo bản sao lịch trình
-                new_itinerary = Itinerary.objects.create(
-                    survey_data=itinerary.survey_data,
-                    user=request.user
-                )
-                # Sao chép các ItineraryLocation
-                for loc in itinerary.locations.all():
-                    ItineraryLocation.objects.create(
-                        itinerary=new_itinerary,
-                        location=loc.location,
-                        visit_order=loc.visit_order,
-                        day=loc.day,
-                        estimated_time=loc.estimated_time
-                    )
-                itinerary = new_itinerary
-            # Nếu lịch trình không có user hoặc thuộc về người dùng hiện tại, tiếp tục chỉnh sửa
         except Itinerary.DoesNotExist:
             return Response(
                 {"error": "Lịch trình không tồn tại"},
                 status=status.HTTP_404_NOT_FOUND
             )
+        # Nếu lịch trình thuộc về người dùng khác, tạo bản sao (kèm các ItineraryLocation)
+        if itinerary.user_id and itinerary.user_id != request.user.pk:
+            itinerary = clone_itinerary(itinerary, request.user)
+        return Response(serialize_itinerary(itinerary), status=status.HTTP_200_OK)
+
+    def patch(self, request, pk):
+        # Nhiều thao tác (swap, reorder, move, insert, remove, set_time) trong một request và một
+        # transaction; chỉ trả về các điểm dừng đã đổi và phiên bản mới thay vì cả lịch trình
+        version = request.data.get('version')
+        if version is not None and (not isinstance(version, int) or isinstance(version, bool)):
+            return Response({"error": "'version' phải là số nguyên"}, status=status.HTTP_400_BAD_REQUEST)
+        itinerary, stops, removed = edit_itinerary(pk, request.user, request.data.get('operations'), version)
+        return Response({
+            "id": itinerary.id,
+            "version": itinerary.version,
+            "changed": ItineraryStopSerializer(stops, many=True).data,
+            "removed": removed,
+        }, status=status.HTTP_200_OK)
 
-        # Thay đổi địa điểm
-        location_id_to_change = request.data.get('location_id')
-        new_location_id = request.data.get('new_location_id')
-
-        if location_id_to_change and new_location_id:
-            try:
-                # Tìm ItineraryLocation
-                itinerary_locations = ItineraryLocation.objects.filter(
-                    itinerary=itinerary,
-                    location_id=location_id_to_change
-                )
-                if not itinerary_locations.exists():
-                    return Response(
-                        {"error": "Địa điểm không tồn tại trong lịch trình"},
-                        status=status.HTTP_404_NOT_FOUND
-                    )
-
-                # Lấy location mới
-                new_location = Location.objects.get(id=new_location_id)
-
-                # Kiểm tra tourism_type
-                current_location = itinerary_locations.first().location
-                if new_location.tourism_type != current_location.tourism_type:
-                    return Response(
-                        {"error": "Địa điểm mới phải có cùng loại hình du lịch"},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-                # Kiểm tra xem địa điểm mới đã có trong lịch trình chưa
-                if new_location.id in [loc.location.id for loc in itinerary.locations.all()]:
-                    return Response(
-                        {"error": "Địa điểm này đã có trong lịch trình"},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-                # Cập nhật ItineraryLocation (chọn bản ghi đầu tiên nếu có nhiều)
-                itinerary_location = itinerary_locations.first()
-                itinerary_location.location = new_location
-                itinerary_location.save()
-
-            except Location.DoesNotExist:
-                return Response(
-                    {"error": "Địa điểm mới không tồn tại"},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            except Exception:
-                return Response(
-                    {"error": "Lỗi không xác định khi cập nhật địa điểm"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-        serializer = ItinerarySerializer(itinerary)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-    
 # View cho xóa lịch trình
 class ItineraryDeleteView(APIView):
     permission_classes = [IsAuthenticated]
@@ -374,6 +511,17 @@ class ItineraryDeleteView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 # Rating
+# Danh sách đánh giá của một địa điểm, mới nhất trước
+class LocationRatingListView(CachedResponseMixin, EagerLoadingMixin, generics.ListAPIView):
+    serializer_class = RatingSerializer
+    keyset_fields = ['-created_at', 'id']
+
+    def get_cache_tags(self):
+        return [f"location:{self.kwargs['pk']}", 'locations:bulk']
+
+    def get_queryset(self):
+        return Rating.objects.filter(location_id=self.kwargs['pk']).order_by('-created_at', 'id')
+
 # View cho đánh giá
 class RatingCreateView(APIView):
     permission_classes = [IsAuthenticated]
@@ -381,7 +529,9 @@ class RatingCreateView(APIView):
     def post(self, request):
         serializer = RatingSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
-            serializer.save(user=request.user)
+            with transaction.atomic():
+                rating = serializer.save(user=request.user)
+                apply_rating_change(new=(rating.location_id, rating.score))
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -389,26 +539,122 @@ class RatingUpdateView(APIView):
     permission_classes = [IsAuthenticated]
 
     def put(self, request, pk):
+        with transaction.atomic():
+            # Khoá dòng để hai request sửa đồng thời không cùng trừ một điểm cũ khỏi thống kê
+            try:
+                rating = Rating.objects.select_for_update().get(pk=pk, user=request.user)
+            except Rating.DoesNotExist:
+                return Response({"error": "Đánh giá không tồn tại hoặc bạn không có quyền chỉnh sửa"}, status=status.HTTP_404_NOT_FOUND)
+
+            serializer = RatingSerializer(rating, data=request.data, partial=True)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            old = (rating.location_id, rating.score)
+            rating = serializer.save()
+            apply_rating_change(old=old, new=(rating.location_id, rating.score))
+        return Response(serializer.data)
+
+# District
+# Chọn mức hình học đơn giản hoá theo ?zoom= hoặc ?tolerance=
+class DistrictGeometryLevelMixin:
+    def get_geometry_level(self):
+        params = self.request.query_params
         try:
-            rating = Rating.objects.get(pk=pk, user=request.user)
-        except Rating.DoesNotExist:
-            return Response({"error": "Đánh giá không tồn tại hoặc bạn không có quyền chỉnh sửa"}, status=status.HTTP_404_NOT_FOUND)
+            if params.get('zoom') is not None:
+                return level_for_zoom(int(params['zoom']))
+            if params.get('tolerance') is not None:
+                return level_for_tolerance(float(params['tolerance']))
+        except ValueError:
+            raise ValidationError({"error": "Invalid zoom/tolerance format. Must be a number."})
+        return None
 
-        serializer = RatingSerializer(rating, data=request.data, partial=True)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        level = self.get_geometry_level()
+        if level is None:
+            return queryset
+        # Không cần nạp multipolygon đầy đủ khi đã có bản đơn giản hoá
+        return queryset.defer('geom').prefetch_related(Prefetch(
+            'simplified_geometries',
+            queryset=DistrictGeometry.objects.filter(level=level),
+            to_attr='level_geometries',
+        ))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['geometry_level'] = self.get_geometry_level()
+        return context
 
-# District
 # View danh sách quận/huyện
-class DistrictListView(generics.ListAPIView):
-    queryset = District.objects.all().order_by('name')
+class DistrictListView(CachedResponseMixin, DistrictGeometryLevelMixin, generics.ListAPIView):
+    queryset = District.objects.annotate(location_count=Count('locations')).order_by('name')
     serializer_class = DistrictSerializer
     pagination_class = None
 
+    def get_cache_tags(self):
+        return ['districts']
+
 # View chi tiết quận/huyện
-class DistrictDetailView(generics.RetrieveAPIView):
-    queryset = District.objects.all()
+class DistrictDetailView(CachedResponseMixin, DistrictGeometryLevelMixin, generics.RetrieveAPIView):
+    queryset = District.objects.annotate(location_count=Count('locations'))
     serializer_class = DistrictSerializer
     lookup_field = 'name'
+
+    def get_cache_tags(self):
+        return [f"district:{self.kwargs['name']}", 'districts:bulk']
+
+
+# Vector tile
+# Tile MVT cho bản đồ: /api/tiles/<layer>/<z>/<x>/<y>.mvt
+class VectorTileView(View):
+    def get(self, request, layer, z, x, y):
+        if layer not in tiles.LAYERS or not tiles.is_valid_tile(z, x, y):
+            raise Http404("Tile not found")
+        response = HttpResponse(tiles.get_tile(layer, z, x, y), content_type='application/vnd.mapbox-vector-tile')
+        response['Cache-Control'] = 'public, max-age=3600'
+        return response
+
+
+# Image variant
+# Ảnh thu nhỏ: /api/images/<pk>/<width>.<format>; sinh lười ở lần yêu cầu đầu rồi lấy từ cache trên đĩa
+class ImageVariantView(View):
+    def get(self, request, pk, width, fmt):
+        if fmt not in imaging.available_formats():
+            raise Http404("Unsupported image format")
+        image = get_object_or_404(Image, pk=pk)
+        source = str(imaging.source_path(image.url))
+        pool = imaging.get_pool()
+
+        try:
+            if image.width is None:
+                # Chưa chạy build_image_variants cho ảnh này: tính metadata trước để biết các mức chiều rộng
+                imaging.apply_metadata(image, pool.submit(imaging.process_image, source).result())
+                image.save(update_fields=imaging.METADATA_FIELDS)
+
+            width = imaging.closest_width(image.width, width)
+            path = imaging.variant_path(image.url, width, fmt)
+            if not path.exists():
+                pool.submit(imaging.process_image, source, [(width, fmt, str(path))]).result()
+        except FileNotFoundError:
+            raise Http404("Image file not found")
+        except imaging.UnidentifiedImageError:
+            # File gốc không phải ảnh Pillow đọc được (hỏng, sai định dạng)
+            raise Http404("Image file is not a readable image")
+
+        response = FileResponse(open(path, 'rb'), content_type=imaging.CONTENT_TYPES[fmt])
+        response['Cache-Control'] = 'public, max-age=2592000'
+        return response
+
+
+# Metrics
+# Histogram độ trễ theo view của tiến trình hiện tại (JSON, hoặc ?format=prometheus)
+class MetricsView(APIView):
+    permission_classes = [AllowAny]
+    renderer_classes = [instrumentation.TimedJSONRenderer, instrumentation.PrometheusRenderer]
+
+    def get(self, request):
+        if not instrumentation.metrics_allowed(request):
+            return Response({"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+        data = instrumentation.registry.as_dict()
+        data['db_pools'] = database.pool_stats()
+        return Response(data)
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { X, MapPin, Navigation, BookmarkPlus, Star } from 'lucide-react';
 import { Button } from '../ui/button';
+import { absoluteSrcSet } from '@/lib/utils';
 import './LocationDetail.css';
 
 interface LocationProps {
@@ -8,7 +9,7 @@ interface LocationProps {
   name: string;
   address?: string;
   location?: [number, number] | null;
-  images?: Array<{ id: number, url: string, caption?: string | null }>;
+  images?: Array<{ id: number, url: string, caption?: string | null, srcset?: string | null }>;
   details?: any;
   type?: string;
   distance?: number;
@@ -142,6 +143,8 @@ export const LocationDetail = ({ location, locationsList, onClose, setSelectedRo
         <div className="location-image-container">
           <img
             src={hasImages ? `${BASE_URL}/media${location.images[0]?.url}` : placeholderImage}
+            srcSet={hasImages ? absoluteSrcSet(location.images[0]?.srcset, BASE_URL) : undefined}
+            sizes="(max-width: 640px) 100vw, 400px"
             alt={location.name}
             className="location-image"
           />
@@ -11,6 +11,7 @@ import L from 'leaflet';
 import 'leaflet-routing-machine';
 import './Map.css';
 import { Select, MenuItem, FormControl, InputLabel } from '@mui/material';
+import { absoluteSrcSet } from '@/lib/utils';
 
 
 // ==========================
@@ -99,6 +100,8 @@ const CustomPopup = ({ location, baseUrl }) => {
     <div className="custom-popup">
       <img
         src={imageUrl}
+        srcSet={location.images?.length > 0 ? absoluteSrcSet(location.images[0].srcset, baseUrl) : undefined}
+        sizes="240px"
         alt={location.name}
         className="popup-image"
       />
@@ -159,6 +162,10 @@ const TOURISM_TYPE_MAPPING = {
   'Điểm ngắm cảnh': 'viewpoint',
 };
 
+// Danh sách địa điểm trên bản đồ chỉ cần dữ liệu marker + ảnh/chi tiết cho popup và danh sách,
+// không cần toàn bộ đánh giá của từng địa điểm
+const MARKER_PARAMS = { view: 'marker', expand: 'images,details' };
+
 // ==========================
 // 3. COMPONENT CHÍNH
 // ==========================
@@ -257,7 +264,7 @@ export const MapComponent = () => {
       };
       setDistrictGeoJSON(newGeoJSON);
       //Gửi một yêu cầu GET khác để lấy các địa điểm trong quận với tham số district được truyền vào
-      const locationsRes = await axios.get(`${BASE_URL}/api/locations/`, { params: { district: districtName, all: true } });
+      const locationsRes = await axios.get(`${BASE_URL}/api/locations/`, { params: { district: districtName, all: true, ...MARKER_PARAMS } });
       
       const locationsData = locationsRes.data.results || locationsRes.data;
       if (!Array.isArray(locationsData)) {
@@ -349,6 +356,7 @@ export const MapComponent = () => {
           lat: currentLocation.lat,
           lng: currentLocation.lng,
           all: true,
+          ...MARKER_PARAMS,
         },
       });
       const locationsData = res.data.results || res.data;
@@ -404,6 +412,7 @@ export const MapComponent = () => {
           lng: currentLocation.lng,
           radius: radiusKm,
           all: true,
+          ...MARKER_PARAMS,
         },
       });
       const locationsData = res.data.results || res.data;
@@ -4,3 +4,12 @@ import { twMerge } from "tailwind-merge"
 export function cn(...inputs: ClassValue[]) {
   return twMerge(clsx(inputs))
 }
+
+// srcset từ API chứa đường dẫn tương đối (/api/images/...); thêm host backend vào từng ảnh
+export function absoluteSrcSet(srcset: string | null | undefined, baseUrl: string) {
+  if (!srcset) return undefined
+  return srcset
+    .split(", ")
+    .map((entry) => `${baseUrl}${entry}`)
+    .join(", ")
+}
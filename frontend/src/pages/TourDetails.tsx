@@ -162,11 +162,15 @@ const TourDetails = () => {
       }, {})
     : {};
 
-  const fetchAlternatives = async (tourismType) => {
+  const fetchAlternatives = async (item) => {
     try {
       const token = localStorage.getItem('access_token');
-      const config = token ? { headers: { Authorization: `Bearer ${token}` } } : {};
-      const response = await axios.get(`${BASE_URL}/api/locations/alternatives/${tourismType}/`, config);
+      const config = {
+        ...(token ? { headers: { Authorization: `Bearer ${token}` } } : {}),
+        // Xếp hạng theo các điểm dừng kề điểm cần thay, bỏ các địa điểm đã có trong lịch trình
+        params: { itinerary: itineraryData.id, location: item.locationId, limit: 12 },
+      };
+      const response = await axios.get(`${BASE_URL}/api/locations/alternatives/${item.tourism_type}/`, config);
       console.log('Alternatives response:', response.data);
       setAlternatives(response.data);
     } catch (error) {
@@ -178,7 +182,7 @@ const TourDetails = () => {
 
   const handleChangeLocation = (item) => {
     setSelectedLocation(item);
-    fetchAlternatives(item.tourism_type);
+    fetchAlternatives(item);
   };
 
   const handleUpdateLocation = async (newLocationId) => {